@@ -0,0 +1,253 @@
+import threading
+from dataclasses import dataclass, field
+from itertools import chain
+
+from sqlalchemy import desc, event
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from database.instrumentation import QueryCounter
+from database.models import (
+    Character,
+    CharacterTitle,
+    CharacterCompatibleElement,
+    CharacterReclusionState,
+    CharacterKnownTechniques,
+    Technique,
+    DmGuidelineSet,
+    CultivationRealm,
+    CampaignEvent,
+)
+
+# Models whose rows end up in a PromptContext. Any ORM change to one of them (flushed
+# through a session, or a bulk insert/update/delete statement) bumps the generation when
+# its transaction commits and thereby invalidates every cached snapshot; changes to other
+# tables, and rolled-back changes, leave them alone.
+SNAPSHOT_MODELS = (
+    Character,
+    CharacterTitle,
+    CharacterCompatibleElement,
+    CharacterReclusionState,
+    CharacterKnownTechniques,
+    Technique,
+    DmGuidelineSet,
+    CultivationRealm,
+    CampaignEvent,
+)
+
+_context_generation = 0
+# Set in Session.info when a transaction has written SNAPSHOT_MODELS rows not yet committed.
+_DIRTY_KEY = "prompt_context_dirty"
+
+
+def _bump_context_generation() -> None:
+    global _context_generation
+    _context_generation += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session, flush_context):
+    # new/dirty/deleted still describe the pre-flush state at this point.
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, SNAPSHOT_MODELS):
+            session.info[_DIRTY_KEY] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_bulk_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, SNAPSHOT_MODELS):
+            orm_execute_state.session.info[_DIRTY_KEY] = True
+
+
+# The generation only moves once the changes are visible to other sessions; bumping at
+# flush time would let another thread cache pre-commit data under the new generation.
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        _bump_context_generation()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_changes(session):
+    session.info.pop(_DIRTY_KEY, None)
+
+
+@dataclass
+class KnownTechnique:
+    """Plain copy of a known Technique, safe to use after the session is gone."""
+    name: str
+    rank: str | None
+    element_association: str | None
+    description: str | None
+    damage_string: str | None
+    mana_cost: int | None
+    mastery_level: str | None
+
+
+@dataclass
+class PromptContext:
+    """Everything DmAgent puts into a prompt, detached from the ORM."""
+    guideline: dict | None = None
+    character: dict | None = None
+    known_techniques: list[KnownTechnique] = field(default_factory=list)
+    recent_event: dict | None = None
+    cultivation_realms: list[tuple[str, str | None]] | None = None
+
+
+def character_prompt_info(character: Character) -> dict:
+    """Summarizes a Character (with titles, elements and reclusion loaded) for a prompt."""
+    info = {
+        "name": character.name,
+        "level": character.level,
+        "class": character.character_class,
+        "race": character.race,
+        "status": character.status_general,
+        "dao": character.dao_philosophy,
+        "affiliation": character.affiliation,
+        "hp": f"{character.hp_current}/{character.hp_max}",
+        "mana": f"{character.mana_current}/{character.mana_max}" if character.mana_max is not None else "N/A",
+    }
+
+    active_titles = [t.title_name for t in character.titles if t.is_active]
+    if active_titles:
+        info["titles"] = ", ".join(active_titles)
+
+    compatible_elements = [ce.element_description for ce in character.compatible_elements]
+    if compatible_elements:
+        info["elements"] = ", ".join(compatible_elements)
+
+    if character.reclusion_state:
+        info["reclusion"] = (
+            f"Start: Day {character.reclusion_state.start_day}, "
+            f"End: Day {character.reclusion_state.end_day}, "
+            f"Remaining: {character.reclusion_state.days_remaining} days"
+        )
+    return info
+
+
+def format_known_techniques(techniques: list) -> str | None:
+    """Prompt lines for Technique or KnownTechnique objects, or None if there are none."""
+    formatted_list = []
+    for tech in techniques:
+        desc_snippet = (tech.description[:50] + "...") if tech.description and len(tech.description) > 50 else tech.description
+        formatted_list.append(
+            f"- {tech.name} (Rango: {tech.rank or 'N/A'}, Elemento: {tech.element_association or 'N/A'}, Coste: {tech.mana_cost or 'N/A'}). Efecto: {desc_snippet or 'No especificado'}."
+        )
+    return "\n".join(formatted_list) if formatted_list else None
+
+
+class PromptContextLoader:
+    """
+    Loads the prompt context for one player message in a fixed number of queries:
+    the guideline set, the character (plus one selectin query each for titles,
+    compatible elements and known techniques with their Technique joined in, and the
+    reclusion state joined), the latest CampaignEvent and, on request, the cultivation
+    realms. The number of statements issued by the last load() is kept in
+    `last_query_count`.
+
+    The resulting snapshot is cached and reused until one of the SNAPSHOT_MODELS changes
+    in this process and the change is committed, so an unchanged turn costs no queries at
+    all. A session with uncommitted changes to those models bypasses the cache (and does
+    not fill it), so it still sees its own writes. Realms are added to
+    the cached snapshot the first time they are requested. A loader may be shared by
+    threads, each passing its own session; the snapshot is swapped in atomically.
+    """
+
+    def __init__(self, use_cache: bool = True):
+        self.use_cache = use_cache
+        self.last_query_count = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+        # (character/guideline key, generation, context) of the cached snapshot.
+        self._snapshot: tuple[tuple, int, PromptContext] | None = None
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    def load(self, db_session: Session, character_name: str, guideline_name: str,
+             include_realms: bool = False) -> PromptContext:
+        key = (character_name, guideline_name)
+        snapshot = self._snapshot
+        use_cache = self.use_cache and not db_session.info.get(_DIRTY_KEY)
+        with QueryCounter(db_session.get_bind()) as counter:
+            if (use_cache and snapshot is not None and snapshot[0] == key
+                    and snapshot[1] == _context_generation):
+                with self._lock:
+                    self.cache_hits += 1
+                context = snapshot[2]
+                if include_realms and context.cultivation_realms is None:
+                    context.cultivation_realms = self._load_realms(db_session)
+            else:
+                with self._lock:
+                    self.cache_misses += 1
+                # Read the generation first so a change during the load leaves the snapshot stale.
+                generation = _context_generation
+                context = self._load(db_session, character_name, guideline_name, include_realms)
+                if use_cache:
+                    self._snapshot = (key, generation, context)
+        self.last_query_count = counter.count
+        return context
+
+    def _load(self, db_session: Session, character_name: str, guideline_name: str,
+              include_realms: bool) -> PromptContext:
+        context = PromptContext()
+
+        guideline = db_session.query(DmGuidelineSet).filter_by(name=guideline_name).first()
+        if guideline:
+            context.guideline = {
+                "name": guideline.name,
+                "system_base": guideline.system_base,
+                "tone_style": guideline.tone_style,
+                "tone_focus": guideline.tone_focus,
+                "dice_roll_rules": guideline.dice_roll_rules,
+            }
+
+        character = (
+            db_session.query(Character)
+            .options(
+                selectinload(Character.titles),
+                selectinload(Character.compatible_elements),
+                joinedload(Character.reclusion_state),
+                selectinload(Character.known_techniques).joinedload(CharacterKnownTechniques.technique),
+            )
+            .filter_by(name=character_name)
+            .first()
+        )
+        if character:
+            context.character = character_prompt_info(character)
+            context.known_techniques = [
+                KnownTechnique(
+                    name=ckt.technique.name,
+                    rank=ckt.technique.rank,
+                    element_association=ckt.technique.element_association,
+                    description=ckt.technique.description,
+                    damage_string=ckt.technique.damage_string,
+                    mana_cost=ckt.technique.mana_cost,
+                    mastery_level=ckt.mastery_level,
+                )
+                for ckt in character.known_techniques
+                if ckt.technique
+            ]
+
+        event = db_session.query(CampaignEvent).order_by(desc(CampaignEvent.id)).first()
+        if event:
+            context.recent_event = {
+                "title": event.title,
+                "summary_content": event.summary_content,
+                "day_range_start": event.day_range_start,
+                "day_range_end": event.day_range_end,
+            }
+
+        if include_realms:
+            context.cultivation_realms = self._load_realms(db_session)
+        return context
+
+    @staticmethod
+    def _load_realms(db_session: Session) -> list[tuple[str, str | None]]:
+        return [
+            (realm.name, realm.level_range)
+            for realm in db_session.query(CultivationRealm).order_by(CultivationRealm.realm_order).all()
+        ]
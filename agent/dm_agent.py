@@ -1,9 +1,14 @@
 import os
 import json
+import asyncio
+import functools
+from contextlib import aclosing
 import openai
 from openai import OpenAIError
 from config import DATABASE_URL, OPENAI_API_KEY
-from database.engine import init_db, get_session
+from database.engine import init_db, get_session, session_scope, current_session
+from database.event_tags import find_events_by_tags
+from database.search import search_campaign_events
 from database.models import (
     Character,
     WorldState,
@@ -22,16 +27,50 @@ from database.models import (
     DmSessionStructureItem,
 )
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import desc, or_ # Added or_ for keyword search
+from sqlalchemy import desc
 from sqlalchemy.orm import joinedload
 from engine.rules_engine import RulesEngine
+from engine.dice import DiceRoller, RollResult, roll_history_row
+from engine.roll_log import RollLog
+from engine.simulation import SimulationResult, simulate_encounter
+from engine.turn_order import TurnOrder
+from engine.spatial import EncounterSpatialIndex
 from engine.narrative_engine import NarrativeEngine
+from engine.async_client import get_shared_async_client
+from agent.context_loader import PromptContextLoader, character_prompt_info, format_known_techniques
+
+MAIN_CHARACTER_NAME = "Liáng Wǔzhào"
+DEFAULT_GUIDELINE_NAME = "Directrices DM Completas - Mundo Wuxia Liáng Wǔzhào"
+
+def _in_request_scope(method):
+    """
+    Runs a DmAgent method inside request_scope(), reusing the caller's scope if one is
+    active. The scope does not commit: methods that write commit (or roll back) themselves.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.request_scope(commit=False):
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class DmAgent:
-    def __init__(self, db_url: str = None): 
+    """
+    AI Dungeon Master backed by the game database.
+
+    Each player turn (process_input and its async/streaming variants) and every public
+    method that reads or writes the database runs in its own request scope: a short-lived
+    session that is closed when the call's database work is done, so the identity map
+    doesn't grow over a long conversation and one agent can serve several conversations
+    from a thread pool or asyncio tasks. Rows returned from such a call are detached, with
+    their columns loaded; callers that want to follow relationships, or to group several
+    calls into one unit of work, open a scope around them with `with agent.request_scope():`.
+    Outside any scope `db_session` falls back to the agent's long-lived session.
+    """
+
+    def __init__(self, db_url: str = None, async_client=None): 
         current_db_url = db_url if db_url is not None else DATABASE_URL
         init_db(current_db_url) 
-        self.db_session = get_session()
+        self._session = get_session()
         print(f"DmAgent initialized with DB session for URL: {current_db_url}")
         if current_db_url == "sqlite:///./default_dm_database.db": # Check against the actual default from config.py
             print("INFO: Using default SQLite database. For production, consider setting DATABASE_URL environment variable.")
@@ -44,9 +83,20 @@ class DmAgent:
             print("DmAgent Error: OPENAI_API_KEY not found in environment/config. AI features will be disabled.")
             self.ai_enabled = False
             
-        self.rules_engine = RulesEngine(db_session=self.db_session)
-        self.narrative_engine = NarrativeEngine() 
+        self.rules_engine = RulesEngine(session_provider=lambda: self.db_session)
+        # Optional AsyncChatClient shared by aprocess_input and the NarrativeEngine's async calls;
+        # None means the process-wide client from engine.async_client.
+        self.async_client = async_client
+        self.narrative_engine = NarrativeEngine(async_client=async_client) 
         print("RulesEngine and NarrativeEngine initialized within DmAgent.")
+        self.context_loader = PromptContextLoader()
+        self.dice = DiceRoller()
+        # Dice rolls are written behind the turn, in batches, on the roll log's own sessions.
+        self.roll_log = RollLog()
+        # Turn orders and spatial indexes of the encounters in progress, by encounter id.
+        # Both hold the encounter's active participants, so they are evicted together.
+        self._turn_orders: dict[int, TurnOrder] = {}
+        self._spatial_indexes: dict[int, EncounterSpatialIndex] = {}
 
         # Load default DM Guidelines
         self.dm_guidelines: DmGuidelineSet | None = self.get_dm_guideline() # Default name is used
@@ -55,8 +105,22 @@ class DmAgent:
         else:
             print(f"Default DM Guidelines '{self.dm_guidelines.name}' loaded.")
 
+    @property
+    def db_session(self):
+        """The session of the active request scope, or the agent's own session outside one."""
+        return current_session() or self._session
+
+    @db_session.setter
+    def db_session(self, session):
+        self._session = session
+
+    def request_scope(self, commit: bool = True):
+        """Context manager for one unit of work; see database.engine.session_scope."""
+        return session_scope(commit=commit)
+
     # --- New Query Methods ---
-    def get_dm_guideline(self, guideline_name: str = "Directrices DM Completas - Mundo Wuxia Liáng Wǔzhào") -> DmGuidelineSet | None:
+    @_in_request_scope
+    def get_dm_guideline(self, guideline_name: str = DEFAULT_GUIDELINE_NAME) -> DmGuidelineSet | None:
         try:
             # Eager load related items if frequently accessed together
             # from sqlalchemy.orm import joinedload
@@ -68,6 +132,7 @@ class DmAgent:
             print(f"Database error fetching DM Guideline '{guideline_name}': {e}")
             return None
 
+    @_in_request_scope
     def get_lore_topic_by_name(self, topic_name: str) -> LoreTopic | None:
         try:
             return self.db_session.query(LoreTopic).filter_by(name=topic_name).first()
@@ -75,6 +140,7 @@ class DmAgent:
             print(f"Database error fetching LoreTopic '{topic_name}': {e}")
             return None
 
+    @_in_request_scope
     def get_all_cultivation_realms(self) -> list[CultivationRealm]:
         try:
             return self.db_session.query(CultivationRealm).order_by(CultivationRealm.realm_order).all()
@@ -82,6 +148,7 @@ class DmAgent:
             print(f"Database error fetching Cultivation Realms: {e}")
             return []
 
+    @_in_request_scope
     def get_recent_campaign_events(self, limit: int = 3) -> list[CampaignEvent]:
         try:
             return self.db_session.query(CampaignEvent).order_by(desc(CampaignEvent.id)).limit(limit).all()
@@ -89,6 +156,7 @@ class DmAgent:
             print(f"Database error fetching recent Campaign Events: {e}")
             return []
 
+    @_in_request_scope
     def create_campaign_event(
         self,
         title: str,
@@ -117,40 +185,15 @@ class DmAgent:
             self.db_session.rollback()
             return None
             
+    @_in_request_scope
     def get_character_info_for_prompt(self, character_name: str) -> dict | None:
         character = self.get_character_data(character_name) 
         if not character:
             return None
-        
-        info = {
-            "name": character.name,
-            "level": character.level,
-            "class": character.character_class,
-            "race": character.race,
-            "status": character.status_general,
-            "dao": character.dao_philosophy,
-            "affiliation": character.affiliation,
-            "hp": f"{character.hp_current}/{character.hp_max}",
-            "mana": f"{character.mana_current}/{character.mana_max}" if character.mana_max is not None else "N/A",
-        }
-        
-        active_titles = [t.title_name for t in character.titles if t.is_active]
-        if active_titles:
-            info["titles"] = ", ".join(active_titles)
-            
-        compatible_elements = [ce.element_description for ce in character.compatible_elements]
-        if compatible_elements:
-            info["elements"] = ", ".join(compatible_elements)
-
-        if character.reclusion_state:
-            info["reclusion"] = (
-                f"Start: Day {character.reclusion_state.start_day}, "
-                f"End: Day {character.reclusion_state.end_day}, "
-                f"Remaining: {character.reclusion_state.days_remaining} days"
-            )
-        return info
+        return character_prompt_info(character)
 
     # --- New Technique Query Methods ---
+    @_in_request_scope
     def get_technique_details(self, technique_name: str) -> Technique | None:
         try:
             # Case-insensitive search can be useful here if technique names might vary slightly
@@ -161,6 +204,7 @@ class DmAgent:
             print(f"Database error fetching Technique '{technique_name}': {e}")
             return None
 
+    @_in_request_scope
     def get_character_known_techniques_objects(self, character_name: str) -> list[CharacterKnownTechniques]:
         character = self.get_character_data(character_name) # Existing method
         if character:
@@ -170,35 +214,35 @@ class DmAgent:
                 filter_by(character_id=character.id).all()
         return []
 
+    @_in_request_scope
     def get_formatted_known_techniques_for_prompt(self, character_name: str) -> str | None:
         known_techniques_associations = self.get_character_known_techniques_objects(character_name)
-        if not known_techniques_associations:
-            return None
-        
-        formatted_list = []
-        for ckt in known_techniques_associations:
-            if ckt.technique: # Ensure the technique object is loaded
-                tech = ckt.technique
-                desc_snippet = (tech.description[:50] + "...") if tech.description and len(tech.description) > 50 else tech.description
-                formatted_list.append(
-                    f"- {tech.name} (Rango: {tech.rank or 'N/A'}, Elemento: {tech.element_association or 'N/A'}, Coste: {tech.mana_cost or 'N/A'}). Efecto: {desc_snippet or 'No especificado'}."
-                )
-        return "\n".join(formatted_list) if formatted_list else None
+        # Ensure the technique object is loaded
+        return format_known_techniques([ckt.technique for ckt in known_techniques_associations if ckt.technique])
 
+    @_in_request_scope
     def find_campaign_events_by_keyword(self, keyword: str, limit: int = 10) -> list[CampaignEvent]:
+        """Full-text search over event titles, summaries and tags, most relevant first."""
         try:
-            search_pattern = f"%{keyword}%"
-            return self.db_session.query(CampaignEvent).filter(
-                or_(
-                    CampaignEvent.title.ilike(search_pattern),
-                    CampaignEvent.summary_content.ilike(search_pattern),
-                    CampaignEvent.event_tags_json.ilike(search_pattern) # Assumes tags are stored as JSON string list
-                )
-            ).order_by(desc(CampaignEvent.id)).limit(limit).all()
+            return search_campaign_events(self.db_session, keyword, limit=limit)
         except SQLAlchemyError as e:
             print(f"Database error searching Campaign Events for keyword '{keyword}': {e}")
             return []
 
+    @_in_request_scope
+    def find_campaign_events_by_tags(self, expression: str, day_start: int | None = None,
+                                     day_end: int | None = None, limit: int = 50) -> list[CampaignEvent]:
+        """
+        Events matching a tag expression such as 'combate AND (secta OR "clan yun") NOT traicion',
+        optionally limited to those overlapping a day range, in timeline order.
+        Raises TagExpressionError if the expression is malformed.
+        """
+        try:
+            return find_events_by_tags(self.db_session, expression, day_start, day_end, limit)
+        except SQLAlchemyError as e:
+            print(f"Database error searching Campaign Events for tags '{expression}': {e}")
+            return []
+
     def trigger_narrative_engine(self, topic: str, context: str = "A player asked for a description.", tone: str = "informative") -> str:
         """
         Triggers the narrative engine to generate a description.
@@ -210,42 +254,74 @@ class DmAgent:
         # NarrativeEngine's own ai_enabled flag will be checked internally by its method
         return self.narrative_engine.generate_description(topic, context, tone)
 
+    def trigger_narrative_engine_stream(self, topic: str, context: str = "A player asked for a description.", tone: str = "informative"):
+        """
+        Streaming variant of trigger_narrative_engine; yields the description as it is generated.
+        """
+        if not self.ai_enabled:
+            yield "Narrative generation disabled because AI is not configured in DmAgent."
+            return
+        yield from self.narrative_engine.stream_description(topic, context, tone)
+
+    @_in_request_scope
     def trigger_rules_engine_check(self, keyword: str) -> dict:
         """
-        Triggers the rules engine to check a rule.
+        Triggers the rules engine to check a rule, falling back to alias/fuzzy matching.
         """
         if not hasattr(self, 'rules_engine'):
             # This should not happen if __init__ is correct
             return {"outcome": "error", "message": "Rules Engine not initialized."}
-        return self.rules_engine.check_rule(keyword)
+        return self.rules_engine.check_rule(keyword, fuzzy=True)
 
-    def process_input(self, user_input: str) -> str:
+    @_in_request_scope
+    def trigger_rules_engine_batch_check(self, keywords: list) -> list[dict]:
+        """
+        Triggers the rules engine for several keywords (or (keyword, character_id) tuples) in one call.
+        """
+        if not hasattr(self, 'rules_engine'):
+            return [{"outcome": "error", "message": "Rules Engine not initialized."}]
+        return self.rules_engine.check_rules(keywords, fuzzy=True)
+
+    @_in_request_scope
+    def _rule_check_response(self, user_input: str) -> str:
         # Optional: Illustrative call to RulesEngine (can be expanded later)
         # For example, if user input is an action that needs a rule check
         # This is a simplistic check; real integration would be more nuanced.
-        if user_input.lower().startswith("check rule for:"):
-            action_to_check = user_input.lower().replace("check rule for:", "").strip()
-            rule_check_result = self.rules_engine.check_rule(action_keyword=action_to_check)
+        # Compound actions are comma-separated, e.g. "check rule for: move, attack, fireball"
+        actions_to_check = [a.strip() for a in user_input.lower().replace("check rule for:", "").split(",") if a.strip()]
+        rule_check_results = self.rules_engine.check_rules(actions_to_check, fuzzy=True)
+        rule_response_lines = []
+        for action_to_check, rule_check_result in zip(actions_to_check, rule_check_results):
             print(f"Rule check for '{action_to_check}': {rule_check_result}")
             # This result could then be passed to the AI or used to modify the AI's prompt
             # For now, just return a message indicating the check was done.
             rule_response_str = f"Rule check for '{action_to_check}': {rule_check_result.get('message')}"
             if rule_check_result.get('outcome') == 'success' and rule_check_result.get('rule_applied'):
                 rule_response_str += f" Details: {rule_check_result.get('rule_applied')}"
-            return rule_response_str
-
-        if not self.ai_enabled or not openai.api_key:
-            return "Error: AI functionality is not available. Check API key configuration."
+            rule_response_lines.append(rule_response_str)
+        return "\n".join(rule_response_lines)
 
+    @_in_request_scope
+    def _build_messages_for_openai(self, user_input: str) -> list[dict]:
+        """Builds the system/user messages for a player message from the world context in the database."""
         # --- Context Building ---
+        user_input_lower = user_input.lower()
+        # Guideline, character (titles, elements, reclusion, known techniques) and latest event
+        # come from one eager load; realms only when the message is about cultivation.
+        wants_realms = "cultivo" in user_input_lower or "reino" in user_input_lower or "nivel de cultivo" in user_input_lower
+        prompt_context = self.context_loader.load(
+            self.db_session, MAIN_CHARACTER_NAME, DEFAULT_GUIDELINE_NAME, include_realms=wants_realms
+        )
+
         context_parts = []
-        if self.dm_guidelines:
-            context_parts.append(f"Estilo del DM: {self.dm_guidelines.tone_style or 'No especificado'}.")
-            context_parts.append(f"Enfoque del DM: {self.dm_guidelines.tone_focus or 'No especificado'}.")
-            if self.dm_guidelines.dice_roll_rules: # Check specific attribute
-                 context_parts.append(f"Reglas de Dados Clave: {self.dm_guidelines.dice_roll_rules.split('.')[0]}.") 
+        guideline = prompt_context.guideline
+        if guideline:
+            context_parts.append(f"Estilo del DM: {guideline['tone_style'] or 'No especificado'}.")
+            context_parts.append(f"Enfoque del DM: {guideline['tone_focus'] or 'No especificado'}.")
+            if guideline['dice_roll_rules']: # Check specific attribute
+                 context_parts.append(f"Reglas de Dados Clave: {guideline['dice_roll_rules'].split('.')[0]}.") 
         
-        char_info = self.get_character_info_for_prompt("Liáng Wǔzhào") # Assuming this is the main character for context
+        char_info = prompt_context.character # Assuming this is the main character for context
         if char_info:
             char_summary = f"Personaje Principal: {char_info['name']} (Nivel {char_info['level']} {char_info.get('class','N/A')}, {char_info.get('race','N/A')}). " \
                            f"Estado: {char_info.get('status','N/A')}. Dao: {char_info.get('dao','N/A')}. Afiliación: {char_info.get('affiliation','N/A')}. " \
@@ -254,31 +330,27 @@ class DmAgent:
             if char_info.get('reclusion'): char_summary += f" Reclusión: {char_info['reclusion']}."
             context_parts.append(char_summary)
 
-        recent_events = self.get_recent_campaign_events(limit=1)
-        if recent_events:
-            event = recent_events[0]
-            event_days = f"(Días {event.day_range_start}"
-            if event.day_range_end and event.day_range_end != event.day_range_start:
-                event_days += f"-{event.day_range_end}"
+        event = prompt_context.recent_event
+        if event:
+            event_days = f"(Días {event['day_range_start']}"
+            if event['day_range_end'] and event['day_range_end'] != event['day_range_start']:
+                event_days += f"-{event['day_range_end']}"
             event_days += ")"
-            context_parts.append(f"Evento Reciente {event_days}: {event.title} - {event.summary_content[:100]}...")
+            context_parts.append(f"Evento Reciente {event_days}: {event['title']} - {(event['summary_content'] or '')[:100]}...")
 
         # Basic keyword-based context fetching
-        user_input_lower = user_input.lower()
-        if "cultivo" in user_input_lower or "reino" in user_input_lower or "nivel de cultivo" in user_input_lower :
-            realms = self.get_all_cultivation_realms()
-            if realms:
-                realm_list_str = ", ".join([f"{r.name} (Nivel aprox. PJ: {r.level_range})" for r in realms])
-                context_parts.append(f"Reinos de Cultivo Conocidos: {realm_list_str}")
+        if wants_realms and prompt_context.cultivation_realms:
+            realm_list_str = ", ".join([f"{name} (Nivel aprox. PJ: {level_range})" for name, level_range in prompt_context.cultivation_realms])
+            context_parts.append(f"Reinos de Cultivo Conocidos: {realm_list_str}")
         
         if "flujo de energía" in user_input_lower or "chi/maná" in user_input_lower: # Example specific lore
             flujo_lore = self.get_lore_topic_by_name("Flujo de Energía Primordial (Chi/Maná)")
             if flujo_lore and flujo_lore.description:
                 context_parts.append(f"Sobre Flujo de Energía: {flujo_lore.description[:150]}...")
 
-        known_techniques_str = self.get_formatted_known_techniques_for_prompt("Liáng Wǔzhào")
+        known_techniques_str = format_known_techniques(prompt_context.known_techniques)
         if known_techniques_str:
-            context_parts.append(f"Técnicas Conocidas por Liáng Wǔzhào:\n{known_techniques_str}")
+            context_parts.append(f"Técnicas Conocidas por {MAIN_CHARACTER_NAME}:\n{known_techniques_str}")
 
 
         # --- Prompt Formatting ---
@@ -287,8 +359,8 @@ class DmAgent:
         system_prompt_content = "Eres un Dungeon Master (DM) para un juego de rol de texto estilo Wuxia. " \
                                 "Tu objetivo es narrar eventos, describir situaciones, interpretar NPCs, y responder a las acciones del jugador " \
                                 "de forma creativa y coherente con el mundo y las directrices proporcionadas."
-        if self.dm_guidelines and self.dm_guidelines.system_base:
-            system_prompt_content += f" El sistema de juego base es: {self.dm_guidelines.system_base}."
+        if guideline and guideline['system_base']:
+            system_prompt_content += f" El sistema de juego base es: {guideline['system_base']}."
         
         action_context_str = ""
         # --- Detección y Contextualización del Uso de Técnicas (Simplificado) ---
@@ -308,14 +380,13 @@ class DmAgent:
         
         if extracted_technique_name:
             # Check if Liáng Wǔzhào knows this technique or if it's a general technique
-            # For simplicity, first check known techniques for a partial match (case-insensitive)
-            lw_known_techs_objs = self.get_character_known_techniques_objects("Liáng Wǔzhào")
+            # For simplicity, first check known techniques for a partial match (case-insensitive).
+            # The known techniques were already loaded with the prompt context, so no extra query.
             found_known_tech_obj = None
-            if lw_known_techs_objs:
-                for ckt in lw_known_techs_objs:
-                    if ckt.technique and extracted_technique_name.lower() in ckt.technique.name.lower():
-                        found_known_tech_obj = ckt.technique
-                        break
+            for known_tech in prompt_context.known_techniques:
+                if extracted_technique_name.lower() in known_tech.name.lower():
+                    found_known_tech_obj = known_tech
+                    break
             
             technique_to_detail = found_known_tech_obj
             if not technique_to_detail: # If not in known, try to get general details
@@ -351,29 +422,133 @@ class DmAgent:
                 print("-" * 60) # Separador más largo para el contenido
             print("="*60 + "\n")
 
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo", 
-                messages=messages_for_openai
-            )
-            ai_response = response.choices[0].message['content'].strip()
-            return ai_response
-        except openai.error.AuthenticationError as e: # Specific error first
+        return messages_for_openai
+
+    def _openai_error_message(self, e: Exception) -> str:
+        if isinstance(e, openai.error.AuthenticationError): # Specific error first
             print(f"OpenAI API Authentication Error: {e}")
             return "OpenAI API Key es inválido o no está autorizado. Por favor, verifica tu API key."
-        except openai.error.APIConnectionError as e:
+        if isinstance(e, openai.error.APIConnectionError):
             print(f"OpenAI API Connection Error: {e}")
             return "Could not connect to OpenAI API. Please check your network connection."
-        except openai.error.RateLimitError as e:
+        if isinstance(e, openai.error.RateLimitError):
             print(f"OpenAI API Rate Limit Error: {e}")
             return "OpenAI API rate limit exceeded. Please try again later."
-        except openai.error.APIError as e: # Catch other OpenAI specific errors
+        if isinstance(e, openai.error.APIError): # Catch other OpenAI specific errors
             print(f"OpenAI API Error: {e}")
             return "Sorry, I encountered an error trying to process your request with the AI."
-        except Exception as e: # Catch any other unexpected errors
-            print(f"An unexpected error occurred: {e}")
-            return "An unexpected error occurred while communicating with the AI."
+        if isinstance(e, asyncio.TimeoutError):
+            print(f"OpenAI API call timed out: {e}")
+            return "The AI took too long to respond. Please try again."
+        # Any other unexpected error
+        print(f"An unexpected error occurred: {e}")
+        return "An unexpected error occurred while communicating with the AI."
+
+    def process_input(self, user_input: str) -> str:
+        if user_input.lower().startswith("check rule for:"):
+            return self._rule_check_response(user_input)
+
+        if not self.ai_enabled or not openai.api_key:
+            return "Error: AI functionality is not available. Check API key configuration."
 
+        messages_for_openai = self._build_messages_for_openai(user_input)
+
+        try:
+            response = openai.ChatCompletion.create(
+                model="gpt-3.5-turbo", 
+                messages=messages_for_openai
+            )
+            ai_response = response.choices[0].message['content'].strip()
+            return ai_response
+        except Exception as e:
+            return self._openai_error_message(e)
+
+    async def aprocess_input(self, user_input: str) -> str:
+        """
+        asyncio variant of process_input. The prompt context is still read through the
+        synchronous DB session; only the OpenAI round trip is awaited, via the shared
+        AsyncChatClient with its concurrency limit and per-call timeout.
+        """
+        if user_input.lower().startswith("check rule for:"):
+            return self._rule_check_response(user_input)
+
+        if not self.ai_enabled or not openai.api_key:
+            return "Error: AI functionality is not available. Check API key configuration."
+
+        messages_for_openai = self._build_messages_for_openai(user_input)
+
+        client = self.async_client or get_shared_async_client()
+        try:
+            response = await client.create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=messages_for_openai
+            )
+            return response.choices[0].message['content'].strip()
+        except Exception as e:
+            return self._openai_error_message(e)
+
+    def stream_input(self, user_input: str):
+        """
+        Like process_input, but yields the DM response token by token as OpenAI streams it.
+        Rule checks and error messages are yielded as a single piece.
+        """
+        if user_input.lower().startswith("check rule for:"):
+            yield self._rule_check_response(user_input)
+            return
+
+        if not self.ai_enabled or not openai.api_key:
+            yield "Error: AI functionality is not available. Check API key configuration."
+            return
+
+        messages_for_openai = self._build_messages_for_openai(user_input)
+
+        streamed_any = False
+        try:
+            for chunk in openai.ChatCompletion.create(
+                model="gpt-3.5-turbo",
+                messages=messages_for_openai,
+                stream=True
+            ):
+                piece = NarrativeEngine._delta_content(chunk)
+                if piece:
+                    streamed_any = True
+                    yield piece
+        except Exception as e:
+            yield ("\n" if streamed_any else "") + self._openai_error_message(e)
+
+    async def astream_input(self, user_input: str):
+        """
+        Async-iterator variant of stream_input using the shared AsyncChatClient.
+        Callers that may stop early should close it (contextlib.aclosing) to free the
+        client's concurrency slot right away.
+        """
+        if user_input.lower().startswith("check rule for:"):
+            yield self._rule_check_response(user_input)
+            return
+
+        if not self.ai_enabled or not openai.api_key:
+            yield "Error: AI functionality is not available. Check API key configuration."
+            return
+
+        messages_for_openai = self._build_messages_for_openai(user_input)
+
+        client = self.async_client or get_shared_async_client()
+        streamed_any = False
+        try:
+            # aclosing() frees the client's concurrency slot as soon as this generator is closed.
+            async with aclosing(client.stream_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=messages_for_openai
+            )) as chunks:
+                async for chunk in chunks:
+                    piece = NarrativeEngine._delta_content(chunk)
+                    if piece:
+                        streamed_any = True
+                        yield piece
+        except Exception as e:
+            yield ("\n" if streamed_any else "") + self._openai_error_message(e)
+
+    @_in_request_scope
     def get_character_data(self, character_name: str) -> Character | None:
         """
         Queries the Character table for a character by name.
@@ -387,6 +562,7 @@ class DmAgent:
             # self.db_session.rollback() # Optional: rollback on error, though typically not needed for reads
             return None
 
+    @_in_request_scope
     def save_character_data(self, character_data: dict) -> Character | None:
         """
         Creates or updates a Character object from a dictionary, focusing on direct fields
@@ -469,6 +645,7 @@ class DmAgent:
             # import traceback; traceback.print_exc() # For debugging
             return None
 
+    @_in_request_scope
     def update_world_state(self, event_description: str, active_effects: list) -> WorldState | None:
         """
         Updates the existing WorldState or creates a new one.
@@ -491,16 +668,147 @@ class DmAgent:
                 self.db_session.add(world_state)
             
             self.db_session.commit()
+            self.db_session.refresh(world_state)
             return world_state
         except SQLAlchemyError as e:
             print(f"Error updating world state: {e}")
             self.db_session.rollback()
             return None
 
+    def roll_dice(self, expression: str, roller_name: str, roll_type: str, roller_type: str = "character",
+                  advantage: bool = False, disadvantage: bool = False, target_dc: int | None = None,
+                  context: str | None = None, **links) -> RollResult:
+        """
+        Rolls a dice expression and queues it for DiceRollHistory. `links` are the optional
+        roller_id, session_id, encounter_id and character_id of the row.
+        Raises engine.dice.DiceExpressionError for a malformed expression.
+        """
+        result = self.dice.roll(expression, advantage=advantage, disadvantage=disadvantage)
+        self.roll_log.log(roll_history_row(result, roller_name, roll_type, roller_type=roller_type,
+                                           target_dc=target_dc, context=context, **links))
+        return result
+
+    @_in_request_scope
+    def estimate_encounter(self, encounter_id: int, trials: int = 5000) -> SimulationResult | None:
+        """
+        Monte Carlo estimate of how an encounter plays out (win rate, rounds, hp and mana
+        spent); SimulationResult.summary() is a line the AI can be given as calibrated difficulty.
+        """
+        try:
+            return simulate_encounter(self.db_session, encounter_id, trials=trials)
+        except (SQLAlchemyError, ValueError) as e:
+            print(f"Error simulating encounter {encounter_id}: {e}")
+            return None
+
+    @_in_request_scope
+    def turn_order(self, encounter_id: int) -> TurnOrder:
+        """
+        The encounter's TurnOrder, loaded from the database the first time it is needed.
+        Take participants out with remove_participant(), which updates the spatial index too.
+        """
+        if encounter_id not in self._turn_orders:
+            self._turn_orders[encounter_id] = TurnOrder.from_encounter(self.db_session, encounter_id)
+        return self._turn_orders[encounter_id]
+
+    @_in_request_scope
+    def next_turn(self, encounter_id: int) -> int | None:
+        """
+        Advances an encounter to its next turn and saves the fields that changed. Returns the
+        EncounterParticipant id whose turn it is, or None if nobody is left to act.
+        """
+        order = self.turn_order(encounter_id)
+        participant_id = order.advance()
+        try:
+            order.persist(self.db_session)
+            self.db_session.commit()
+        except SQLAlchemyError as e:
+            print(f"Error saving the turn order of encounter {encounter_id}: {e}")
+            self.db_session.rollback()
+            # The in-memory order no longer matches the database; reload it next time.
+            self._forget_encounter(encounter_id)
+        return participant_id
+
+    @_in_request_scope
+    def spatial_index(self, encounter_id: int) -> EncounterSpatialIndex:
+        """The encounter's spatial index of participant positions, loaded the first time it is needed."""
+        if encounter_id not in self._spatial_indexes:
+            self._spatial_indexes[encounter_id] = EncounterSpatialIndex.from_encounter(self.db_session, encounter_id)
+        return self._spatial_indexes[encounter_id]
+
+    @_in_request_scope
+    def move_participant(self, encounter_id: int, participant_id: int, x: int, y: int) -> bool:
+        """
+        Moves (or places) an active participant of the encounter and saves its new position.
+        Returns False if the participant is not in the encounter or the save fails.
+        """
+        index = self.spatial_index(encounter_id)
+        try:
+            index.place(self.db_session, participant_id, x, y)
+        except ValueError as e:
+            print(e)
+            return False
+        try:
+            index.persist(self.db_session)
+            self.db_session.commit()
+            return True
+        except SQLAlchemyError as e:
+            print(f"Error saving the position of participant {participant_id}: {e}")
+            self.db_session.rollback()
+            self._forget_encounter(encounter_id)
+            return False
+
+    @_in_request_scope
+    def remove_participant(self, encounter_id: int, participant_id: int) -> bool:
+        """
+        Takes a participant out of the encounter (fled, defeated): out of the turn order and
+        the spatial index together, saved as inactive. Returns False if it is not in the
+        turn order or the save fails.
+        """
+        order = self.turn_order(encounter_id)
+        try:
+            order.remove(participant_id)
+        except ValueError as e:
+            print(e)
+            return False
+        index = self._spatial_indexes.get(encounter_id)
+        if index is not None and participant_id in index:
+            index.remove(participant_id)
+        try:
+            order.persist(self.db_session)
+            self.db_session.commit()
+            return True
+        except SQLAlchemyError as e:
+            print(f"Error removing participant {participant_id} from encounter {encounter_id}: {e}")
+            self.db_session.rollback()
+            self._forget_encounter(encounter_id)
+            return False
+
+    def area_targets(self, encounter_id: int, x: float, y: float, radius: float,
+                     participant_types: tuple[str, ...] | None = None) -> list[int]:
+        """
+        Participants caught in a burst of `radius` centred on (x, y), nearest first,
+        optionally only those of the given participant types (e.g. ("enemy",)).
+        """
+        index = self.spatial_index(encounter_id)
+        predicate = index.of_type(*participant_types) if participant_types else None
+        return index.within_radius(x, y, radius, predicate)
+
+    def end_encounter(self, encounter_id: int | None = None) -> None:
+        """Makes sure every roll of the encounter that just ended is in DiceRollHistory."""
+        if encounter_id is not None:
+            self._forget_encounter(encounter_id)
+        self.roll_log.encounter_ended()
+
+    def _forget_encounter(self, encounter_id: int) -> None:
+        """Drops the encounter's turn order and spatial index together; both reload from the database."""
+        self._turn_orders.pop(encounter_id, None)
+        self._spatial_indexes.pop(encounter_id, None)
+
     def close_session(self):
-        """Closes the database session."""
-        if self.db_session:
-            self.db_session.close()
+        """Writes pending dice rolls and closes the database session."""
+        self.roll_log.close()
+        if self._session:
+            self._session.close()
             print("Database session closed.")
 
 if __name__ == '__main__':
@@ -0,0 +1,127 @@
+"""
+Query plans and timings of the hot-path lookups with and without the indexes declared
+in database/models.py, on a synthetic SQLite campaign.
+
+    python -m benchmarks.query_plans [--sessions 2000] [--repeat 200]
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import MetaData, create_engine, desc, insert, select, text
+
+from database.models import (
+    Base, Character, CharacterKnownTechniques, Technique, Session, Encounter,
+    EncounterParticipant, DiceRollHistory, DmGuidelineSet, LoreTopic, CampaignEvent,
+)
+
+ELEMENTS = ["Fuego", "Agua", "Tierra", "Metal", "Madera", "Rayo"]
+
+
+def _metadata_without_indexes() -> MetaData:
+    """Copy of the models' metadata keeping primary keys and unique constraints only."""
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata).indexes.clear()
+    return metadata
+
+
+def _seed(engine, sessions: int) -> None:
+    rng = random.Random(42)
+    characters = max(sessions // 10, 10)
+    techniques = max(sessions * 2, 100)
+    with engine.begin() as conn:
+        conn.execute(insert(DmGuidelineSet), [{"name": f"Guía {i}"} for i in range(sessions)])
+        conn.execute(insert(LoreTopic), [{"name": f"Tema {i}"} for i in range(sessions)])
+        conn.execute(insert(Character), [{"name": f"Cultivador {i}"} for i in range(characters)])
+        conn.execute(insert(Technique), [
+            {"name": f"Técnica {i}", "element_association": ELEMENTS[i % len(ELEMENTS)]} for i in range(techniques)
+        ])
+        conn.execute(insert(CharacterKnownTechniques), [
+            {"character_id": rng.randint(1, characters), "technique_id": rng.randint(1, techniques)}
+            for _ in range(characters * 20)
+        ])
+        conn.execute(insert(Session), [
+            {"session_number": i + 1, "title": f"Sesión {i + 1}"} for i in range(sessions)
+        ])
+        conn.execute(insert(Encounter), [
+            {"name": f"Encuentro {i}", "session_id": i // 5 + 1} for i in range(sessions * 5)
+        ])
+        conn.execute(insert(EncounterParticipant), [
+            {"encounter_id": i // 6 + 1, "participant_type": "enemy", "entity_id": i,
+             "entity_name": f"Bandido {i}", "initiative": rng.randint(1, 25)}
+            for i in range(sessions * 30)
+        ])
+        conn.execute(insert(DiceRollHistory), [
+            {"session_id": i // 20 + 1, "encounter_id": i // 4 + 1, "character_id": rng.randint(1, characters),
+             "roller_name": "Cultivador", "roller_type": "character", "roll_type": "attack",
+             "dice_expression": "1d20+5", "individual_rolls_json": [10], "total_result": 15}
+            for i in range(sessions * 20)
+        ])
+        conn.execute(insert(CampaignEvent), [
+            {"title": f"Evento {i}", "day_range_start": i, "day_range_end": i + 2} for i in range(sessions * 10)
+        ])
+
+
+def _queries(sessions: int) -> dict:
+    middle = sessions // 2
+    return {
+        "technique by name + element": select(Technique).where(
+            Technique.name == f"Técnica {middle}", Technique.element_association == ELEMENTS[middle % len(ELEMENTS)]
+        ),
+        "known techniques of a character": select(CharacterKnownTechniques).where(
+            CharacterKnownTechniques.character_id == 3
+        ),
+        "dice rolls of a session by time": select(DiceRollHistory).where(
+            DiceRollHistory.session_id == middle
+        ).order_by(DiceRollHistory.timestamp),
+        "dice rolls of an encounter": select(DiceRollHistory).where(DiceRollHistory.encounter_id == middle),
+        "turn order of an encounter": select(EncounterParticipant).where(
+            EncounterParticipant.encounter_id == middle
+        ).order_by(desc(EncounterParticipant.initiative)),
+        "guideline set by name": select(DmGuidelineSet).where(DmGuidelineSet.name == f"Guía {middle}"),
+        "lore topic by name": select(LoreTopic).where(LoreTopic.name == f"Tema {middle}"),
+        "campaign events in a day range": select(CampaignEvent).where(
+            CampaignEvent.day_range_start.between(middle, middle + 7)
+        ),
+    }
+
+
+def _measure(engine, statement, repeat: int) -> tuple[list[str], float]:
+    compiled = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    sql = str(compiled)
+    with engine.connect() as conn:
+        plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(text(sql)).fetchall()
+        elapsed = (time.perf_counter() - started) / repeat
+    return plan, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000, help="Synthetic sessions to seed")
+    parser.add_argument("--repeat", type=int, default=200, help="Executions per query for timing")
+    args = parser.parse_args()
+
+    engines = {}
+    for label, metadata in (("before", _metadata_without_indexes()), ("after", Base.metadata)):
+        engine = create_engine("sqlite://")
+        metadata.create_all(engine)
+        _seed(engine, args.sessions)
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+        engines[label] = engine
+
+    for name, statement in _queries(args.sessions).items():
+        print(f"\n== {name}")
+        timings = {}
+        for label, engine in engines.items():
+            plan, timings[label] = _measure(engine, statement, args.repeat)
+            print(f"  {label:<6} {timings[label] * 1e3:8.3f} ms  {' | '.join(plan)}")
+        print(f"  speedup x{timings['before'] / timings['after']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,11 +12,51 @@ load_dotenv()
 # Example for SQLite: "sqlite:///./your_database_file.db"
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./default_dm_database.db")
 
+# --- Database Engine / Connection Pool ---
+# Applied by database.engine.init_db to server databases and file-based SQLite (in-memory
+# SQLite keeps SQLAlchemy's single-connection pool). DB_POOL_SIZE connections are kept open,
+# up to DB_MAX_OVERFLOW more are opened under load, and a checkout waits DB_POOL_TIMEOUT
+# seconds before failing. Connections older than DB_POOL_RECYCLE seconds are replaced and,
+# with DB_POOL_PRE_PING, tested before use.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+# PostgreSQL statement_timeout in milliseconds; 0 disables it.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# Seconds a SQLite connection waits on a locked database before raising "database is locked".
+DB_SQLITE_BUSY_TIMEOUT = float(os.getenv("DB_SQLITE_BUSY_TIMEOUT", "15"))
+# File-based SQLite databases are switched to write-ahead logging so readers don't block the writer.
+DB_SQLITE_WAL = os.getenv("DB_SQLITE_WAL", "True").lower() == "true"
+# On startup init_db compares the schema version stored in the database with the models. When they
+# differ it migrates automatically (adding tables, columns and indexes), or with DB_AUTO_MIGRATE=False
+# refuses to start until 'python -m database.schema' has been run.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "True").lower() == "true"
+
 # --- OpenAI API Configuration ---
 # API key is loaded directly from the environment variable.
 # Ensure OPENAI_API_KEY is set in your .env file or system environment.
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# --- Async OpenAI Client ---
+# Used by DmAgent.aprocess_input and NarrativeEngine.agenerate_description: at most
+# OPENAI_MAX_CONCURRENCY requests in flight per process, each cancelled after OPENAI_TIMEOUT_SECONDS.
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+
+# --- CLI Output ---
+# When true, 'say' and 'describe' print the AI response token by token as it streams in.
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "True").lower() == "true"
+
+# --- Narrative Response Cache ---
+# Repeated descriptions (same topic, context, tone and model parameters) are served from a cache
+# instead of calling OpenAI again. Set NARRATIVE_CACHE_MAX_ENTRIES=0 to disable the in-memory tier.
+NARRATIVE_CACHE_MAX_ENTRIES = int(os.getenv("NARRATIVE_CACHE_MAX_ENTRIES", "256"))
+NARRATIVE_CACHE_TTL_SECONDS = int(os.getenv("NARRATIVE_CACHE_TTL_SECONDS", "3600"))
+# Optional on-disk SQLite tier shared across restarts, e.g. "./narrative_cache.db".
+NARRATIVE_CACHE_DB_PATH = os.getenv("NARRATIVE_CACHE_DB_PATH")
+
 # --- Other Potential Configurations ---
 # Example: Define a default AI model to be used across the application.
 # DEFAULT_AI_MODEL = os.getenv("DEFAULT_AI_MODEL", "gpt-3.5-turbo")
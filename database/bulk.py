@@ -0,0 +1,147 @@
+import time
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+from sqlalchemy import UniqueConstraint, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+DEFAULT_BATCH_SIZE = 500
+
+_UPSERT_DIALECTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+@dataclass
+class BulkLoadStats:
+    """Outcome of one bulk_upsert call."""
+    table: str
+    inserted: int = 0
+    updated: int = 0
+    seconds: float = 0.0
+    # Only filled in by incremental seeding (database.seed_manifest).
+    unchanged: int = 0
+    deleted: int = 0
+    # Removed from the data file but still referenced, so not deleted.
+    kept: int = 0
+
+    @property
+    def rows(self) -> int:
+        return self.inserted + self.updated
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    def __str__(self) -> str:
+        extra = ""
+        if self.unchanged:
+            extra += f", {self.unchanged} unchanged"
+        if self.deleted:
+            extra += f", {self.deleted} deleted"
+        if self.kept:
+            extra += f", {self.kept} kept (still referenced)"
+        return (
+            f"{self.table}: {self.inserted} inserted, {self.updated} updated{extra} "
+            f"in {self.seconds:.3f}s ({self.rows_per_second:,.0f} rows/s)"
+        )
+
+
+def _key_columns(model, key_fields: Sequence[str]):
+    return [getattr(model, field) for field in key_fields]
+
+
+def _has_unique_key(model, key_fields: Sequence[str]) -> bool:
+    """True if the table has a unique constraint (or unique column) on exactly `key_fields`."""
+    table = model.__table__
+    wanted = set(key_fields)
+    if wanted == {c.name for c in table.primary_key.columns}:
+        return True
+    if len(key_fields) == 1 and table.c[key_fields[0]].unique:
+        return True
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint) and {c.name for c in constraint.columns} == wanted:
+            return True
+    return any(index.unique and {c.name for c in index.columns} == wanted for index in table.indexes)
+
+
+def fetch_existing_keys(session: Session, model, key_fields: Sequence[str]) -> dict[tuple, int]:
+    """Maps the natural key of every existing row of `model` to its primary key, in one query."""
+    rows = session.execute(select(*_key_columns(model, key_fields), model.id))
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def _batches(rows: list[dict], batch_size: int) -> Iterable[list[dict]]:
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def bulk_upsert(session: Session, model, rows: Iterable[dict], key_fields: Sequence[str],
+                batch_size: int = DEFAULT_BATCH_SIZE, existing: dict[tuple, int] | None = None) -> BulkLoadStats:
+    """
+    Inserts or updates `rows` (dicts of column values) into `model`'s table, matching
+    existing rows on the natural key `key_fields`.
+
+    The existing keys are fetched in a single query. When the key is backed by a unique
+    constraint and the database is SQLite or PostgreSQL, rows are written in batches of
+    INSERT ... ON CONFLICT DO UPDATE; otherwise new rows go through an ORM bulk INSERT and
+    existing ones through an ORM bulk UPDATE by primary key. If a key appears more than
+    once in `rows`, the last occurrence wins. Every row must carry the same columns.
+
+    Callers writing one table in several chunks (e.g. while streaming a large file) can
+    fetch the keys once with fetch_existing_keys and pass them as `existing`.
+    """
+    started = time.perf_counter()
+    stats = BulkLoadStats(table=model.__tablename__)
+
+    by_key: dict[tuple, dict] = {}
+    for row in rows:
+        by_key[tuple(row[field] for field in key_fields)] = row
+    if not by_key:
+        return stats
+
+    if existing is None:
+        existing = fetch_existing_keys(session, model, key_fields)
+    upsert_insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+
+    if upsert_insert is not None and _has_unique_key(model, key_fields):
+        values = list(by_key.values())
+        stmt = upsert_insert(model)
+        update_columns = [name for name in values[0] if name not in key_fields]
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_fields),
+            set_={name: stmt.excluded[name] for name in update_columns},
+        )
+        for batch in _batches(values, batch_size):
+            session.execute(stmt, batch)
+        stats.updated = sum(1 for key in by_key if key in existing)
+        stats.inserted = len(by_key) - stats.updated
+    else:
+        new_rows = [row for key, row in by_key.items() if key not in existing]
+        changed_rows = [dict(row, id=existing[key]) for key, row in by_key.items() if key in existing]
+        for batch in _batches(new_rows, batch_size):
+            session.execute(insert(model), batch)
+        for batch in _batches(changed_rows, batch_size):
+            session.execute(update(model), batch)
+        stats.inserted, stats.updated = len(new_rows), len(changed_rows)
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def fetch_by_keys(session: Session, model, key_fields: Sequence[str], keys: Iterable[tuple]) -> dict[tuple, object]:
+    """Loads the `model` objects whose natural keys are in `keys`, in one query."""
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    columns = _key_columns(model, key_fields)
+    if len(columns) == 1:
+        condition = columns[0].in_([key[0] for key in keys])
+    else:
+        condition = tuple_(*columns).in_(keys)
+    return {
+        tuple(getattr(obj, field) for field in key_fields): obj
+        for obj in session.scalars(select(model).where(condition))
+    }
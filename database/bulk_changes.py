@@ -0,0 +1,108 @@
+"""
+Primary keys written by ORM bulk statements, for tables derived from a model.
+
+Mapper events (after_insert/after_update/after_delete) only see objects flushed by the
+unit of work. ORM bulk INSERT/UPDATE/DELETE statements (session.execute(insert(Model),
+rows), bulk_upsert, update(...).where(...)) bypass them, so code that mirrors a model
+into another table registers with on_bulk_change() instead: the ids those statements
+touch are collected per session and handed over once, just before the session commits.
+
+The ids come from the executed parameter rows when they carry the primary key, from a
+SELECT of the statement's WHERE clause for criteria UPDATE/DELETE, and from RETURNING
+for INSERTs (and upserts) without ids. When none of these applies the callback gets
+None, meaning "any row may have changed".
+"""
+from typing import Callable
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+BulkChangeCallback = Callable[[Connection, "set[int] | None"], None]
+
+_callbacks: dict[type, list[BulkChangeCallback]] = {}
+
+
+def _info_key(model: type) -> tuple:
+    return ("bulk_changed_ids", model)
+
+
+def on_bulk_change(model: type, callback: BulkChangeCallback) -> None:
+    """
+    Calls callback(connection, ids) before each commit of a session in which ORM bulk
+    statements wrote `model` rows; `ids` are their primary keys, or None if unknown.
+    Deleted ids are included, so the callback should handle rows that no longer exist.
+    """
+    _callbacks.setdefault(model, []).append(callback)
+
+
+def _record(session: Session, model: type, ids: "set[int] | None") -> None:
+    key = _info_key(model)
+    if ids is None:
+        session.info[key] = None
+    elif session.info.get(key, set()) is not None:
+        session.info.setdefault(key, set()).update(ids)
+
+
+def _insert_returning_ids(orm_execute_state: ORMExecuteState, pk_column):
+    """
+    Runs an INSERT without ids with RETURNING of the primary key. Returns the ids and the
+    result to hand back to the caller, or (None, None) if the statement already returns
+    rows or the database cannot return them.
+    """
+    statement = orm_execute_state.statement
+    dialect = orm_execute_state.session.get_bind(mapper=orm_execute_state.bind_mapper).dialect
+    many = isinstance(orm_execute_state.parameters, list) and len(orm_execute_state.parameters) > 1
+    if statement._returning or not (dialect.insert_executemany_returning if many else dialect.insert_returning):
+        return None, None
+    frozen = orm_execute_state.invoke_statement(statement=statement.returning(pk_column)).freeze()
+    return {row[0] for row in frozen()}, frozen()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(orm_execute_state: ORMExecuteState):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in _callbacks:
+        return None
+    session = orm_execute_state.session
+    if session.info.get(_info_key(mapper.class_), set()) is None:
+        # Already rebuilding everything at commit.
+        return None
+    pk_column = mapper.primary_key[0]
+    parameters = orm_execute_state.parameters
+    rows = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+    statement = orm_execute_state.statement
+
+    result = None
+    if rows and all(pk_column.key in row for row in rows):
+        ids = {row[pk_column.key] for row in rows}
+    elif orm_execute_state.is_insert:
+        ids, result = _insert_returning_ids(orm_execute_state, pk_column)
+    elif not rows and statement.whereclause is not None:
+        ids = set(session.scalars(select(pk_column).where(statement.whereclause)))
+    else:
+        ids = None
+    _record(session, mapper.class_, ids)
+    return result
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_bulk_changes(session: Session):
+    for model, callbacks in _callbacks.items():
+        key = _info_key(model)
+        if key not in session.info:
+            continue
+        ids = session.info.pop(key)
+        if ids is not None and not ids:
+            continue
+        connection = session.connection()
+        for callback in callbacks:
+            callback(connection, ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bulk_changes(session: Session):
+    for model in _callbacks:
+        session.info.pop(_info_key(model), None)
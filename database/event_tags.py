@@ -0,0 +1,229 @@
+"""
+Normalized CampaignEvent tags and tag-expression queries.
+
+CampaignEvent.event_tags_json stays the source of truth; its tags are mirrored into
+campaign_event_tags (one normalized row per tag, indexed on (tag, event_id)) so tag
+filters are index lookups instead of string matches on the serialized JSON. The mirror
+follows ORM inserts, updates and deletes in the same transaction; events written by
+bulk statements are re-tagged when the session commits (see database.bulk_changes).
+Existing events are backfilled once, when the schema is created or migrated (see
+database.schema).
+
+Tag expressions combine tags with AND, OR, NOT and parentheses; adjacent tags are
+ANDed and tags containing spaces are quoted:
+
+    combate AND (secta OR "clan yun") NOT traicion
+"""
+import re
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, not_, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .bulk_changes import on_bulk_change
+from .models import CampaignEvent, CampaignEventTag
+from .schema import register_derived
+from .search import fold_accents
+
+_BACKFILL_BATCH_SIZE = 2000
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+_OPERATORS = {"and", "or", "not"}
+
+
+class TagExpressionError(ValueError):
+    pass
+
+
+def normalize_tag(tag) -> str:
+    """Lowercase, accent-folded, single-spaced form used for storage and matching."""
+    return " ".join(fold_accents(str(tag)).split())
+
+
+def event_tags(tags_json) -> set[str]:
+    """The normalized tags of an event_tags_json value (a list, a dict of tags or a single tag)."""
+    if isinstance(tags_json, dict):
+        tags_json = list(tags_json.values())
+    if not isinstance(tags_json, (list, tuple, set)):
+        tags_json = [tags_json] if tags_json else []
+    return {tag for tag in map(normalize_tag, tags_json) if tag}
+
+
+# --- Keeping campaign_event_tags in sync ---------------------------------------------------
+
+def _replace_tags(conn: Connection, event_id: int, tags_json) -> None:
+    conn.execute(delete(CampaignEventTag).where(CampaignEventTag.event_id == event_id))
+    rows = [{"event_id": event_id, "tag": tag} for tag in sorted(event_tags(tags_json))]
+    if rows:
+        conn.execute(insert(CampaignEventTag), rows)
+
+
+def _insert_tag_rows(conn: Connection, result) -> int:
+    written = 0
+    while True:
+        batch = result.fetchmany(_BACKFILL_BATCH_SIZE)
+        if not batch:
+            return written
+        rows = [{"event_id": event_id, "tag": tag} for event_id, tags_json in batch for tag in event_tags(tags_json)]
+        if rows:
+            conn.execute(insert(CampaignEventTag), rows)
+            written += len(rows)
+
+
+def backfill_event_tags(conn: Connection) -> int:
+    """Rebuilds campaign_event_tags from every event's event_tags_json; returns the rows written."""
+    conn.execute(delete(CampaignEventTag))
+    return _insert_tag_rows(conn, conn.execute(
+        select(CampaignEvent.id, CampaignEvent.event_tags_json).where(CampaignEvent.event_tags_json.is_not(None))
+    ))
+
+
+def retag_events(conn: Connection, ids) -> None:
+    """Rebuilds the tags of the given event ids (deleted ones lose theirs); None rebuilds every event."""
+    if ids is None:
+        backfill_event_tags(conn)
+        return
+    ids = sorted(ids)
+    for start in range(0, len(ids), _BACKFILL_BATCH_SIZE):
+        chunk = ids[start:start + _BACKFILL_BATCH_SIZE]
+        conn.execute(delete(CampaignEventTag).where(CampaignEventTag.event_id.in_(chunk)))
+        _insert_tag_rows(conn, conn.execute(
+            select(CampaignEvent.id, CampaignEvent.event_tags_json)
+            .where(CampaignEvent.id.in_(chunk), CampaignEvent.event_tags_json.is_not(None))
+        ))
+
+
+def _backfill_on_migration(conn: Connection) -> None:
+    written = backfill_event_tags(conn)
+    if written:
+        print(f"Backfilled {written} campaign event tags.")
+
+
+register_derived(CampaignEventTag.__tablename__, "campaign_event_tags:backfill", _backfill_on_migration)
+
+
+@event.listens_for(CampaignEvent, "after_insert")
+def _tag_new_event(mapper, connection, target):
+    _replace_tags(connection, target.id, target.event_tags_json)
+
+
+@event.listens_for(CampaignEvent, "after_update")
+def _retag_event(mapper, connection, target):
+    if inspect(target).attrs.event_tags_json.history.has_changes():
+        _replace_tags(connection, target.id, target.event_tags_json)
+
+
+@event.listens_for(CampaignEvent, "after_delete")
+def _untag_event(mapper, connection, target):
+    connection.execute(delete(CampaignEventTag).where(CampaignEventTag.event_id == target.id))
+
+
+on_bulk_change(CampaignEvent, retag_events)
+
+
+# --- Tag expressions -----------------------------------------------------------------------
+
+def _tokenize(expression: str) -> list[tuple[str, str]]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if match is None:
+            raise TagExpressionError(f"Unterminated quote in tag expression: {expression!r}")
+        opening, closing, quoted, word = match.groups()
+        if opening:
+            tokens.append(("(", opening))
+        elif closing:
+            tokens.append((")", closing))
+        elif quoted is not None:
+            tokens.append(("tag", quoted))
+        elif word.lower() in _OPERATORS:
+            tokens.append((word.lower(), word))
+        else:
+            tokens.append(("tag", word))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive descent: or := and (OR and)*; and := not ([AND] not)*; not := NOT not | atom."""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def _take(self) -> tuple[str, str]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise TagExpressionError("Empty tag expression.")
+        clause = self._or()
+        if self.position != len(self.tokens):
+            raise TagExpressionError(f"Unexpected {self.tokens[self.position][1]!r} in tag expression: {self.expression!r}")
+        return clause
+
+    def _or(self):
+        clauses = [self._and()]
+        while self._peek() == "or":
+            self._take()
+            clauses.append(self._and())
+        return clauses[0] if len(clauses) == 1 else or_(*clauses)
+
+    def _and(self):
+        clauses = [self._not()]
+        while self._peek() in ("and", "not", "tag", "("):
+            if self._peek() == "and":
+                self._take()
+            clauses.append(self._not())
+        return clauses[0] if len(clauses) == 1 else and_(*clauses)
+
+    def _not(self):
+        if self._peek() == "not":
+            self._take()
+            return not_(self._not())
+        return self._atom()
+
+    def _atom(self):
+        kind = self._peek()
+        if kind == "(":
+            self._take()
+            clause = self._or()
+            if self._peek() != ")":
+                raise TagExpressionError(f"Missing ')' in tag expression: {self.expression!r}")
+            self._take()
+            return clause
+        if kind == "tag":
+            tag = normalize_tag(self._take()[1])
+            # Resolved through ix_campaign_event_tags_tag_event.
+            return CampaignEvent.id.in_(select(CampaignEventTag.event_id).where(CampaignEventTag.tag == tag))
+        found = "end of expression" if kind is None else repr(self.tokens[self.position][1])
+        raise TagExpressionError(f"Expected a tag but found {found} in tag expression: {self.expression!r}")
+
+
+def tag_filter(expression: str):
+    """SQL condition on CampaignEvent for a tag expression; raises TagExpressionError if malformed."""
+    return _Parser(expression).parse()
+
+
+def find_events_by_tags(db_session: Session, expression: str, day_start: int | None = None,
+                        day_end: int | None = None, limit: int | None = 50) -> list[CampaignEvent]:
+    """
+    Events matching the tag expression whose day range overlaps [day_start, day_end]
+    (either bound may be omitted), in timeline order.
+    """
+    query = select(CampaignEvent).where(tag_filter(expression))
+    if day_end is not None:
+        query = query.where(CampaignEvent.day_range_start <= day_end)
+    if day_start is not None:
+        query = query.where(func.coalesce(CampaignEvent.day_range_end, CampaignEvent.day_range_start) >= day_start)
+    query = query.order_by(CampaignEvent.day_range_start, CampaignEvent.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return list(db_session.scalars(query))
@@ -0,0 +1,34 @@
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCounter:
+    """
+    Counts the SQL statements an engine executes from the current thread while the
+    counter is active.
+
+        with QueryCounter(engine) as counter:
+            ...
+        print(counter.count, counter.statements)
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.count = 0
+        self.statements: list[str] = []
+        self._thread_id = threading.get_ident()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() != self._thread_id:
+            return
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
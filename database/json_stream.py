@@ -0,0 +1,102 @@
+import json
+from typing import Any, Iterator, TextIO
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class _ChunkReader:
+    """Decodes JSON values one at a time from a text stream read in fixed-size chunks."""
+
+    def __init__(self, fh: TextIO, chunk_size: int):
+        self.fh = fh
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> None:
+        data = self.fh.read(self.chunk_size)
+        if not data:
+            self.eof = True
+        # Drop what has been consumed so the buffer only holds the value being decoded.
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or "" at the end of the stream."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                return ""
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found or 'end of input'!r}.")
+        self.pos += 1
+
+    def decode(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number cut by the chunk boundary ("12" of "123", "-1" of "-1.5") decodes
+            # without error, so read on until something other than a number follows it.
+            if (not self.eof and isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and (end == len(self.buf) or self.buf[end] in _NUMBER_CHARS)):
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(fh: TextIO, key: str | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yields the elements of a JSON array one by one without loading the whole document.
+
+    The array is either the top-level value or, with `key`, the value of that member of
+    a top-level object (e.g. {"npcs": [...]}). Other members of the object are decoded
+    and discarded. Memory use is bounded by the chunk size plus the largest element.
+    """
+    reader = _ChunkReader(fh, chunk_size)
+    if key is not None:
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                raise KeyError(key)
+            name = reader.decode()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.decode()
+            if reader.peek() == ",":
+                reader.pos += 1
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.decode()
+        separator = reader.peek()
+        if separator == "]":
+            return
+        reader.expect(",")
+
+
+def iter_json_file(path: str, key: str | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """iter_json_array over a UTF-8 file; the file is closed once the iterator is exhausted."""
+    with open(path, "r", encoding="utf-8") as fh:
+        yield from iter_json_array(fh, key=key, chunk_size=chunk_size)
@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable
+
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+
+
+def _as_table(target) -> Table:
+    return target if isinstance(target, Table) else target.__table__
+
+
+@dataclass
+class TableLoader:
+    """A seeding step: a callable taking a session, and the tables it writes."""
+    name: str
+    func: Callable[[Session], None]
+    writes: tuple[Table, ...]
+    after: tuple[str, ...] = ()
+    depends_on: set[str] = field(default_factory=set)
+
+
+class LoaderCycleError(Exception):
+    pass
+
+
+class LoadScheduler:
+    """
+    Runs seeding loaders in dependency order.
+
+    A loader depends on every other loader that writes a table referenced by a foreign
+    key of one of its own tables (plus any loader named in `after`). The loaders are
+    grouped into stages with a topological sort: everything in a stage only depends on
+    earlier stages.
+
+    run() executes serially in one session with a single commit at the end, or, with
+    parallel=True, runs the loaders of each stage concurrently, each in its own session
+    (and so on its own pooled connection). In parallel mode each stage is a checkpoint:
+    its sessions are committed together once every loader of the stage has succeeded,
+    and all of them are rolled back if any fails. SQLite allows a single writer at a
+    time, so parallel runs against it fall back to serial.
+    """
+
+    def __init__(self):
+        self.loaders: dict[str, TableLoader] = {}
+
+    def add(self, name: str, func: Callable[[Session], None], writes: Iterable,
+            after: Iterable[str] = ()) -> None:
+        self.loaders[name] = TableLoader(
+            name=name, func=func, writes=tuple(_as_table(t) for t in writes), after=tuple(after)
+        )
+
+    def _resolve_dependencies(self) -> None:
+        writers: dict[str, set[str]] = {}
+        for loader in self.loaders.values():
+            for table in loader.writes:
+                writers.setdefault(table.name, set()).add(loader.name)
+        for loader in self.loaders.values():
+            deps = {name for name in loader.after if name in self.loaders}
+            for table in loader.writes:
+                for fk in table.foreign_keys:
+                    deps |= writers.get(fk.column.table.name, set())
+            deps.discard(loader.name)
+            loader.depends_on = deps
+
+    def stages(self) -> list[list[TableLoader]]:
+        """Loaders grouped into dependency levels, preserving registration order inside a level."""
+        self._resolve_dependencies()
+        remaining = dict(self.loaders)
+        done: set[str] = set()
+        stages = []
+        while remaining:
+            ready = [loader for loader in remaining.values() if loader.depends_on <= done]
+            if not ready:
+                raise LoaderCycleError(f"Dependency cycle between loaders: {sorted(remaining)}")
+            stages.append(ready)
+            for loader in ready:
+                done.add(loader.name)
+                del remaining[loader.name]
+        return stages
+
+    def run(self, session_factory: Callable[[], Session], parallel: bool = False,
+            max_workers: int | None = None) -> None:
+        stages = self.stages()
+        if parallel:
+            probe = session_factory()
+            dialect = probe.get_bind().dialect.name
+            probe.close()
+            if dialect == "sqlite":
+                print("SQLite allows one writer at a time; loading serially.")
+                parallel = False
+        if parallel:
+            self._run_parallel(stages, session_factory, max_workers)
+        else:
+            self._run_serial(stages, session_factory)
+
+    @staticmethod
+    def _run_serial(stages: list[list[TableLoader]], session_factory: Callable[[], Session]) -> None:
+        db_session = session_factory()
+        try:
+            for loader in (loader for stage in stages for loader in stage):
+                loader.func(db_session)
+            db_session.commit()
+        except Exception:
+            db_session.rollback()
+            raise
+        finally:
+            db_session.close()
+
+    @staticmethod
+    def _run_parallel(stages: list[list[TableLoader]], session_factory: Callable[[], Session],
+                      max_workers: int | None) -> None:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for number, stage in enumerate(stages, start=1):
+                started = time.perf_counter()
+                sessions = [session_factory() for _ in stage]
+                try:
+                    futures = [pool.submit(loader.func, s) for loader, s in zip(stage, sessions)]
+                    errors = [f.exception() for f in futures]
+                    failed = next((e for e in errors if e is not None), None)
+                    if failed is not None:
+                        for s in sessions:
+                            s.rollback()
+                        raise failed
+                    for s in sessions:
+                        s.commit()
+                finally:
+                    for s in sessions:
+                        s.close()
+                names = ", ".join(loader.name for loader in stage)
+                print(f"Stage {number} committed in {time.perf_counter() - started:.2f}s: {names}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, JSON, ForeignKey, Float, DateTime, Table
+from sqlalchemy import Column, Integer, String, Text, Boolean, JSON, ForeignKey, Float, DateTime, Table, UniqueConstraint, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 
@@ -58,7 +58,7 @@ class LoreTopic(Base):
     __tablename__ = "lore_topics"
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     description = Column(Text, nullable=True)
     topic_type = Column(String, default="general")
     additional_data_json = Column(JSON, nullable=True)
@@ -145,7 +145,7 @@ class CharacterSavingThrowProficiency(Base):
     __tablename__ = "character_saving_throw_proficiencies"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     attribute_name = Column(String, nullable=False)  # strength, dexterity, etc.
     is_proficient = Column(Boolean, default=False)
     
@@ -156,7 +156,7 @@ class CharacterSkillProficiency(Base):
     __tablename__ = "character_skill_proficiencies"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     skill_name = Column(String, nullable=False)
     is_proficient = Column(Boolean, default=False)
     expertise = Column(Boolean, default=False)  # Double proficiency bonus
@@ -168,7 +168,7 @@ class CharacterLanguage(Base):
     __tablename__ = "character_languages"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     language_name = Column(String, nullable=False)
     
     character = relationship("Character", back_populates="languages")
@@ -178,7 +178,7 @@ class CharacterFeatureTrait(Base):
     __tablename__ = "character_features_traits"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     feature_type = Column(String, nullable=True)  # class_feature, racial_trait, feat, etc.
@@ -193,7 +193,7 @@ class CharacterResource(Base):
     __tablename__ = "character_resources"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     resource_name = Column(String, nullable=False)
     current_value = Column(Integer, default=0)
     max_value = Column(Integer, default=0)
@@ -205,7 +205,7 @@ class CharacterTitle(Base):
     __tablename__ = "character_titles"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     title_name = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     earned_date = Column(DateTime, default=datetime.utcnow)
@@ -217,7 +217,7 @@ class CharacterCompatibleElement(Base):
     __tablename__ = "character_compatible_elements"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     element_description = Column(String, nullable=False)
     affinity_level = Column(String, default="basic")  # basic, intermediate, advanced, master
     
@@ -241,7 +241,7 @@ class CharacterSpellSlot(Base):
     __tablename__ = "character_spell_slots"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     spell_level = Column(Integer, nullable=False)  # 1-9
     total_slots = Column(Integer, default=0)
     used_slots = Column(Integer, default=0)
@@ -278,7 +278,7 @@ class CharacterKnownSpell(Base):
     __tablename__ = "character_known_spells"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     spell_id = Column(Integer, ForeignKey('spells.id'), nullable=False)
     is_prepared = Column(Boolean, default=False)
     always_prepared = Column(Boolean, default=False)  # Domain spells, etc.
@@ -289,11 +289,13 @@ class CharacterKnownSpell(Base):
 class Technique(Base):
     """Wuxia techniques and their D&D spell equivalents."""
     __tablename__ = "techniques"
+    # Seeding and DmAgent look techniques up by name, optionally within an element.
+    __table_args__ = (Index("ix_techniques_name_element", "name", "element_association"),)
     
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     name_chinese = Column(String, nullable=True)
-    element_association = Column(String, nullable=True)
+    element_association = Column(String, nullable=True, index=True)
     description = Column(Text, nullable=True)
     level_required = Column(Integer, default=1)
     rank = Column(String, nullable=True)  # Basic, Intermediate, Advanced, Master
@@ -316,8 +318,8 @@ class CharacterKnownTechniques(Base):
     __tablename__ = "character_known_techniques"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
-    technique_id = Column(Integer, ForeignKey('techniques.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
+    technique_id = Column(Integer, ForeignKey('techniques.id'), nullable=False, index=True)
     mastery_level = Column(String, default="learned")  # learned, practiced, mastered, perfected
     times_used = Column(Integer, default=0)
     
@@ -370,7 +372,7 @@ class CharacterCondition(Base):
     __tablename__ = "character_conditions"
     
     id = Column(Integer, primary_key=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=False, index=True)
     condition_id = Column(Integer, ForeignKey('conditions.id'), nullable=False)
     duration_rounds = Column(Integer, nullable=True)
     save_dc = Column(Integer, nullable=True)
@@ -384,7 +386,7 @@ class Party(Base):
     __tablename__ = "parties"
     
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     is_active = Column(Boolean, default=True)
     formation_date = Column(DateTime, default=datetime.utcnow)
     shared_gold = Column(Integer, default=0)
@@ -402,7 +404,7 @@ class Session(Base):
     __tablename__ = "sessions"
     
     id = Column(Integer, primary_key=True)
-    session_number = Column(Integer, nullable=False)
+    session_number = Column(Integer, nullable=False, index=True)
     title = Column(String, nullable=False)
     date = Column(DateTime, default=datetime.utcnow)
     duration_minutes = Column(Integer, nullable=True)
@@ -463,7 +465,7 @@ class Encounter(Base):
     notes = Column(Text, nullable=True)
     
     # Foreign Keys
-    session_id = Column(Integer, ForeignKey('sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('sessions.id'), nullable=True, index=True)
     location_id = Column(Integer, ForeignKey('locations.id'), nullable=True)
     
     # Relationships
@@ -475,6 +477,8 @@ class Encounter(Base):
 class EncounterParticipant(Base):
     """Participants in encounters (characters, NPCs, enemies)."""
     __tablename__ = "encounter_participants"
+    # Turn order: the participants of one encounter sorted by initiative.
+    __table_args__ = (Index("ix_encounter_participants_encounter_initiative", "encounter_id", "initiative"),)
     
     id = Column(Integer, primary_key=True)
     encounter_id = Column(Integer, ForeignKey('encounters.id'), nullable=False)
@@ -489,7 +493,7 @@ class EncounterParticipant(Base):
     is_active = Column(Boolean, default=True)
     
     # Foreign Keys (optional, for direct relationships)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=True)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=True, index=True)
     npc_id = Column(Integer, ForeignKey('npcs.id'), nullable=True)
     
     # Relationships
@@ -500,6 +504,11 @@ class EncounterParticipant(Base):
 class DiceRollHistory(Base):
     """History of all dice rolls for transparency."""
     __tablename__ = "dice_roll_history"
+    # Roll logs are read per session / encounter in chronological order.
+    __table_args__ = (
+        Index("ix_dice_roll_history_session_timestamp", "session_id", "timestamp"),
+        Index("ix_dice_roll_history_encounter_timestamp", "encounter_id", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True)
     roller_name = Column(String, nullable=False)
@@ -518,7 +527,7 @@ class DiceRollHistory(Base):
     # Foreign Keys
     session_id = Column(Integer, ForeignKey('sessions.id'), nullable=True)
     encounter_id = Column(Integer, ForeignKey('encounters.id'), nullable=True)
-    character_id = Column(Integer, ForeignKey('characters.id'), nullable=True)
+    character_id = Column(Integer, ForeignKey('characters.id'), nullable=True, index=True)
     
     # Relationships
     session = relationship("Session", back_populates="dice_rolls")
@@ -575,9 +584,9 @@ class CampaignEvent(Base):
     __tablename__ = "campaign_events"
     
     id = Column(Integer, primary_key=True)
-    title = Column(String, nullable=False)
+    title = Column(String, nullable=False, index=True)
     summary_content = Column(Text, nullable=True)
-    day_range_start = Column(Integer, nullable=True)
+    day_range_start = Column(Integer, nullable=True, index=True)
     day_range_end = Column(Integer, nullable=True)
     event_tags_json = Column(JSON, nullable=True)
     full_details_json = Column(JSON, nullable=True)
@@ -585,12 +594,24 @@ class CampaignEvent(Base):
     event_type = Column(String, default="narrative")  # narrative, combat, social, discovery
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class CampaignEventTag(Base):
+    """One normalized tag of a CampaignEvent (kept in sync with event_tags_json by database.event_tags)."""
+    __tablename__ = "campaign_event_tags"
+    __table_args__ = (
+        UniqueConstraint("event_id", "tag"),
+        Index("ix_campaign_event_tags_tag_event", "tag", "event_id"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    event_id = Column(Integer, ForeignKey("campaign_events.id", ondelete="CASCADE"), nullable=False)
+    tag = Column(String, nullable=False)
+
 class DmGuidelineSet(Base):
     """DM guidelines and rules."""
     __tablename__ = "dm_guideline_sets"
     
     id = Column(Integer, primary_key=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     system_base = Column(String, nullable=True)
     setting_description = Column(Text, nullable=True)
     mode_directed = Column(Text, nullable=True)
@@ -647,4 +668,26 @@ class WorldState(Base):
     weather = Column(String, nullable=True)
     time_of_day = Column(String, default="morning")
     season = Column(String, default="spring")
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SeedManifestFile(Base):
+    """Content hash of each data/ file as of the last run of each loader that reads it."""
+    __tablename__ = "seed_manifest_files"
+    __table_args__ = (UniqueConstraint("loader_name", "file_name"),)
+    
+    id = Column(Integer, primary_key=True)
+    loader_name = Column(String, nullable=False)
+    file_name = Column(String, nullable=False)
+    content_hash = Column(String, nullable=False)
+    loaded_at = Column(DateTime, default=datetime.utcnow)
+
+class SeedManifestRecord(Base):
+    """Content hash of each record a data/ file seeded into a table."""
+    __tablename__ = "seed_manifest_records"
+    __table_args__ = (UniqueConstraint("file_name", "table_name", "record_key"),)
+    
+    id = Column(Integer, primary_key=True)
+    file_name = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    record_key = Column(String, nullable=False)  # JSON list of the natural key values
+    content_hash = Column(String, nullable=False)
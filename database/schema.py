@@ -0,0 +1,243 @@
+"""
+Schema versioning for the game database.
+
+The models' metadata is summarized in a fingerprint that is stored in the
+schema_version table. On startup ensure_schema() reads it back with a single query and,
+when it matches, skips all DDL and reflection. A fresh database gets create_all(); an
+out-of-date one is brought up to date by migrate(), which adds missing tables, columns
+and indexes. Changes it cannot apply safely (dropped or retyped columns, or a new NOT
+NULL column without a server_default, which existing rows could not satisfy) are
+reported and have to be handled by hand; such a column stops the migration with
+SchemaOutOfDateError before any DDL runs.
+
+Objects create_all() does not know about (full-text indexes, tables backfilled from
+existing rows) are registered with register_derived(). Their names are part of the
+fingerprint and they are applied when the schema is created or migrated, so a database
+whose fingerprint is current runs none of that DDL on startup.
+
+    python -m database.schema            # migrate the DATABASE_URL database
+    python -m database.schema --check    # only report, exit status 1 if out of date
+"""
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn
+
+from .models import Base
+
+SCHEMA_VERSION_ROW_ID = 1
+
+# Kept outside Base.metadata so it is not part of the fingerprint it stores.
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String, nullable=False),
+    Column("applied_at", DateTime, default=datetime.utcnow),
+)
+
+
+# Table name -> [(name, apply)] of the objects derived from it; see register_derived().
+_derived: dict[str, list[tuple[str, Callable[[Connection], None]]]] = {}
+
+
+class SchemaOutOfDateError(Exception):
+    pass
+
+
+def register_derived(table_name: str, name: str, apply: Callable[[Connection], None]) -> None:
+    """
+    Registers apply(conn) to run whenever a schema containing `table_name` is created or
+    migrated, after the table exists. `name` goes into the fingerprint: a new name (e.g.
+    a bumped version suffix) makes every database migrate, and so apply it, once.
+    """
+    _derived.setdefault(table_name, []).append((name, apply))
+
+
+def _apply_derived(conn, metadata: MetaData) -> None:
+    for table in metadata.sorted_tables:
+        for _, apply in _derived.get(table.name, ()):
+            apply(conn)
+
+
+def schema_fingerprint(metadata: MetaData = Base.metadata) -> str:
+    """sha256 of the tables, columns, keys and indexes declared in `metadata`."""
+    description = []
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        description.append({
+            "table": table.name,
+            "columns": [
+                [c.name, repr(c.type), c.nullable, c.primary_key, bool(c.unique)]
+                for c in table.columns
+            ],
+            "foreign_keys": sorted(f"{fk.parent.name}->{fk.target_fullname}" for fk in table.foreign_keys),
+            "indexes": sorted(
+                [index.name or "", [c.name for c in index.columns], bool(index.unique)]
+                for index in table.indexes
+            ),
+            "derived": sorted(name for name, _ in _derived.get(table.name, ())),
+        })
+    canonical = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def stored_fingerprint(engine: Engine) -> str | None:
+    """The fingerprint recorded in the database, or None if it has never been stamped."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(schema_version.c.fingerprint).where(schema_version.c.id == SCHEMA_VERSION_ROW_ID)
+            ).scalar()
+    except DBAPIError:
+        # No schema_version table yet.
+        return None
+
+
+def _stamp(conn, fingerprint: str) -> None:
+    _version_metadata.create_all(conn)
+    conn.execute(schema_version.delete())
+    conn.execute(schema_version.insert().values(
+        id=SCHEMA_VERSION_ROW_ID, fingerprint=fingerprint, applied_at=datetime.utcnow()
+    ))
+
+
+def pending_changes(engine: Engine, metadata: MetaData = Base.metadata) -> dict:
+    """Compares the live database with `metadata` (reflection; meant for migrations, not startup)."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    # "blocked": model columns ("table.column") that cannot be added automatically.
+    changes = {"tables": [], "columns": [], "indexes": [], "unsupported": [], "blocked": []}
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            changes["tables"].append(table)
+            continue
+        live_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        model_columns = {c.name for c in table.columns}
+        for column in table.columns:
+            if column.name in live_columns:
+                continue
+            if not column.nullable and column.server_default is None:
+                changes["unsupported"].append(
+                    f"column {table.name}.{column.name} is NOT NULL without a server_default"
+                )
+                changes["blocked"].append(f"{table.name}.{column.name}")
+            else:
+                changes["columns"].append(column)
+        changes["unsupported"].extend(
+            f"column {table.name}.{name} exists in the database but not in the models"
+            for name in sorted(live_columns - model_columns)
+        )
+        live_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        addable = live_columns | {c.name for c in changes["columns"] if c.table is table}
+        for index in table.indexes:
+            if index.name in live_indexes:
+                continue
+            if all(c.name in addable for c in index.columns):
+                changes["indexes"].append(index)
+            else:
+                changes["unsupported"].append(f"index {index.name} needs a column that was not added")
+    return changes
+
+
+def migrate(engine: Engine, metadata: MetaData = Base.metadata, verbose: bool = True) -> dict:
+    """
+    Applies the additive changes from pending_changes() and the registered derived
+    objects, and stamps the new fingerprint. Raises SchemaOutOfDateError, without changing
+    anything, if a model column cannot be added automatically.
+    """
+    changes = pending_changes(engine, metadata)
+    if changes["blocked"]:
+        raise SchemaOutOfDateError(
+            "The database schema cannot be migrated automatically; add these NOT NULL columns "
+            f"by hand or give them a server_default: {', '.join(changes['blocked'])}."
+        )
+    with engine.begin() as conn:
+        for table in changes["tables"]:
+            table.create(conn)
+            if verbose:
+                print(f"  created table {table.name}")
+        for column in changes["columns"]:
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {ddl}"))
+            if verbose:
+                print(f"  added column {column.table.name}.{column.name}")
+        for index in changes["indexes"]:
+            # Indexes of tables created above already exist.
+            if index.table in changes["tables"]:
+                continue
+            index.create(conn)
+            if verbose:
+                print(f"  created index {index.name} on {index.table.name}")
+        _apply_derived(conn, metadata)
+        _stamp(conn, schema_fingerprint(metadata))
+    if verbose:
+        for note in changes["unsupported"]:
+            print(f"  not migrated: {note}")
+    return changes
+
+
+def ensure_schema(engine: Engine, auto_migrate: bool = True, metadata: MetaData = Base.metadata) -> str:
+    """
+    Makes sure the database matches the models. Returns "current" (fast path: one query,
+    no DDL), "created" (fresh database) or "migrated". With auto_migrate=False an
+    out-of-date database raises SchemaOutOfDateError instead, as does one that migrate()
+    cannot bring up to date.
+    """
+    fingerprint = schema_fingerprint(metadata)
+    stored = stored_fingerprint(engine)
+    if stored == fingerprint:
+        return "current"
+    if stored is None and not inspect(engine).get_table_names():
+        with engine.begin() as conn:
+            metadata.create_all(conn)
+            _apply_derived(conn, metadata)
+            _stamp(conn, fingerprint)
+        return "created"
+    if not auto_migrate:
+        raise SchemaOutOfDateError(
+            "The database schema does not match the models. Run 'python -m database.schema' to migrate it."
+        )
+    migrate(engine, metadata)
+    return "migrated"
+
+
+def main(argv: list[str] | None = None) -> int:
+    from config import DATABASE_URL
+    from .engine import create_configured_engine
+
+    parser = argparse.ArgumentParser(description="Migrate the game database schema to match the models.")
+    parser.add_argument("--url", default=DATABASE_URL, help="Database URL (default: DATABASE_URL)")
+    parser.add_argument("--check", action="store_true", help="Only report whether a migration is needed")
+    args = parser.parse_args(argv)
+
+    engine = create_configured_engine(args.url)
+    up_to_date = stored_fingerprint(engine) == schema_fingerprint()
+    if args.check:
+        print("Schema is up to date." if up_to_date else "Schema is out of date.")
+        return 0 if up_to_date else 1
+    if up_to_date:
+        print("Schema is up to date; nothing to do.")
+        return 0
+    print(f"Migrating schema at {args.url}...")
+    try:
+        migrate(engine)
+    except SchemaOutOfDateError as e:
+        print(e)
+        return 1
+    print("Schema migrated.")
+    return 0
+
+
+if __name__ == "__main__":
+    # Under -m this file runs as __main__; use the database.schema module instead, which
+    # is the one database.search and friends register their derived objects with.
+    from database.schema import main as schema_main
+    sys.exit(schema_main())
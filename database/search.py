@@ -0,0 +1,292 @@
+"""
+Full-text search over CampaignEvent titles, summaries and tags.
+
+The backend is chosen by dialect:
+
+* SQLite: an FTS5 table (campaign_events_fts) keyed by the event id. Text is accent-folded
+  and reduced with a light Spanish stemmer in Python before it is indexed, and queries
+  go through the same normalization, so "Liang Wuzhao" finds "Liáng Wǔzhào" and
+  "monasterios" finds "Monasterio". Results are ranked with bm25, weighting the title
+  above the tags and the summary. The index follows ORM inserts, updates and deletes in
+  the same transaction; events written by bulk statements are re-indexed when the
+  session commits (see database.bulk_changes).
+* PostgreSQL: a GIN index on to_tsvector('spanish', unaccent(...)) of the same columns,
+  maintained by the database itself and ranked with ts_rank.
+* Anything else (or SQLite without FTS5): the previous ILIKE scan, newest first.
+
+The index is created when the schema is created or migrated (see database.schema);
+searches only check, once per engine, that it exists.
+"""
+import re
+import unicodedata
+import weakref
+from functools import lru_cache
+
+from sqlalchemy import bindparam, desc, event, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from .bulk_changes import on_bulk_change
+from .models import CampaignEvent
+from .schema import register_derived
+
+FTS_TABLE = "campaign_events_fts"
+PG_FTS_INDEX = "ix_campaign_events_fts"
+# bm25 weights for the FTS columns (title, summary, tags).
+FTS_WEIGHTS = (5.0, 1.0, 3.0)
+_REBUILD_BATCH_SIZE = 2000
+
+# Singular suffixes, longest first; plurals are reduced to the singular before these apply.
+_SPANISH_SUFFIXES = sorted(
+    [
+        "amiento", "imiento", "acion", "icion", "cion", "adora", "ador", "ancia", "encia",
+        "mente", "ando", "iendo", "ado", "ido", "ada", "ida", "ar", "er", "ir", "a", "o", "e",
+    ],
+    key=len,
+    reverse=True,
+)
+_VOWELS = frozenset("aeiou")
+_MIN_STEM = 3
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Catalog lookup of the full-text index per dialect.
+_INDEX_EXISTS_SQL = {
+    "sqlite": (text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), FTS_TABLE),
+    "postgresql": (text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), PG_FTS_INDEX),
+}
+# Engines whose full-text index has been found; a missing one is looked up again.
+_index_ready: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def fold_accents(value: str) -> str:
+    """Lowercases and strips diacritics: "Liáng Wǔzhào" -> "liang wuzhao"."""
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _singular_es(word: str) -> str:
+    """Strips a plural ending: luces -> luz, mujeres -> mujer, casas -> casa."""
+    if word.endswith("ces") and len(word) - 3 >= _MIN_STEM - 1:
+        return word[:-3] + "z"
+    if word.endswith("es") and len(word) - 2 >= _MIN_STEM and word[-3] not in _VOWELS:
+        return word[:-2]
+    if word.endswith("s") and len(word) - 1 >= _MIN_STEM:
+        return word[:-1]
+    return word
+
+
+def stem_es(word: str) -> str:
+    """
+    Light Spanish stemmer: reduces a plural to its singular, then strips one
+    derivational/verbal suffix, so both numbers share a stem (mujeres/mujer -> muj).
+    """
+    word = _singular_es(word)
+    for suffix in _SPANISH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def _term(token: str) -> str:
+    return stem_es(token if token.isascii() else fold_accents(token))
+
+
+def search_terms(value: str | None) -> list[str]:
+    """Accent-folded, stemmed tokens of a text, as stored in and queried against the FTS index."""
+    if not value:
+        return []
+    return [_term(token) for token in _WORD_RE.findall(unicodedata.normalize("NFC", value).lower())]
+
+
+def _tags_text(tags) -> str:
+    if isinstance(tags, dict):
+        tags = list(tags.values())
+    if isinstance(tags, (list, tuple)):
+        return " ".join(str(tag) for tag in tags)
+    return str(tags) if tags else ""
+
+
+def _fts_row(event_id: int, title: str | None, summary: str | None, tags) -> dict:
+    return {
+        "rowid": event_id,
+        "title": " ".join(search_terms(title)),
+        "summary": " ".join(search_terms(summary)),
+        "tags": " ".join(search_terms(_tags_text(tags))),
+    }
+
+
+# --- SQLite FTS5 -------------------------------------------------------------------------
+
+def _index_exists(conn: Connection) -> bool:
+    """Whether this dialect's full-text index exists; no DDL, and no query once it was found."""
+    if conn.engine in _index_ready:
+        return True
+    if conn.dialect.name not in _INDEX_EXISTS_SQL:
+        return False
+    query, name = _INDEX_EXISTS_SQL[conn.dialect.name]
+    if conn.execute(query, {"name": name}).first() is None:
+        return False
+    _index_ready.add(conn.engine)
+    return True
+
+
+def _create_sqlite_index(conn: Connection) -> None:
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, summary, tags, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+    except DBAPIError as e:
+        # SQLite built without FTS5.
+        print(f"Full-text search unavailable, falling back to ILIKE: {e}")
+        return
+    rebuild_search_index(conn)
+
+
+def _insert_fts_rows(conn: Connection, rows) -> None:
+    insert_sql = text(f"INSERT INTO {FTS_TABLE} (rowid, title, summary, tags) VALUES (:rowid, :title, :summary, :tags)")
+    while True:
+        batch = rows.fetchmany(_REBUILD_BATCH_SIZE)
+        if not batch:
+            break
+        conn.execute(insert_sql, [_fts_row(*row) for row in batch])
+
+
+_FTS_DELETE_IDS = text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(bindparam("ids", expanding=True))
+_FTS_SOURCE = select(CampaignEvent.id, CampaignEvent.title, CampaignEvent.summary_content, CampaignEvent.event_tags_json)
+
+
+def rebuild_search_index(conn: Connection) -> None:
+    """Re-indexes every CampaignEvent (SQLite only; PostgreSQL maintains its index itself)."""
+    if conn.dialect.name != "sqlite" or not _index_exists(conn):
+        return
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    _insert_fts_rows(conn, conn.execute(_FTS_SOURCE))
+
+
+def reindex_campaign_events(conn: Connection, ids) -> None:
+    """Re-indexes the given CampaignEvent ids (deleted ones drop out); None re-indexes everything."""
+    if ids is None:
+        rebuild_search_index(conn)
+        return
+    if conn.dialect.name != "sqlite" or not _index_exists(conn):
+        return
+    ids = sorted(ids)
+    for start in range(0, len(ids), _REBUILD_BATCH_SIZE):
+        chunk = ids[start:start + _REBUILD_BATCH_SIZE]
+        conn.execute(_FTS_DELETE_IDS, {"ids": chunk})
+        _insert_fts_rows(conn, conn.execute(_FTS_SOURCE.where(CampaignEvent.id.in_(chunk))))
+
+
+def _sqlite_search(conn: Connection, query: str, limit: int) -> list[int]:
+    terms = search_terms(query)
+    if not terms:
+        return []
+    # Every term must match; a trailing * also accepts longer words sharing the stem.
+    match = " ".join(f'"{term}"*' for term in terms)
+    weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+    rows = conn.execute(
+        text(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT :limit"
+        ),
+        {"match": match, "limit": limit},
+    )
+    return [row[0] for row in rows]
+
+
+@event.listens_for(CampaignEvent, "after_insert")
+@event.listens_for(CampaignEvent, "after_update")
+def _index_campaign_event(mapper, connection, target):
+    if connection.dialect.name != "sqlite" or not _index_exists(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": target.id})
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, summary, tags) VALUES (:rowid, :title, :summary, :tags)"),
+        _fts_row(target.id, target.title, target.summary_content, target.event_tags_json),
+    )
+
+
+@event.listens_for(CampaignEvent, "after_delete")
+def _unindex_campaign_event(mapper, connection, target):
+    if connection.dialect.name != "sqlite" or not _index_exists(connection):
+        return
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": target.id})
+
+
+on_bulk_change(CampaignEvent, reindex_campaign_events)
+
+
+# --- PostgreSQL ----------------------------------------------------------------------------
+
+# The indexed expression and the query expression must be identical for the GIN index to apply.
+_PG_DOCUMENT = (
+    "to_tsvector('spanish', dm_unaccent("
+    "coalesce(title, '') || ' ' || coalesce(summary_content, '') || ' ' || coalesce(event_tags_json::text, '')))"
+)
+
+
+def _create_postgres_index(conn: Connection) -> None:
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+            # unaccent() is only STABLE; an IMMUTABLE wrapper can be used in an index expression.
+            conn.execute(text(
+                "CREATE OR REPLACE FUNCTION dm_unaccent(text) RETURNS text AS "
+                "$$ SELECT public.unaccent('public.unaccent', $1) $$ "
+                "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+            ))
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {PG_FTS_INDEX} ON campaign_events USING GIN ({_PG_DOCUMENT})"
+            ))
+    except DBAPIError as e:
+        print(f"Full-text search unavailable, falling back to ILIKE: {e}")
+
+
+def _postgres_search(conn: Connection, query: str, limit: int) -> list[int]:
+    rows = conn.execute(
+        text(
+            f"SELECT id FROM campaign_events, websearch_to_tsquery('spanish', dm_unaccent(:query)) AS query "
+            f"WHERE {_PG_DOCUMENT} @@ query ORDER BY ts_rank({_PG_DOCUMENT}, query) DESC, id DESC LIMIT :limit"
+        ),
+        {"query": query, "limit": limit},
+    )
+    return [row[0] for row in rows]
+
+
+# --- Public API ----------------------------------------------------------------------------
+
+def create_search_index(conn: Connection) -> None:
+    """Creates (and on SQLite fills) the full-text index; run by schema creation and migration."""
+    if conn.dialect.name == "sqlite":
+        _create_sqlite_index(conn)
+    elif conn.dialect.name == "postgresql":
+        _create_postgres_index(conn)
+
+
+register_derived(CampaignEvent.__tablename__, f"{FTS_TABLE}:1", create_search_index)
+
+
+def search_campaign_events(db_session: Session, query: str, limit: int = 10) -> list[CampaignEvent]:
+    """CampaignEvents matching `query`, most relevant first."""
+    conn = db_session.connection()
+    if conn.dialect.name == "sqlite" and _index_exists(conn):
+        ids = _sqlite_search(conn, query, limit)
+    elif conn.dialect.name == "postgresql" and _index_exists(conn):
+        ids = _postgres_search(conn, query, limit)
+    else:
+        pattern = f"%{query}%"
+        return db_session.query(CampaignEvent).filter(
+            or_(
+                CampaignEvent.title.ilike(pattern),
+                CampaignEvent.summary_content.ilike(pattern),
+                CampaignEvent.event_tags_json.ilike(pattern),
+            )
+        ).order_by(desc(CampaignEvent.id)).limit(limit).all()
+
+    if not ids:
+        return []
+    events = {e.id: e for e in db_session.query(CampaignEvent).filter(CampaignEvent.id.in_(ids))}
+    return [events[event_id] for event_id in ids if event_id in events]
@@ -0,0 +1,202 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from database.bulk import BulkLoadStats, bulk_upsert
+from database.models import SeedManifestFile, SeedManifestRecord
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+# session.info key: number of removed rows RecordManifest.finish() had to keep.
+_KEPT_ROWS_KEY = "seed_manifest_kept_rows"
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def record_hash(row: dict) -> str:
+    """sha256 of a row's canonical JSON form (sorted keys; dates and the like as strings)."""
+    canonical = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def unchanged_files(db_session: Session, loader_name: str, digests: dict[str, str]) -> bool:
+    """
+    True if every file in `digests` (name -> hash) had the same content when the loader
+    last ran. Hashes are kept per loader, as several loaders may read the same file.
+    """
+    stored = dict(db_session.execute(
+        select(SeedManifestFile.file_name, SeedManifestFile.content_hash)
+        .where(SeedManifestFile.loader_name == loader_name,
+               SeedManifestFile.file_name.in_(list(digests)))
+    ).all())
+    return stored == digests
+
+
+def record_files(db_session: Session, loader_name: str, digests: dict[str, str]) -> None:
+    """Stores the hashes of the files a loader has just seeded."""
+    rows = [{"loader_name": loader_name, "file_name": name, "content_hash": digest}
+            for name, digest in digests.items()]
+    bulk_upsert(db_session, SeedManifestFile, rows, ["loader_name", "file_name"])
+
+
+def reset_kept_rows(db_session: Session) -> None:
+    """Starts a new count for kept_rows()."""
+    db_session.info.pop(_KEPT_ROWS_KEY, None)
+
+
+def kept_rows(db_session: Session) -> int:
+    """Rows kept by RecordManifest.finish() in this session since reset_kept_rows()."""
+    return db_session.info.get(_KEPT_ROWS_KEY, 0)
+
+
+@dataclass
+class SeedSource:
+    """The data file a loader's rows come from; with full=True every row is re-applied."""
+    file_name: str
+    full: bool = False
+
+
+class RecordManifest:
+    """
+    Tracks the per-record hashes of one (data file, table) pair during a seeding run.
+
+    changed() filters a batch of rows down to those whose content differs from the last
+    run (all of them with SeedSource.full); finish() deletes the rows whose keys no longer
+    appear in the file and stores the new hashes. Rows can be fed in several batches,
+    e.g. while streaming a file.
+
+    Rows referencing a deleted row are handled first, whether or not the database
+    enforces foreign keys: ON DELETE CASCADE dependents (event tags) are deleted and
+    nullable references are set to NULL. A row still referenced through a required foreign
+    key (a technique a character knows) is kept instead, listed in `kept`, and retried on
+    the next run.
+    """
+
+    def __init__(self, db_session: Session, source: SeedSource, model, key_fields: Sequence[str]):
+        self.db_session = db_session
+        self.source = source
+        self.model = model
+        self.key_fields = tuple(key_fields)
+        self.table_name = model.__tablename__
+        self.stored: dict[str, str] = dict(db_session.execute(
+            select(SeedManifestRecord.record_key, SeedManifestRecord.content_hash)
+            .where(SeedManifestRecord.file_name == source.file_name,
+                   SeedManifestRecord.table_name == self.table_name)
+        ).all())
+        self.seen: set[str] = set()
+        self.pending: dict[str, str] = {}
+        self.kept: list[str] = []
+
+    def _record_key(self, row: dict) -> str:
+        return json.dumps([row[field] for field in self.key_fields], ensure_ascii=False, default=str)
+
+    def changed(self, rows: Iterable[dict]) -> list[dict]:
+        result = []
+        for row in rows:
+            key = self._record_key(row)
+            digest = record_hash(row)
+            self.seen.add(key)
+            if self.source.full or self.stored.get(key) != digest:
+                self.pending[key] = digest
+                result.append(row)
+        return result
+
+    def _where_keys(self, keys: list[str]):
+        key_values = [tuple(json.loads(key)) for key in keys]
+        columns = [getattr(self.model, field) for field in self.key_fields]
+        if len(columns) == 1:
+            return columns[0].in_([values[0] for values in key_values])
+        return tuple_(*columns).in_(key_values)
+
+    def _dependents(self):
+        """Foreign keys of other tables that point at this one."""
+        table = self.model.__table__
+        for other in table.metadata.tables.values():
+            for fk in other.foreign_keys:
+                if fk.column.table is table:
+                    yield fk
+
+    def _delete_removed(self, removed: list[str]) -> list[str]:
+        """Deletes the rows of `removed` keys after handling their dependents; returns the keys deleted."""
+        table = self.model.__table__
+        dependents = list(self._dependents())
+        columns = dict.fromkeys([*(table.c[field] for field in self.key_fields), *(fk.column for fk in dependents)])
+        rows = self.db_session.execute(select(*columns).where(self._where_keys(removed))).mappings().all()
+        required = [fk for fk in dependents if (fk.ondelete or "").upper() != "CASCADE" and not fk.parent.nullable]
+        blocked = set()
+        for fk in required:
+            values = {row[fk.column] for row in rows} - {None}
+            if values:
+                in_use = set(self.db_session.scalars(select(fk.parent).where(fk.parent.in_(values)).distinct()))
+                blocked.update(i for i, row in enumerate(rows) if row[fk.column] in in_use)
+        for fk in dependents:
+            values = {row[fk.column] for i, row in enumerate(rows) if i not in blocked} - {None}
+            if not values or fk in required:
+                continue
+            if (fk.ondelete or "").upper() == "CASCADE":
+                self.db_session.execute(delete(fk.parent.table).where(fk.parent.in_(values)))
+            else:
+                self.db_session.execute(
+                    update(fk.parent.table).where(fk.parent.in_(values)).values({fk.parent.name: None})
+                )
+        self.kept = [self._record_key(rows[i]) for i in sorted(blocked)]
+        self.db_session.info[_KEPT_ROWS_KEY] = kept_rows(self.db_session) + len(self.kept)
+        deleted = [self._record_key(row) for i, row in enumerate(rows) if i not in blocked]
+        if deleted:
+            self.db_session.execute(delete(self.model).where(self._where_keys(deleted)))
+        # Keys with no row left in the table only need their manifest record dropped.
+        return [key for key in removed if key not in self.kept]
+
+    def finish(self) -> int:
+        """Applies deletions and saves the manifest; returns the number of rows deleted."""
+        removed = [key for key in self.stored if key not in self.seen]
+        if removed:
+            removed = self._delete_removed(removed)
+        if removed:
+            self.db_session.execute(
+                delete(SeedManifestRecord).where(
+                    SeedManifestRecord.file_name == self.source.file_name,
+                    SeedManifestRecord.table_name == self.table_name,
+                    SeedManifestRecord.record_key.in_(removed),
+                )
+            )
+        if self.pending:
+            bulk_upsert(
+                self.db_session,
+                SeedManifestRecord,
+                [
+                    {"file_name": self.source.file_name, "table_name": self.table_name,
+                     "record_key": key, "content_hash": digest}
+                    for key, digest in self.pending.items()
+                ],
+                ["file_name", "table_name", "record_key"],
+            )
+        return len(removed)
+
+
+def upsert_records(db_session: Session, model, rows: list[dict], key_fields: Sequence[str],
+                   source: SeedSource | None = None) -> BulkLoadStats:
+    """
+    bulk_upsert that, given the source file, only writes rows that changed since the last
+    run and deletes rows that were removed from the file. Without a source it is a plain
+    bulk_upsert.
+    """
+    if source is None:
+        return bulk_upsert(db_session, model, rows, key_fields)
+    manifest = RecordManifest(db_session, source, model, key_fields)
+    stats = bulk_upsert(db_session, model, manifest.changed(rows), key_fields)
+    stats.deleted = manifest.finish()
+    stats.kept = len(manifest.kept)
+    stats.unchanged = len(rows) - stats.rows
+    return stats
@@ -0,0 +1,121 @@
+import asyncio
+
+import aiohttp
+import openai
+
+from config import OPENAI_MAX_CONCURRENCY, OPENAI_TIMEOUT_SECONDS
+
+
+class AsyncChatClient:
+    """
+    Shared asyncio client for chat completions.
+
+    All calls go through one aiohttp session (handed to the openai library via
+    `openai.aiosession`), at most `max_concurrency` requests are in flight at once and
+    each call is cancelled after `timeout` seconds with asyncio.TimeoutError.
+    `api_base`/`api_key` override the global openai settings, e.g. to point at a local
+    stub server in tests.
+    """
+
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, timeout: float = OPENAI_TIMEOUT_SECONDS,
+                 api_base: str | None = None, api_key: str | None = None):
+        if max_concurrency < 1:
+            raise ValueError("AsyncChatClient requires max_concurrency >= 1.")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.api_base = api_base
+        self.api_key = api_key
+        self._loop = None
+        self._semaphore = None
+        self._session = None
+
+    async def _bind_loop(self) -> None:
+        # Semaphores and aiohttp sessions belong to one event loop; rebuild them if the
+        # client is reused from a new loop (e.g. successive asyncio.run calls).
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            old_loop, old_session = self._loop, self._session
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._session = None
+            if old_session is not None and not old_session.closed:
+                if old_loop is None or old_loop.is_closed():
+                    # The loop took the transports with it; closing just releases the connector.
+                    await old_session.close()
+                else:
+                    asyncio.run_coroutine_threadsafe(old_session.close(), old_loop)
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+
+    async def create_chat_completion(self, timeout: float | None = None, **params):
+        """Calls openai.ChatCompletion.acreate under the concurrency limit and timeout."""
+        await self._bind_loop()
+        request_kwargs = dict(params)
+        if self.api_base:
+            request_kwargs["api_base"] = self.api_base
+        if self.api_key:
+            request_kwargs["api_key"] = self.api_key
+        async with self._semaphore:
+            token = openai.aiosession.set(self._session)
+            try:
+                return await asyncio.wait_for(
+                    openai.ChatCompletion.acreate(**request_kwargs),
+                    timeout=timeout if timeout is not None else self.timeout,
+                )
+            finally:
+                openai.aiosession.reset(token)
+
+    async def stream_chat_completion(self, timeout: float | None = None, **params):
+        """
+        Async generator over the streamed chunks of a chat completion. The concurrency slot is
+        held until the stream is exhausted or the generator is closed; `timeout` bounds the
+        wait for the first response and for every following chunk.
+
+        A consumer that may stop early must close the generator, e.g. by iterating inside
+        `async with contextlib.aclosing(client.stream_chat_completion(...))`. An abandoned,
+        unclosed generator keeps its slot until it is garbage collected.
+        """
+        await self._bind_loop()
+        request_kwargs = dict(params, stream=True)
+        if self.api_base:
+            request_kwargs["api_base"] = self.api_base
+        if self.api_key:
+            request_kwargs["api_key"] = self.api_key
+        call_timeout = timeout if timeout is not None else self.timeout
+        semaphore = self._semaphore
+        await semaphore.acquire()
+        iterator = None
+        try:
+            token = openai.aiosession.set(self._session)
+            try:
+                chunks = await asyncio.wait_for(openai.ChatCompletion.acreate(**request_kwargs), timeout=call_timeout)
+            finally:
+                openai.aiosession.reset(token)
+            iterator = chunks.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=call_timeout)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        finally:
+            # Reached on exhaustion, errors and GeneratorExit (aclose()) alike.
+            semaphore.release()
+            if iterator is not None and hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_shared_client: AsyncChatClient | None = None
+
+
+def get_shared_async_client() -> AsyncChatClient:
+    """Process-wide client used by DmAgent and NarrativeEngine unless one is injected."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncChatClient()
+    return _shared_client
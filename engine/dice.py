@@ -0,0 +1,249 @@
+import re
+from dataclasses import dataclass, replace
+from datetime import datetime
+from functools import lru_cache
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database.models import DiceRollHistory
+
+MAX_DICE_PER_TERM = 1000
+MAX_SIDES = 1000
+# Upper bound on chained explosions of one die (a d2 explodes half the time).
+MAX_EXPLOSIONS = 100
+
+_TERM_RE = re.compile(r"\s*([+-])?\s*(?:(\d*)d(\d+|%)((?:[kd][hl]?\d+|!)*)|(\d+))", re.IGNORECASE)
+_MODIFIER_RE = re.compile(r"([kd][hl]?)(\d+)|!", re.IGNORECASE)
+
+
+class DiceExpressionError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class DiceTerm:
+    """NdM with optional keep/drop and exploding dice; `sign` is +1 or -1."""
+    count: int
+    sides: int
+    sign: int = 1
+    keep_highest: int | None = None
+    keep_lowest: int | None = None
+    explode: bool = False
+
+    @property
+    def kept(self) -> int:
+        if self.keep_highest is not None:
+            return self.keep_highest
+        if self.keep_lowest is not None:
+            return self.keep_lowest
+        return self.count
+
+
+@dataclass(frozen=True)
+class DiceExpression:
+    """A parsed dice expression such as "2d20kh1+1d6!+5"."""
+    source: str
+    terms: tuple[DiceTerm, ...]
+    modifier: int = 0
+
+    def with_advantage(self, advantage: bool = False, disadvantage: bool = False) -> "DiceExpression":
+        """
+        Turns the first single d20 into 2d20 keep highest (advantage) or keep lowest
+        (disadvantage). Having both cancels out, as does having neither.
+        """
+        if advantage == disadvantage:
+            return self
+        terms = list(self.terms)
+        for i, term in enumerate(terms):
+            if term.sides == 20 and term.count == 1 and term.kept == 1:
+                terms[i] = replace(term, count=2, keep_highest=1 if advantage else None,
+                                   keep_lowest=1 if disadvantage else None)
+                suffix = " (advantage)" if advantage else " (disadvantage)"
+                return DiceExpression(self.source + suffix, tuple(terms), self.modifier)
+        return self
+
+
+@lru_cache(maxsize=1024)
+def parse_expression(expression: str) -> DiceExpression:
+    """
+    Parses (and caches) a dice expression: NdM terms and integer modifiers joined by + and -.
+    Dice terms accept kh<k>/k<k> (keep highest), kl<k> (keep lowest), dh<k>/dl<k>/d<k>
+    (drop highest/lowest) and ! (exploding: a die showing its maximum rolls again and adds).
+    "d%" is a d100 and "d20" a 1d20.
+    """
+    text = expression.strip()
+    if not text:
+        raise DiceExpressionError("Empty dice expression.")
+    terms = []
+    modifier = 0
+    position = 0
+    while position < len(text):
+        match = _TERM_RE.match(text, position)
+        if match is None or (position > 0 and match.group(1) is None):
+            raise DiceExpressionError(f"Invalid dice expression {expression!r} at position {position}.")
+        sign_text, count_text, sides_text, modifiers, constant = match.groups()
+        sign = -1 if sign_text == "-" else 1
+        position = match.end()
+        if constant is not None:
+            modifier += sign * int(constant)
+            continue
+
+        count = int(count_text) if count_text else 1
+        sides = 100 if sides_text == "%" else int(sides_text)
+        if not 1 <= count <= MAX_DICE_PER_TERM or not 1 <= sides <= MAX_SIDES:
+            raise DiceExpressionError(f"Dice out of range in {expression!r}: {count}d{sides}.")
+        term = DiceTerm(count=count, sides=sides, sign=sign)
+        for keep_match in _MODIFIER_RE.finditer(modifiers):
+            if keep_match.group(0) == "!":
+                if sides == 1:
+                    raise DiceExpressionError(f"A d1 cannot explode in {expression!r}.")
+                term = replace(term, explode=True)
+                continue
+            kind, amount = keep_match.group(1).lower(), int(keep_match.group(2))
+            if amount > count:
+                raise DiceExpressionError(f"Cannot keep or drop {amount} of {count} dice in {expression!r}.")
+            if kind in ("k", "kh"):
+                term = replace(term, keep_highest=amount, keep_lowest=None)
+            elif kind == "kl":
+                term = replace(term, keep_lowest=amount, keep_highest=None)
+            elif kind in ("d", "dl"):
+                term = replace(term, keep_highest=count - amount, keep_lowest=None)
+            elif kind == "dh":
+                term = replace(term, keep_lowest=count - amount, keep_highest=None)
+            else:
+                raise DiceExpressionError(f"Unknown dice modifier {keep_match.group(0)!r} in {expression!r}.")
+        if term.kept < 1:
+            raise DiceExpressionError(f"No dice left to keep in {expression!r}.")
+        terms.append(term)
+    return DiceExpression(source=text, terms=tuple(terms), modifier=modifier)
+
+
+@dataclass
+class RollResult:
+    """One evaluated roll: every die rolled (kept or not), the flat modifier and the total."""
+    expression: str
+    rolls: list[int]
+    modifier: int
+    total: int
+
+    def succeeds(self, target_dc: int | None) -> bool | None:
+        return None if target_dc is None else self.total >= target_dc
+
+
+@dataclass
+class RollBatch:
+    """
+    `n` independent rolls of one expression. `dice` holds one (n, count) array per term
+    (exploded dice carry their accumulated value); `totals` is the (n,) array of results.
+    """
+    expression: DiceExpression
+    dice: list[np.ndarray]
+    totals: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def successes(self, target_dc: int) -> np.ndarray:
+        return self.totals >= target_dc
+
+    def result(self, i: int) -> RollResult:
+        rolls = [int(value) for term_dice in self.dice for value in term_dice[i]]
+        return RollResult(self.expression.source, rolls, self.expression.modifier, int(self.totals[i]))
+
+    def results(self) -> list[RollResult]:
+        return [self.result(i) for i in range(len(self))]
+
+
+class DiceRoller:
+    """
+    Rolls dice expressions with NumPy: a batch of n rolls of an expression draws every die
+    of every roll in one call per term, so resolving dozens of attacks costs about as much
+    as resolving one. Pass `seed` for reproducible sequences.
+    """
+
+    def __init__(self, seed: int | None = None):
+        self.rng = np.random.default_rng(seed)
+
+    def _roll_term(self, term: DiceTerm, n: int) -> tuple[np.ndarray, np.ndarray]:
+        dice = self.rng.integers(1, term.sides + 1, size=(n, term.count))
+        if term.explode:
+            # Compounding explosions: extra rolls are added to the die that exploded.
+            exploding = dice == term.sides
+            for _ in range(MAX_EXPLOSIONS):
+                if not exploding.any():
+                    break
+                extra = self.rng.integers(1, term.sides + 1, size=int(exploding.sum()))
+                dice[exploding] += extra
+                exploding[exploding] = extra == term.sides
+        if term.kept == term.count:
+            subtotal = dice.sum(axis=1)
+        else:
+            ordered = np.sort(dice, axis=1)
+            kept = ordered[:, -term.kept:] if term.keep_highest is not None else ordered[:, :term.kept]
+            subtotal = kept.sum(axis=1)
+        return dice, term.sign * subtotal
+
+    def roll_many(self, expression: str | DiceExpression, n: int, advantage: bool = False,
+                  disadvantage: bool = False) -> RollBatch:
+        """Rolls `expression` n times at once."""
+        parsed = expression if isinstance(expression, DiceExpression) else parse_expression(expression)
+        parsed = parsed.with_advantage(advantage, disadvantage)
+        totals = np.full(n, parsed.modifier, dtype=np.int64)
+        dice = []
+        for term in parsed.terms:
+            term_dice, subtotal = self._roll_term(term, n)
+            dice.append(term_dice)
+            totals += subtotal
+        return RollBatch(parsed, dice, totals)
+
+    def roll(self, expression: str | DiceExpression, advantage: bool = False, disadvantage: bool = False) -> RollResult:
+        return self.roll_many(expression, 1, advantage, disadvantage).result(0)
+
+    def roll_group(self, expressions: Sequence[str]) -> list[RollResult]:
+        """
+        Rolls a list of expressions (e.g. one attack per enemy), batching identical
+        expressions into a single vectorized draw. Results keep the input order.
+        """
+        positions: dict[str, list[int]] = {}
+        for i, expression in enumerate(expressions):
+            positions.setdefault(expression, []).append(i)
+        results: list[RollResult | None] = [None] * len(expressions)
+        for expression, indexes in positions.items():
+            batch = self.roll_many(expression, len(indexes))
+            for j, i in enumerate(indexes):
+                results[i] = batch.result(j)
+        return results
+
+
+def roll_history_row(result: RollResult, roller_name: str, roll_type: str, roller_type: str = "character",
+                     roller_id: int | None = None, target_dc: int | None = None, context: str | None = None,
+                     session_id: int | None = None, encounter_id: int | None = None,
+                     character_id: int | None = None, timestamp: datetime | None = None) -> dict:
+    """Column values of the DiceRollHistory row recording `result`."""
+    return {
+        "roller_name": roller_name,
+        "roller_type": roller_type,
+        "roller_id": roller_id,
+        "roll_type": roll_type,
+        "dice_expression": result.expression,
+        "individual_rolls_json": result.rolls,
+        "modifiers": result.modifier,
+        "total_result": result.total,
+        "target_dc": target_dc,
+        "success": result.succeeds(target_dc),
+        "context": context,
+        "timestamp": timestamp or datetime.utcnow(),
+        "session_id": session_id,
+        "encounter_id": encounter_id,
+        "character_id": character_id,
+    }
+
+
+def record_rolls(db_session: Session, rows: Sequence[dict]) -> int:
+    """Inserts DiceRollHistory rows (from roll_history_row) in one bulk INSERT; the caller commits."""
+    if rows:
+        db_session.execute(insert(DiceRollHistory), list(rows))
+    return len(rows)
@@ -1,9 +1,22 @@
+import asyncio
+from contextlib import aclosing
 import openai
 from openai import OpenAIError
-from config import OPENAI_API_KEY # Import from config
+from config import (
+    OPENAI_API_KEY,
+    NARRATIVE_CACHE_MAX_ENTRIES,
+    NARRATIVE_CACHE_TTL_SECONDS,
+    NARRATIVE_CACHE_DB_PATH,
+)
+from engine.response_cache import ResponseCache
+from engine.async_client import get_shared_async_client
 
 class NarrativeEngine:
-    def __init__(self):
+    model = "gpt-3.5-turbo" # Or your preferred model
+    temperature = 0.7 # Adjust for creativity vs. factuality
+    max_tokens = 150 # Adjust based on desired length
+
+    def __init__(self, cache=None, async_client=None):
         # OpenAI API key is now primarily managed globally by DmAgent or set directly from config.
         # This engine will rely on openai.api_key being set prior to its use.
         if OPENAI_API_KEY and not openai.api_key:
@@ -20,49 +33,198 @@ class NarrativeEngine:
             self.ai_enabled = False
             print("NarrativeEngine Warning: OpenAI API key not configured. AI features will be disabled.")
 
+        # Any object with get(key)/set(key, value) works; default is the configured ResponseCache.
+        if cache is None:
+            cache = ResponseCache(
+                max_entries=NARRATIVE_CACHE_MAX_ENTRIES,
+                ttl_seconds=NARRATIVE_CACHE_TTL_SECONDS,
+                db_path=NARRATIVE_CACHE_DB_PATH,
+            )
+        self.cache = cache
+        self.async_client = async_client
 
-    def generate_description(self, topic: str, context: str = "general fantasy setting", tone: str = "neutral") -> str:
-        if not self.ai_enabled: # Relies on self.ai_enabled set in __init__
-            return f"Narrative Engine AI not configured. Cannot generate description for {topic}."
-        
-        # Check if openai.api_key is actually set (could be unset after __init__ by external factors, though unlikely here)
-        if not openai.api_key:
-            return f"Narrative Engine AI Error: OpenAI API key is missing at time of call. Cannot generate description for {topic}."
-
+    def _build_messages(self, topic: str, context: str, tone: str) -> list[dict]:
         system_message_content = "You are a master storyteller for a role-playing game, skilled in creating vivid and engaging descriptions. Focus on being concise yet evocative."
         
         # Prompt construction can be more sophisticated based on needs
         user_prompt = f"Describe the following topic for a player in a role-playing game: '{topic}'.\n"
         user_prompt += f"Context: {context}.\n"
         user_prompt += f"Tone: {tone}."
+        return [
+            {"role": "system", "content": system_message_content},
+            {"role": "user", "content": user_prompt}
+        ]
 
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo", # Or your preferred model
-                messages=[
-                    {"role": "system", "content": system_message_content},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7, # Adjust for creativity vs. factuality
-                max_tokens=150  # Adjust based on desired length
-            )
-            narrative = response.choices[0].message['content'].strip()
-            return narrative
-        except openai.error.AuthenticationError as e:
+    def _cache_key(self, messages: list[dict]) -> str:
+        return ResponseCache.make_key(self.model, messages, temperature=self.temperature, max_tokens=self.max_tokens)
+
+
+    def _unavailable_message(self, topic: str) -> str | None:
+        if not self.ai_enabled: # Relies on self.ai_enabled set in __init__
+            return f"Narrative Engine AI not configured. Cannot generate description for {topic}."
+        
+        # Check if openai.api_key is actually set (could be unset after __init__ by external factors, though unlikely here)
+        if not openai.api_key:
+            return f"Narrative Engine AI Error: OpenAI API key is missing at time of call. Cannot generate description for {topic}."
+        return None
+
+    def _error_message(self, e: Exception, topic: str) -> str:
+        if isinstance(e, openai.error.AuthenticationError):
             print(f"OpenAI API Authentication Error in NarrativeEngine: {e}")
             return f"Narrative AI Error: Authentication failed. Could not generate description for '{topic}'."
-        except openai.error.APIConnectionError as e:
+        if isinstance(e, openai.error.APIConnectionError):
             print(f"OpenAI API Connection Error in NarrativeEngine: {e}")
             return f"Narrative AI Error: Connection problem. Could not generate description for '{topic}'."
-        except openai.error.RateLimitError as e:
+        if isinstance(e, openai.error.RateLimitError):
             print(f"OpenAI API Rate Limit Error in NarrativeEngine: {e}")
             return f"Narrative AI Error: Rate limit exceeded. Could not generate description for '{topic}'."
-        except openai.error.APIError as e:
+        if isinstance(e, openai.error.APIError):
             print(f"OpenAI API Error in NarrativeEngine: {e}")
             return f"Narrative AI Error: Could not generate description for '{topic}' due to API issue."
+        if isinstance(e, asyncio.TimeoutError):
+            print(f"OpenAI API call timed out in NarrativeEngine: {e}")
+            return f"Narrative AI Error: Request timed out. Could not generate description for '{topic}'."
+        print(f"An unexpected error occurred in NarrativeEngine: {e}")
+        return f"Sorry, an unexpected error occurred while generating the description for '{topic}'."
+
+    def generate_description(self, topic: str, context: str = "general fantasy setting", tone: str = "neutral") -> str:
+        unavailable = self._unavailable_message(topic)
+        if unavailable:
+            return unavailable
+
+        messages = self._build_messages(topic, context, tone)
+        cache_key = self._cache_key(messages)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = openai.ChatCompletion.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
+            narrative = response.choices[0].message['content'].strip()
+            self._store(cache_key, narrative) # Only successful, non-empty completions are cached
+            return narrative
+        except Exception as e:
+            return self._error_message(e, topic)
+
+    async def agenerate_description(self, topic: str, context: str = "general fantasy setting", tone: str = "neutral") -> str:
+        """
+        asyncio variant of generate_description. Calls go through the shared AsyncChatClient
+        (or the one injected in __init__), so many descriptions can be in flight at once.
+        """
+        unavailable = self._unavailable_message(topic)
+        if unavailable:
+            return unavailable
+
+        messages = self._build_messages(topic, context, tone)
+        cache_key = self._cache_key(messages)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        client = self.async_client or get_shared_async_client()
+        try:
+            response = await client.create_chat_completion(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
+            narrative = response.choices[0].message['content'].strip()
+            self._store(cache_key, narrative)
+            return narrative
+        except Exception as e:
+            return self._error_message(e, topic)
+
+    def _store(self, cache_key: str, narrative: str) -> None:
+        """Caches a completed description; an empty completion is not worth serving again."""
+        if narrative:
+            self.cache.set(cache_key, narrative)
+
+    @staticmethod
+    def _delta_content(chunk) -> str:
+        """Text carried by one streamed chat-completion chunk (empty for role/stop chunks)."""
+        if not chunk.choices:
+            return ""
+        return chunk.choices[0].get("delta", {}).get("content") or ""
+
+    def stream_description(self, topic: str, context: str = "general fantasy setting", tone: str = "neutral"):
+        """
+        Like generate_description, but yields the text as tokens arrive from the API.
+        Cache hits and error messages are yielded as a single piece; a fully streamed,
+        non-empty description is stored in the cache once the stream completes.
+        """
+        unavailable = self._unavailable_message(topic)
+        if unavailable:
+            yield unavailable
+            return
+
+        messages = self._build_messages(topic, context, tone)
+        cache_key = self._cache_key(messages)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        pieces = []
+        try:
+            for chunk in openai.ChatCompletion.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True
+            ):
+                piece = self._delta_content(chunk)
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+        except Exception as e:
+            yield ("\n" if pieces else "") + self._error_message(e, topic)
+            return
+        self._store(cache_key, "".join(pieces).strip())
+
+    async def astream_description(self, topic: str, context: str = "general fantasy setting", tone: str = "neutral"):
+        """
+        Async-iterator variant of stream_description using the shared AsyncChatClient.
+        Callers that may stop early should close it (contextlib.aclosing) to free the
+        client's concurrency slot right away.
+        """
+        unavailable = self._unavailable_message(topic)
+        if unavailable:
+            yield unavailable
+            return
+
+        messages = self._build_messages(topic, context, tone)
+        cache_key = self._cache_key(messages)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        client = self.async_client or get_shared_async_client()
+        pieces = []
+        try:
+            # aclosing() frees the client's concurrency slot as soon as this generator is closed.
+            async with aclosing(client.stream_chat_completion(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )) as chunks:
+                async for chunk in chunks:
+                    piece = self._delta_content(chunk)
+                    if piece:
+                        pieces.append(piece)
+                        yield piece
         except Exception as e:
-            print(f"An unexpected error occurred in NarrativeEngine: {e}")
-            return f"Sorry, an unexpected error occurred while generating the description for '{topic}'."
+            yield ("\n" if pieces else "") + self._error_message(e, topic)
+            return
+        self._store(cache_key, "".join(pieces).strip())
 
 # Example Usage (for testing purposes, can be removed or adapted)
 # if __name__ == '__main__':
@@ -0,0 +1,173 @@
+import atexit
+import threading
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from engine.dice import record_rolls
+
+
+class RollLogFullError(RuntimeError):
+    """Raised when the roll log stays at its backpressure limit for longer than the caller may wait."""
+
+
+class RollLog:
+    """
+    Write-behind buffer for DiceRollHistory rows (see engine.dice.roll_history_row).
+
+    log()/log_many() only append to an in-memory list, so a turn that logs hundreds of
+    rolls never waits on the database. A background thread writes the buffer with one bulk
+    INSERT and one commit per batch, on its own session, whenever `batch_size` rows are
+    pending or `flush_interval` seconds have passed. flush() (also used at the end of an
+    encounter) waits until everything logged so far is written, and close() runs at
+    interpreter exit so no roll is lost on shutdown.
+
+    At most `max_pending` rows may be buffered or in flight; beyond that, log() blocks for
+    up to `put_timeout` seconds while the writer catches up and then raises
+    RollLogFullError. A batch that keeps failing after `max_retries` attempts is dropped
+    and counted in `dropped`.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] | None = None, batch_size: int = 200,
+                 flush_interval: float = 1.0, max_pending: int = 10000, put_timeout: float | None = 5.0,
+                 max_retries: int = 3):
+        if session_factory is None:
+            from database.engine import get_session
+            session_factory = get_session
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+
+        self._pending: list[dict] = []
+        self._in_flight = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        atexit.register(self.close)
+
+    @property
+    def pending(self) -> int:
+        """Rows logged but not yet committed."""
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def stats(self) -> dict:
+        """A consistent snapshot of the counters, safe to call from any thread."""
+        with self._cond:
+            return {"pending": len(self._pending) + self._in_flight, "written": self.written,
+                    "batches": self.batches, "failures": self.failures, "dropped": self.dropped}
+
+    def log(self, row: dict) -> None:
+        self.log_many([row])
+
+    def log_many(self, rows: Iterable[dict]) -> None:
+        rows = list(rows)
+        if not rows:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("RollLog is closed.")
+            deadline = None if self.put_timeout is None else time.monotonic() + self.put_timeout
+            # An oversized batch is still accepted once the buffer is empty.
+            while self._pending or self._in_flight:
+                if len(self._pending) + self._in_flight + len(rows) <= self.max_pending:
+                    break
+                self._flush_requested = True
+                self._cond.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise RollLogFullError(f"Roll log has {self.max_pending} rows waiting to be written.")
+                self._cond.wait(remaining)
+            self._pending.extend(rows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="roll-log-writer", daemon=True)
+                self._thread.start()
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until every row logged so far is written (or dropped); False on timeout."""
+        with self._cond:
+            if self._thread is None:
+                return not self._pending
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def encounter_ended(self, timeout: float | None = None) -> bool:
+        """Flushes the rolls of an encounter that has just finished."""
+        return self.flush(timeout)
+
+    def close(self) -> None:
+        """Writes what is left and stops the writer thread. Safe to call more than once."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._closed or self._flush_requested or len(self._pending) >= self.batch_size,
+                    self.flush_interval,
+                )
+                if not self._pending:
+                    self._flush_requested = False
+                    if self._closed:
+                        return
+                    continue
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                self._in_flight = len(batch)
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Whatever goes wrong (no database, a malformed row), the writer must survive
+                # and release the batch, or flush() and log() would wait on it forever.
+                print(f"Dropping {len(batch)} dice rolls: {e}")
+                with self._cond:
+                    self.dropped += len(batch)
+            finally:
+                with self._cond:
+                    self._in_flight = 0
+                    if not self._pending:
+                        self._flush_requested = False
+                    self._cond.notify_all()
+
+    def _write(self, batch: list[dict]) -> None:
+        """Writes one batch, retrying database errors; anything else propagates to _run()."""
+        for attempt in range(1, self.max_retries + 1):
+            db_session = self.session_factory()
+            try:
+                record_rolls(db_session, batch)
+                db_session.commit()
+                with self._cond:
+                    self.written += len(batch)
+                    self.batches += 1
+                return
+            except SQLAlchemyError as e:
+                db_session.rollback()
+                with self._cond:
+                    self.failures += 1
+                print(f"Error writing {len(batch)} dice rolls (attempt {attempt}/{self.max_retries}): {e}")
+            finally:
+                db_session.close()
+            time.sleep(0.05 * attempt)
+        with self._cond:
+            self.dropped += len(batch)
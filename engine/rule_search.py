@@ -0,0 +1,218 @@
+import heapq
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+# Match types in ranking order: a better match type always outranks a smaller edit distance.
+MATCH_RANKS = {"exact": 0, "alias": 1, "prefix": 2, "fuzzy": 3}
+# At most this many fuzzy candidates (those sharing the most trigrams) reach the edit distance.
+MAX_FUZZY_CANDIDATES = 32
+
+
+def normalize_term(text: str) -> str:
+    """
+    Folds a keyword or alias for matching: strips accents/diacritics ("Liáng" -> "liang"),
+    lowercases and collapses any run of non-alphanumeric characters into a single "_".
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    parts = []
+    word = []
+    for ch in folded:
+        if ch.isalnum():
+            word.append(ch)
+        elif word:
+            parts.append("".join(word))
+            word = []
+    if word:
+        parts.append("".join(word))
+    return "_".join(parts)
+
+
+def _trigrams(term: str) -> set:
+    padded = f"$${term}$$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _default_max_distance(term: str) -> int:
+    if len(term) <= 4:
+        return 1
+    if len(term) <= 8:
+        return 2
+    return 3
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int | None:
+    """Edit distance between a and b, or None as soon as it is known to exceed max_distance."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = previous[j - 1] + (ca != cb)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current.append(cost)
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def extract_aliases(rule) -> list[str]:
+    """
+    Reads the optional "aliases" of a rule. Either a flat list (["atacar", "attaquer"])
+    or a per-language mapping ({"es": ["atacar"], "fr": "attaquer"}).
+    """
+    if not isinstance(rule, dict):
+        return []
+    aliases = rule.get("aliases")
+    if isinstance(aliases, str):
+        return [aliases]
+    if isinstance(aliases, list):
+        return [a for a in aliases if isinstance(a, str)]
+    if isinstance(aliases, dict):
+        flattened = []
+        for value in aliases.values():
+            if isinstance(value, str):
+                flattened.append(value)
+            elif isinstance(value, list):
+                flattened.extend(a for a in value if isinstance(a, str))
+        return flattened
+    return []
+
+
+class RuleKeywordIndex:
+    """
+    Search index over rule keywords and their aliases.
+
+    Every keyword and alias is normalized into a term; terms and their "_"-separated tokens
+    (so "attack" reaches "attack_melee") are kept in a sorted list for prefix lookups by
+    bisection (a flattened trie) and in a trigram posting index that prunes fuzzy candidates
+    before the bounded edit distance is computed.
+
+    Postings are sorted by term length, so a fuzzy lookup only counts the terms whose length
+    is within the edit distance; of those sharing enough trigrams, at most
+    MAX_FUZZY_CANDIDATES (the ones sharing the most) are compared with the edit distance.
+    Each term's keywords are sorted by rank, so a term shared by thousands of keywords
+    offers only the first `limit`.
+
+    `postings_visited` and `candidates_compared` count the work done by fuzzy lookups so
+    far, as a machine-independent measure of search cost.
+    """
+
+    def __init__(self):
+        self._exact: dict[str, str] = {}
+        self._aliases: dict[str, set] = {}
+        self._entries: dict[str, set] = {}
+        self._sorted_entries: list[str] = []
+        # trigram -> (term lengths, terms), both sorted by length.
+        self._postings: dict[str, tuple[list[int], list[str]]] = {}
+        self.postings_visited = 0
+        self.candidates_compared = 0
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def add(self, keyword: str, aliases: list[str] = ()) -> None:
+        term = normalize_term(keyword)
+        if not term:
+            return
+        self._exact.setdefault(term, keyword)
+        self._add_entry(term, keyword)
+        for alias in aliases:
+            alias_term = normalize_term(alias)
+            if alias_term:
+                self._aliases.setdefault(alias_term, set()).add(keyword)
+                self._add_entry(alias_term, keyword)
+
+    def _add_entry(self, term: str, keyword: str) -> None:
+        for entry in {term, *term.split("_")}:
+            if entry:
+                self._entries.setdefault(entry, set()).add(keyword)
+
+    def freeze(self) -> None:
+        """Builds the prefix and trigram structures. Must be called after the last add()."""
+        self._entries = {
+            entry: tuple(sorted(keywords, key=lambda k: (len(k), k)))
+            for entry, keywords in self._entries.items()
+        }
+        self._sorted_entries = sorted(self._entries)
+        postings: dict[str, list[str]] = {}
+        for entry in sorted(self._sorted_entries, key=len):
+            for gram in _trigrams(entry):
+                postings.setdefault(gram, []).append(entry)
+        self._postings = {gram: ([len(e) for e in entries], entries) for gram, entries in postings.items()}
+
+    def search(self, query: str, limit: int = 5, fuzzy: bool = True, max_distance: int | None = None) -> list[dict]:
+        """
+        Returns up to `limit` matches ranked by match type (exact, alias, prefix, fuzzy),
+        then edit distance, then keyword length. Each keyword appears at most once.
+        """
+        term = normalize_term(query)
+        if not term:
+            return []
+        best: dict[str, dict] = {}
+
+        def offer(keyword: str, matched: str, match_type: str, distance: int) -> None:
+            candidate = {"keyword": keyword, "matched": matched, "match_type": match_type, "distance": distance}
+            current = best.get(keyword)
+            if current is None or self._rank(candidate) < self._rank(current):
+                best[keyword] = candidate
+
+        if term in self._exact:
+            offer(self._exact[term], term, "exact", 0)
+        for keyword in self._aliases.get(term, ()):
+            offer(keyword, term, "alias", 0)
+
+        entries = self._sorted_entries
+        for i in range(bisect_left(entries, term), len(entries)):
+            entry = entries[i]
+            if not entry.startswith(term):
+                break
+            # Keywords of one term share match type and distance, so only the first `limit` can rank.
+            for keyword in self._entries[entry][:limit]:
+                offer(keyword, entry, "prefix", len(entry) - len(term))
+            if len(best) >= limit * 4:
+                break
+
+        if fuzzy and len(best) < limit:
+            if max_distance is None:
+                max_distance = _default_max_distance(term)
+            for entry, distance in self._fuzzy_entries(term, max_distance):
+                for keyword in self._entries[entry][:limit]:
+                    offer(keyword, entry, "fuzzy", distance)
+
+        return sorted(best.values(), key=self._rank)[:limit]
+
+    def _fuzzy_entries(self, term: str, max_distance: int):
+        query_grams = _trigrams(term)
+        # q-gram lemma: each edit destroys at most 3 trigrams of the query.
+        min_shared = max(1, len(query_grams) - 3 * max_distance)
+        shortest, longest = len(term) - max_distance, len(term) + max_distance
+        counts: dict[str, int] = {}
+        for gram in query_grams:
+            lengths, entries = self._postings.get(gram, ((), ()))
+            start, stop = bisect_left(lengths, shortest), bisect_right(lengths, longest)
+            self.postings_visited += stop - start
+            for i in range(start, stop):
+                entry = entries[i]
+                counts[entry] = counts.get(entry, 0) + 1
+        candidates = heapq.nsmallest(
+            MAX_FUZZY_CANDIDATES,
+            ((-shared, entry) for entry, shared in counts.items() if shared >= min_shared),
+        )
+        self.candidates_compared += len(candidates)
+        for _, entry in candidates:
+            distance = bounded_levenshtein(term, entry, max_distance)
+            if distance is not None:
+                yield entry, distance
+
+    @staticmethod
+    def _rank(match: dict) -> tuple:
+        return (MATCH_RANKS[match["match_type"]], match["distance"], len(match["keyword"]), match["keyword"])
@@ -1,74 +1,191 @@
 import json
+import threading
+from itertools import chain
+from typing import Callable
+
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from database.models import RuleSet # Assuming RuleSet is defined in your models
+from engine.rule_search import RuleKeywordIndex, extract_aliases
+
+# Bumped when a session that wrote RuleSet rows (through the unit of work or a bulk
+# statement) commits. A RuleIndex remembers the generation it was compiled at, so any
+# committed change made by any session in this process marks every index as stale.
+_ruleset_generation = 0
+_DIRTY_KEY = "ruleset_dirty"
+
+def _bump_ruleset_generation():
+    global _ruleset_generation
+    _ruleset_generation += 1
+
+@event.listens_for(Session, "after_flush")
+def _mark_dirty_on_flush(session, flush_context):
+    # new/dirty/deleted still describe the pre-flush state at this point.
+    if any(isinstance(obj, RuleSet) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info[_DIRTY_KEY] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dirty_on_bulk_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, RuleSet):
+            orm_execute_state.session.info[_DIRTY_KEY] = True
+
+# Bumping at flush time would let another thread compile pre-commit rules under the
+# new generation and keep them after a rollback.
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop(_DIRTY_KEY, False):
+        _bump_ruleset_generation()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_changes(session):
+    session.info.pop(_DIRTY_KEY, None)
+
+def _parse_rules_json(ruleset: RuleSet):
+    """Returns the deserialized rules of a RuleSet, or None if missing/malformed."""
+    if ruleset.rules_json is None:
+        return None
+    # SQLAlchemy's JSON type usually deserializes the column already,
+    # but rows written as raw strings still need json.loads().
+    if isinstance(ruleset.rules_json, str):
+        try:
+            return json.loads(ruleset.rules_json)
+        except json.JSONDecodeError as je:
+            print(f"JSONDecodeError for ruleset '{ruleset.name}': {je}. Rules: '{ruleset.rules_json}'")
+            return None
+    return ruleset.rules_json
+
+
+class RuleIndex:
+    """
+    Compiled keyword -> (ruleset_name, rule) hash index over all RuleSet rows.
+    Rulesets are visited in id order and the first ruleset defining a keyword wins,
+    matching the precedence of the original linear scan. Keywords and their optional
+    "aliases" are also fed to a RuleKeywordIndex for prefix and fuzzy search.
+    """
+
+    def __init__(self):
+        self._rules: dict = {}
+        self._keyword_index = RuleKeywordIndex()
+        self._generation: int | None = None
+        self.ruleset_count = 0
+
+    @property
+    def is_stale(self) -> bool:
+        return self._generation != _ruleset_generation
+
+    def invalidate(self) -> None:
+        self._generation = None
+
+    def build(self, db_session: Session) -> None:
+        # Read the generation before querying so a change racing with the build
+        # leaves the index stale instead of silently missing it.
+        generation = _ruleset_generation
+        rulesets = db_session.query(RuleSet).order_by(RuleSet.id).all()
+
+        rules = {}
+        for ruleset in rulesets:
+            rules_data = _parse_rules_json(ruleset)
+            if isinstance(rules_data, list):
+                # A list of rule objects, e.g., [{"keyword": "attack", "details": ...}, ...]
+                for rule in rules_data:
+                    if isinstance(rule, dict):
+                        keyword = rule.get("keyword")
+                        if isinstance(keyword, str):
+                            rules.setdefault(keyword, (ruleset.name, rule))
+            elif isinstance(rules_data, dict):
+                # A dictionary where keys are action_keywords, e.g., {"attack": {"details": ...}, ...}
+                for keyword, rule in rules_data.items():
+                    rules.setdefault(keyword, (ruleset.name, rule))
+
+        keyword_index = RuleKeywordIndex()
+        for keyword, (_, rule) in rules.items():
+            if isinstance(keyword, str):
+                keyword_index.add(keyword, extract_aliases(rule))
+        keyword_index.freeze()
+
+        self._rules = rules
+        self._keyword_index = keyword_index
+        self.ruleset_count = len(rulesets)
+        # Rules read from a session with uncommitted RuleSet changes are used once and
+        # rebuilt on the next lookup, since those changes may still be rolled back.
+        self._generation = None if db_session.info.get(_DIRTY_KEY) else generation
+
+    def lookup(self, keyword: str) -> tuple | None:
+        return self._rules.get(keyword)
+
+    def search(self, query: str, limit: int = 5, fuzzy: bool = True) -> list[dict]:
+        """Ranked exact/alias/prefix/fuzzy matches for query; see RuleKeywordIndex.search."""
+        return self._keyword_index.search(query, limit=limit, fuzzy=fuzzy)
+
 
 class RulesEngine:
-    def __init__(self, db_session: Session):
-        if db_session is None:
+    """
+    Resolves action keywords against the RuleSet rows. The engine either holds one
+    session or, with `session_provider`, asks for the caller's current session whenever
+    the rule index has to be rebuilt (e.g. DmAgent's per-request session), so a single
+    engine can be shared by concurrent requests.
+    """
+
+    def __init__(self, db_session: Session = None, session_provider: Callable[[], Session] | None = None):
+        if db_session is None and session_provider is None:
             raise ValueError("RulesEngine requires a valid database session.")
         self.db_session = db_session
+        self.session_provider = session_provider
+        self.rule_index = RuleIndex()
+        self._build_lock = threading.Lock()
         print("RulesEngine initialized with database session.")
 
-    def check_rule(self, action_keyword: str, character_id: int = None) -> dict:
+    def _get_rule_index(self) -> RuleIndex:
+        """Returns the compiled rule index, rebuilding it if a RuleSet changed since the last build."""
+        if self.rule_index.is_stale:
+            # One thread rebuilds; the others wait and then reuse its result.
+            with self._build_lock:
+                if self.rule_index.is_stale:
+                    db_session = self.session_provider() if self.session_provider else self.db_session
+                    self.rule_index.build(db_session)
+        return self.rule_index
+
+    def _resolve(self, rule_index: RuleIndex, action_keyword: str, fuzzy: bool = False) -> dict:
+        if rule_index.ruleset_count == 0:
+            return {"outcome": "no_rulesets", "message": "No rulesets found in the database."}
+
+        matched_keyword = action_keyword
+        match = rule_index.lookup(action_keyword)
+        if not (match and match[1]) and fuzzy:
+            # Fall back to the best alias/prefix/fuzzy hit, e.g. "atacar" -> "attack_melee"
+            for candidate in rule_index.search(action_keyword, limit=1):
+                matched_keyword = candidate["keyword"]
+                match = rule_index.lookup(matched_keyword)
+
+        if match and match[1]:
+            ruleset_name_origin, found_rule_detail = match
+            result = {
+                "outcome": "success",
+                "ruleset_name": ruleset_name_origin,
+                "rule_applied": found_rule_detail,
+                "message": f"Rule for '{action_keyword}' found in ruleset '{ruleset_name_origin}'."
+            }
+            if matched_keyword != action_keyword:
+                result["matched_keyword"] = matched_keyword
+                result["message"] = f"Rule for '{action_keyword}' matched '{matched_keyword}' in ruleset '{ruleset_name_origin}'."
+            return result
+        else:
+            return {
+                "outcome": "not_found",
+                "message": f"No specific rule found for action '{action_keyword}' across all rulesets."
+            }
+
+    def check_rule(self, action_keyword: str, character_id: int = None, fuzzy: bool = False) -> dict:
         """
         Checks for rules related to a given action_keyword.
         Character_id is not used yet but is a placeholder for future rule personalization.
+        With fuzzy=True an action without an exact rule resolves to the best alias, prefix
+        or edit-distance match, reported as "matched_keyword".
         """
         try:
-            all_rulesets = self.db_session.query(RuleSet).all()
-            if not all_rulesets:
-                return {"outcome": "no_rulesets", "message": "No rulesets found in the database."}
-
-            found_rule_detail = None
-            ruleset_name_origin = None
-
-            for ruleset in all_rulesets:
-                if ruleset.rules_json is None:
-                    continue # Skip if rules field is null
-
-                try:
-                    # The 'rules' field in RuleSet model is expected to be JSON.
-                    # SQLAlchemy's JSON type might automatically deserialize it to Python dict/list.
-                    # If it's a string, json.loads() is needed.
-                    if isinstance(ruleset.rules_json, str):
-                        rules_data = json.loads(ruleset.rules_json)
-                    else:
-                        rules_data = ruleset.rules_json  # Assumed to be already parsed Python object by SQLAlchemy
-                
-                except json.JSONDecodeError as je:
-                    print(f"JSONDecodeError for ruleset '{ruleset.name}': {je}. Rules: '{ruleset.rules_json}'")
-                    continue # Skip this ruleset if JSON is malformed
-
-                if isinstance(rules_data, list):
-                    # Assumes a list of rule objects, e.g., [{"keyword": "attack", "details": ...}, ...]
-                    for rule in rules_data:
-                        if isinstance(rule, dict) and rule.get("keyword") == action_keyword:
-                            found_rule_detail = rule
-                            ruleset_name_origin = ruleset.name
-                            break 
-                elif isinstance(rules_data, dict):
-                    # Assumes a dictionary where keys are action_keywords, e.g., {"attack": {"details": ...}, ...}
-                    if action_keyword in rules_data:
-                        found_rule_detail = rules_data[action_keyword]
-                        ruleset_name_origin = ruleset.name
-                        break 
-                
-                if found_rule_detail:
-                    break # Found a rule, no need to check other rulesets
-
-            if found_rule_detail:
-                return {
-                    "outcome": "success",
-                    "ruleset_name": ruleset_name_origin,
-                    "rule_applied": found_rule_detail,
-                    "message": f"Rule for '{action_keyword}' found in ruleset '{ruleset_name_origin}'."
-                }
-            else:
-                return {
-                    "outcome": "not_found",
-                    "message": f"No specific rule found for action '{action_keyword}' across all rulesets."
-                }
-
+            return self._resolve(self._get_rule_index(), action_keyword, fuzzy)
         except Exception as e:
             # Catching generic Exception to ensure some response, but more specific errors are better.
             # For example, SQLAlchemyError for database issues.
@@ -78,6 +195,47 @@ class RulesEngine:
             # print(traceback.format_exc())
             return {"outcome": "error", "message": f"An error occurred while checking rules for '{action_keyword}'."}
 
+    def check_rules(self, actions: list, fuzzy: bool = False) -> list[dict]:
+        """
+        Resolves several actions at once, e.g. the move/attack/technique parts of a compound
+        player action. Each item is either an action keyword or an (action_keyword, character_id)
+        tuple. The rule index is refreshed at most once for the whole batch and the results are
+        returned in the same order as `actions`, each tagged with its "action_keyword".
+        """
+        keywords = [action[0] if isinstance(action, (tuple, list)) else action for action in actions]
+        try:
+            rule_index = self._get_rule_index()
+        except Exception as e:
+            print(f"Error in RulesEngine.check_rules: {e}")
+            return [
+                {"outcome": "error", "action_keyword": keyword,
+                 "message": f"An error occurred while checking rules for '{keyword}'."}
+                for keyword in keywords
+            ]
+
+        results = []
+        for keyword in keywords:
+            result = self._resolve(rule_index, keyword, fuzzy)
+            result["action_keyword"] = keyword
+            results.append(result)
+        return results
+
+    def search_rules(self, query: str, limit: int = 5, fuzzy: bool = True) -> list[dict]:
+        """
+        Ranked keyword search over all rules and their aliases. Each hit carries the matched
+        "keyword", "match_type" (exact, alias, prefix or fuzzy), "distance", "ruleset_name"
+        and "rule".
+        """
+        try:
+            rule_index = self._get_rule_index()
+            hits = rule_index.search(query, limit=limit, fuzzy=fuzzy)
+        except Exception as e:
+            print(f"Error in RulesEngine.search_rules: {e}")
+            return []
+        for hit in hits:
+            hit["ruleset_name"], hit["rule"] = rule_index.lookup(hit["keyword"])
+        return hits
+
 # Example of how to add a RuleSet (for manual testing with a DB session)
 # if __name__ == '__main__':
 #     from sqlalchemy import create_engine
@@ -0,0 +1,355 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.models import (
+    Character, CharacterKnownTechniques, Encounter, EncounterParticipant, Npc, Technique,
+)
+from engine.dice import DiceExpressionError, DiceRoller, parse_expression
+
+PARTY = "party"
+ENEMIES = "enemies"
+DEFAULT_MAX_ROUNDS = 20
+# Below this many trials a single process is faster than starting a pool.
+PARALLEL_THRESHOLD = 20000
+
+_DICE_IN_TEXT_RE = re.compile(r"\d*d\d+(?:\s*[+-]\s*\d+)?", re.IGNORECASE)
+
+# (difficulty, minimum party win rate, maximum share of party hp lost); first match wins.
+DIFFICULTY_BANDS = (
+    ("trivial", 0.99, 0.15),
+    ("easy", 0.95, 0.35),
+    ("medium", 0.80, 0.60),
+    ("hard", 0.50, 1.00),
+)
+
+
+@dataclass(frozen=True)
+class TechniqueOption:
+    """An attack a combatant can pay mana for instead of its basic attack."""
+    name: str
+    damage: str
+    attack_bonus: int
+    mana_cost: int = 0
+
+
+@dataclass(frozen=True)
+class Combatant:
+    name: str
+    side: str
+    hp: int
+    armor_class: int
+    attack_bonus: int
+    damage: str
+    initiative_bonus: int = 0
+    mana: int = 0
+    techniques: tuple[TechniqueOption, ...] = ()
+
+
+def average_damage(expression: str) -> float:
+    """Expected value of a dice expression, ignoring keep/drop and explosions."""
+    parsed = parse_expression(expression)
+    return parsed.modifier + sum(term.sign * term.kept * (term.sides + 1) / 2 for term in parsed.terms)
+
+
+def damage_expression(text: str | None) -> str | None:
+    """The first dice expression in a free-text damage string ("2d6+3 de fuego" -> "2d6+3")."""
+    if not text:
+        return None
+    match = _DICE_IN_TEXT_RE.search(text)
+    if match is None:
+        return None
+    expression = match.group(0).replace(" ", "")
+    try:
+        parse_expression(expression)
+    except DiceExpressionError:
+        return None
+    return expression
+
+
+# --- Loading combatants from an encounter --------------------------------------------------
+
+def _modifier(score: int | None) -> int:
+    return ((score or 10) - 10) // 2
+
+
+def _default_enemy(name: str, level: int) -> Combatant:
+    level = max(level or 1, 1)
+    return Combatant(
+        name=name, side=ENEMIES, hp=6 + 5 * level, armor_class=12 + level // 4,
+        attack_bonus=3 + level // 3, damage=f"1d6+{1 + level // 2}",
+    )
+
+
+def _character_combatant(db_session: Session, character: Character, side: str) -> Combatant:
+    attacks = [(a.attack_bonus or 0, damage_expression(a.damage_dice)) for a in character.attacks]
+    attacks = [(bonus, damage) for bonus, damage in attacks if damage]
+    if attacks:
+        attack_bonus, damage = max(attacks, key=lambda attack: average_damage(attack[1]))
+    else:
+        # Unarmed strike with the better of Strength and Dexterity.
+        modifier = max(_modifier(character.strength_score), _modifier(character.dexterity_score))
+        attack_bonus, damage = (character.proficiency_bonus or 2) + modifier, f"1d6{modifier:+d}"
+
+    techniques = []
+    known = db_session.scalars(
+        select(Technique).join(CharacterKnownTechniques, CharacterKnownTechniques.technique_id == Technique.id)
+        .where(CharacterKnownTechniques.character_id == character.id)
+    )
+    for technique in known:
+        technique_damage = damage_expression(technique.damage_string)
+        if technique_damage:
+            techniques.append(TechniqueOption(
+                name=technique.name, damage=technique_damage,
+                attack_bonus=character.spell_attack_bonus or attack_bonus,
+                mana_cost=technique.mana_cost or 0,
+            ))
+    techniques.sort(key=lambda t: average_damage(t.damage), reverse=True)
+    return Combatant(
+        name=character.name, side=side, hp=character.hp_current or character.hp_max or 1,
+        armor_class=character.armor_class or 10, attack_bonus=attack_bonus, damage=damage,
+        initiative_bonus=character.initiative_bonus or _modifier(character.dexterity_score),
+        mana=character.mana_current or 0, techniques=tuple(techniques),
+    )
+
+
+def _npc_combatant(npc: Npc, side: str) -> Combatant:
+    default = _default_enemy(npc.name, npc.level)
+    stats = npc.stats_json if isinstance(npc.stats_json, dict) else {}
+    return Combatant(
+        name=npc.name, side=side, hp=npc.hp_current or npc.hp_max or default.hp,
+        armor_class=npc.armor_class or default.armor_class,
+        attack_bonus=int(stats.get("attack_bonus", default.attack_bonus)),
+        damage=damage_expression(stats.get("damage")) or default.damage,
+    )
+
+
+def combatants_for_encounter(db_session: Session, encounter_id: int) -> list[Combatant]:
+    """
+    Combatants of an encounter's active participants. Characters bring their best attack
+    and their damaging techniques; NPCs their sheet (attack_bonus/damage from stats_json);
+    other enemies get stats scaled to the encounter's expected_party_level. A participant
+    with quantity N becomes N combatants.
+    """
+    encounter = db_session.get(Encounter, encounter_id)
+    if encounter is None:
+        raise ValueError(f"Encounter {encounter_id} not found.")
+    participants = db_session.scalars(
+        select(EncounterParticipant)
+        .where(EncounterParticipant.encounter_id == encounter_id, EncounterParticipant.is_active.is_(True))
+        .order_by(EncounterParticipant.id)
+    )
+    combatants = []
+    for participant in participants:
+        side = PARTY if participant.participant_type in ("character", "ally") else ENEMIES
+        if participant.character_id or participant.participant_type == "character":
+            character = participant.character or db_session.get(Character, participant.entity_id)
+            if character is None:
+                continue
+            combatant = _character_combatant(db_session, character, side)
+        elif participant.npc_id or participant.participant_type == "npc":
+            npc = participant.npc or db_session.get(Npc, participant.entity_id)
+            combatant = (_npc_combatant(npc, side) if npc is not None
+                         else _default_enemy(participant.entity_name, encounter.expected_party_level))
+        else:
+            combatant = _default_enemy(participant.entity_name, encounter.expected_party_level)
+        quantity = max(participant.quantity or 1, 1)
+        for i in range(quantity):
+            name = combatant.name if quantity == 1 else f"{combatant.name} {i + 1}"
+            combatants.append(replace(combatant, name=name, side=side))
+    return combatants
+
+
+# --- Simulation ----------------------------------------------------------------------------
+
+@dataclass
+class SimulationResult:
+    """Aggregated outcome of `trials` simulated fights; rates are fractions of all trials."""
+    trials: int = 0
+    party_wins: int = 0
+    enemy_wins: int = 0
+    resolved_rounds: int = 0
+    party_hp_lost: float = 0.0
+    party_mana_spent: float = 0.0
+    party_downed: float = 0.0
+    technique_uses: dict[str, int] = field(default_factory=dict)
+
+    def merge(self, other: "SimulationResult") -> "SimulationResult":
+        self.trials += other.trials
+        self.party_wins += other.party_wins
+        self.enemy_wins += other.enemy_wins
+        self.resolved_rounds += other.resolved_rounds
+        self.party_hp_lost += other.party_hp_lost
+        self.party_mana_spent += other.party_mana_spent
+        self.party_downed += other.party_downed
+        for name, uses in other.technique_uses.items():
+            self.technique_uses[name] = self.technique_uses.get(name, 0) + uses
+        return self
+
+    @property
+    def win_rate(self) -> float:
+        return self.party_wins / self.trials if self.trials else 0.0
+
+    @property
+    def loss_rate(self) -> float:
+        return self.enemy_wins / self.trials if self.trials else 0.0
+
+    @property
+    def expected_rounds(self) -> float:
+        """Mean length of the fights that ended within the round limit."""
+        resolved = self.party_wins + self.enemy_wins
+        return self.resolved_rounds / resolved if resolved else float("nan")
+
+    @property
+    def hp_lost_share(self) -> float:
+        """Mean share of the party's starting hp lost by the end of the fight."""
+        return self.party_hp_lost / self.trials if self.trials else 0.0
+
+    @property
+    def mana_spent(self) -> float:
+        return self.party_mana_spent / self.trials if self.trials else 0.0
+
+    @property
+    def members_downed(self) -> float:
+        return self.party_downed / self.trials if self.trials else 0.0
+
+    def difficulty(self) -> str:
+        for label, min_win_rate, max_hp_lost in DIFFICULTY_BANDS:
+            if self.win_rate >= min_win_rate and self.hp_lost_share <= max_hp_lost:
+                return label
+        return "deadly"
+
+    def summary(self) -> str:
+        return (
+            f"Dificultad estimada: {self.difficulty()} ({self.trials} simulaciones). "
+            f"Victoria del grupo: {self.win_rate:.0%}, derrota: {self.loss_rate:.0%}. "
+            f"Rondas esperadas: {self.expected_rounds:.1f}. "
+            f"PG perdidos: {self.hp_lost_share:.0%}, maná gastado: {self.mana_spent:.1f}, "
+            f"miembros caídos: {self.members_downed:.2f}."
+        )
+
+
+def _simulate_chunk(combatants: Sequence[Combatant], trials: int, seed, max_rounds: int) -> SimulationResult:
+    roller = DiceRoller(seed)
+    rng = roller.rng
+    count = len(combatants)
+    party = np.array([c.side == PARTY for c in combatants])
+    armor_class = np.array([c.armor_class for c in combatants])
+    start_hp = np.array([c.hp for c in combatants], dtype=np.int64)
+    start_mana = np.array([c.mana for c in combatants], dtype=np.int64)
+    hp = np.tile(start_hp, (trials, 1))
+    mana = np.tile(start_mana, (trials, 1))
+    # Initiative is fixed across trials: highest bonus first, ties in participant order.
+    order = sorted(range(count), key=lambda i: -combatants[i].initiative_bonus)
+    opponents = [np.flatnonzero(party != party[i]) for i in range(count)]
+
+    ongoing = np.ones(trials, dtype=bool)
+    rounds = np.zeros(trials, dtype=np.int64)
+    technique_uses: dict[str, int] = {}
+    for round_number in range(1, max_rounds + 1):
+        # Only fights still going are simulated; their rows are copied out and back per round.
+        live = np.flatnonzero(ongoing)
+        rounds[live] = round_number
+        live_hp, live_mana = hp[live], mana[live]
+        for i in order:
+            combatant = combatants[i]
+            acting = np.flatnonzero(live_hp[:, i] > 0)
+            targets_alive = live_hp[np.ix_(acting, opponents[i])] > 0
+            has_target = targets_alive.any(axis=1)
+            acting, targets_alive = acting[has_target], targets_alive[has_target]
+            if not acting.size:
+                continue
+            # A random living opponent in each fight.
+            target = opponents[i][np.argmax(rng.random(targets_alive.shape) * targets_alive, axis=1)]
+
+            bonus = np.full(acting.size, combatant.attack_bonus)
+            damage = np.zeros(acting.size, dtype=np.int64)
+            chosen = np.zeros(acting.size, dtype=bool)
+            for technique in combatant.techniques:
+                use = ~chosen & (live_mana[acting, i] >= technique.mana_cost)
+                uses = int(use.sum())
+                if not uses:
+                    continue
+                bonus[use] = technique.attack_bonus
+                damage[use] = roller.roll_many(technique.damage, uses).totals
+                live_mana[acting[use], i] -= technique.mana_cost
+                chosen |= use
+                technique_uses[technique.name] = technique_uses.get(technique.name, 0) + uses
+            basic = ~chosen
+            damage[basic] = roller.roll_many(combatant.damage, int(basic.sum())).totals
+
+            d20 = rng.integers(1, 21, size=acting.size)
+            hits = (d20 == 20) | ((d20 != 1) & (d20 + bonus >= armor_class[target]))
+            live_hp[acting, target] -= np.where(hits, np.maximum(damage, 0), 0)
+        hp[live], mana[live] = live_hp, live_mana
+
+        party_standing = (hp[:, party] > 0).any(axis=1)
+        enemies_standing = (hp[:, ~party] > 0).any(axis=1)
+        ongoing &= party_standing & enemies_standing
+        if not ongoing.any():
+            break
+
+    party_standing = (hp[:, party] > 0).any(axis=1)
+    enemies_standing = (hp[:, ~party] > 0).any(axis=1)
+    party_won = party_standing & ~enemies_standing
+    enemies_won = enemies_standing & ~party_standing
+    party_max_hp = max(int(start_hp[party].sum()), 1)
+    hp_lost = (start_hp[party] - np.clip(hp[:, party], 0, None)).sum(axis=1)
+    return SimulationResult(
+        trials=trials,
+        party_wins=int(party_won.sum()),
+        enemy_wins=int(enemies_won.sum()),
+        resolved_rounds=int(rounds[party_won | enemies_won].sum()),
+        party_hp_lost=float(hp_lost.sum() / party_max_hp),
+        party_mana_spent=float((start_mana[party] - mana[:, party]).sum()),
+        party_downed=float((hp[:, party] <= 0).sum()),
+        technique_uses=technique_uses,
+    )
+
+
+def simulate(combatants: Sequence[Combatant], trials: int = 5000, seed: int | None = None,
+             max_rounds: int = DEFAULT_MAX_ROUNDS, workers: int | None = None,
+             chunk_size: int = 10000) -> SimulationResult:
+    """
+    Runs `trials` fights between the PARTY and ENEMIES combatants, all trials advancing
+    together as NumPy arrays: each round every living combatant, in initiative order,
+    attacks a random living opponent, using its best affordable technique (paying mana)
+    or its basic attack. A natural 20 always hits and a natural 1 always misses. Fights
+    still going after `max_rounds` count as neither a win nor a loss.
+
+    Runs of PARALLEL_THRESHOLD trials or more are split into `chunk_size` chunks over a
+    process pool (`workers` processes; workers=1 keeps everything in this process). The
+    chunks get independent seeds from `seed`, so a seeded run is reproducible for a given
+    chunk_size.
+    """
+    if not any(c.side == PARTY for c in combatants) or not any(c.side == ENEMIES for c in combatants):
+        raise ValueError("A simulation needs at least one combatant on each side.")
+    chunks = [chunk_size] * (trials // chunk_size)
+    if trials % chunk_size:
+        chunks.append(trials % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    combatants = list(combatants)
+
+    result = SimulationResult()
+    if trials < PARALLEL_THRESHOLD or len(chunks) == 1 or workers == 1:
+        for size, chunk_seed in zip(chunks, seeds):
+            result.merge(_simulate_chunk(combatants, size, chunk_seed, max_rounds))
+        return result
+    max_workers = min(workers or os.cpu_count() or 1, len(chunks))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for chunk_result in pool.map(_simulate_chunk, [combatants] * len(chunks), chunks, seeds,
+                                     [max_rounds] * len(chunks)):
+            result.merge(chunk_result)
+    return result
+
+
+def simulate_encounter(db_session: Session, encounter_id: int, trials: int = 5000, seed: int | None = None,
+                       **options) -> SimulationResult:
+    """simulate() over the combatants of an encounter (see combatants_for_encounter)."""
+    return simulate(combatants_for_encounter(db_session, encounter_id), trials=trials, seed=seed, **options)
@@ -0,0 +1,250 @@
+import math
+from typing import Callable, Iterable
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from database.models import EncounterParticipant
+
+# A 5e cone is as wide at its end as it is long: about 53 degrees across.
+DEFAULT_CONE_ANGLE = math.degrees(2 * math.atan(0.5))
+
+
+def _segment_distance_sq(px: float, py: float, x0: float, y0: float, x1: float, y1: float) -> float:
+    dx, dy = x1 - x0, y1 - y0
+    length_sq = dx * dx + dy * dy
+    t = 0.0 if length_sq == 0 else max(0.0, min(1.0, ((px - x0) * dx + (py - y0) * dy) / length_sq))
+    cx, cy = x0 + t * dx - px, y0 + t * dy - py
+    return cx * cx + cy * cy
+
+
+class SpatialGrid:
+    """
+    Uniform grid over participant positions: each id lives in the cell containing its
+    (x, y), so a query only looks at the ids in the cells its shape overlaps instead of
+    every participant. Moving within a cell is a dict write; crossing cells moves the id
+    between two sets. Units are whatever the positions use (squares, feet); `cell_size`
+    should be close to the typical query radius.
+
+    Queries take an optional `predicate` on ids (e.g. only enemies) and return ids in
+    order of distance from the query origin.
+    """
+
+    def __init__(self, cell_size: float = 10):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive.")
+        self.cell_size = cell_size
+        self._positions: dict[int, tuple[float, float]] = {}
+        self._cells: dict[tuple[int, int], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._positions
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def position(self, item_id: int) -> tuple[float, float] | None:
+        return self._positions.get(item_id)
+
+    def insert(self, item_id: int, x: float, y: float) -> None:
+        if item_id in self._positions:
+            self.move(item_id, x, y)
+            return
+        self._positions[item_id] = (x, y)
+        self._cells.setdefault(self._cell(x, y), set()).add(item_id)
+
+    def move(self, item_id: int, x: float, y: float) -> None:
+        old_x, old_y = self._positions[item_id]
+        old_cell, new_cell = self._cell(old_x, old_y), self._cell(x, y)
+        if old_cell != new_cell:
+            self._discard_from_cell(old_cell, item_id)
+            self._cells.setdefault(new_cell, set()).add(item_id)
+        self._positions[item_id] = (x, y)
+
+    def remove(self, item_id: int) -> None:
+        x, y = self._positions.pop(item_id)
+        self._discard_from_cell(self._cell(x, y), item_id)
+
+    def _discard_from_cell(self, cell: tuple[int, int], item_id: int) -> None:
+        members = self._cells[cell]
+        members.discard(item_id)
+        if not members:
+            del self._cells[cell]
+
+    def _ids_in_box(self, min_x: float, min_y: float, max_x: float, max_y: float) -> Iterable[int]:
+        (cx0, cy0), (cx1, cy1) = self._cell(min_x, min_y), self._cell(max_x, max_y)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # Box covers more cells than are occupied: walk the occupied ones instead.
+            for (cx, cy), members in self._cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    yield from members
+            return
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                members = self._cells.get((cx, cy))
+                if members:
+                    yield from members
+
+    def _sorted_by_distance(self, x: float, y: float, ids: Iterable[int]) -> list[int]:
+        positions = self._positions
+        return sorted(ids, key=lambda i: (positions[i][0] - x) ** 2 + (positions[i][1] - y) ** 2)
+
+    def within_radius(self, x: float, y: float, radius: float,
+                      predicate: Callable[[int], bool] | None = None) -> list[int]:
+        """Ids within `radius` of (x, y), e.g. the targets of a fireball centred there."""
+        radius_sq = radius * radius
+        positions = self._positions
+        found = []
+        for item_id in self._ids_in_box(x - radius, y - radius, x + radius, y + radius):
+            px, py = positions[item_id]
+            if (px - x) ** 2 + (py - y) ** 2 <= radius_sq and (predicate is None or predicate(item_id)):
+                found.append(item_id)
+        return self._sorted_by_distance(x, y, found)
+
+    def in_cone(self, x: float, y: float, toward_x: float, toward_y: float, length: float,
+                angle: float = DEFAULT_CONE_ANGLE, predicate: Callable[[int], bool] | None = None) -> list[int]:
+        """
+        Ids in a cone from (x, y) aimed at (toward_x, toward_y), `length` long and `angle`
+        degrees wide. The origin itself is excluded.
+        """
+        dx, dy = toward_x - x, toward_y - y
+        norm = math.hypot(dx, dy)
+        if norm == 0:
+            raise ValueError("A cone needs a direction.")
+        dx, dy = dx / norm, dy / norm
+        min_cos = math.cos(math.radians(angle) / 2)
+        positions = self._positions
+        found = []
+        for item_id in self.within_radius(x, y, length, predicate):
+            px, py = positions[item_id][0] - x, positions[item_id][1] - y
+            distance = math.hypot(px, py)
+            if distance > 0 and (px * dx + py * dy) / distance >= min_cos:
+                found.append(item_id)
+        return found
+
+    def along_line(self, x0: float, y0: float, x1: float, y1: float, width: float = 5,
+                   predicate: Callable[[int], bool] | None = None) -> list[int]:
+        """Ids within width/2 of the segment from (x0, y0) to (x1, y1), e.g. a lightning bolt."""
+        half_width_sq = (width / 2) ** 2
+        reach = width / 2
+        # Cells along the segment, sampled every half cell and widened by the line's reach.
+        steps = max(1, math.ceil(math.hypot(x1 - x0, y1 - y0) / (self.cell_size / 2)))
+        margin = math.ceil(reach / self.cell_size)
+        centres = {self._cell(x0 + (x1 - x0) * step / steps, y0 + (y1 - y0) * step / steps)
+                   for step in range(steps + 1)}
+        cells = {(cx + mx, cy + my) for cx, cy in centres
+                 for mx in range(-margin, margin + 1) for my in range(-margin, margin + 1)}
+        positions = self._positions
+        found = []
+        for cell in cells:
+            for item_id in self._cells.get(cell, ()):
+                px, py = positions[item_id]
+                if (_segment_distance_sq(px, py, x0, y0, x1, y1) <= half_width_sq
+                        and (predicate is None or predicate(item_id))):
+                    found.append(item_id)
+        return self._sorted_by_distance(x0, y0, found)
+
+    def line_of_sight(self, from_id: int, to_id: int, clearance: float = 2.5) -> bool:
+        """True if no other id stands within `clearance` of the straight line between the two."""
+        (x0, y0), (x1, y1) = self._positions[from_id], self._positions[to_id]
+        blockers = self.along_line(x0, y0, x1, y1, width=2 * clearance,
+                                   predicate=lambda item_id: item_id not in (from_id, to_id))
+        return not blockers
+
+    def nearest(self, x: float, y: float, count: int = 1,
+                predicate: Callable[[int], bool] | None = None) -> list[int]:
+        """The `count` ids closest to (x, y), searching outwards ring by ring of cells."""
+        if not self._positions:
+            return []
+        ox, oy = self._cell(x, y)
+        # Far enough to reach the most distant occupied cell.
+        max_radius = self.cell_size * math.sqrt(2) * (1 + max(
+            max(abs(cx - ox), abs(cy - oy)) for cx, cy in self._cells
+        ))
+        radius = self.cell_size
+        while True:
+            found = self.within_radius(x, y, radius, predicate)
+            if len(found) >= count or radius >= max_radius:
+                return found[:count]
+            radius *= 2
+
+
+class EncounterSpatialIndex(SpatialGrid):
+    """
+    SpatialGrid over the positioned, active participants of one encounter. Moves are
+    tracked, and persist() writes position_x/position_y of the moved participants only.
+    """
+
+    def __init__(self, encounter_id: int, cell_size: float = 10):
+        super().__init__(cell_size)
+        self.encounter_id = encounter_id
+        self.participant_types: dict[int, str] = {}
+        self._moved: set[int] = set()
+
+    @classmethod
+    def from_encounter(cls, db_session: Session, encounter_id: int, cell_size: float = 10) -> "EncounterSpatialIndex":
+        index = cls(encounter_id, cell_size)
+        rows = db_session.execute(
+            select(EncounterParticipant.id, EncounterParticipant.participant_type,
+                   EncounterParticipant.position_x, EncounterParticipant.position_y)
+            .where(EncounterParticipant.encounter_id == encounter_id, EncounterParticipant.is_active.is_(True),
+                   EncounterParticipant.position_x.is_not(None), EncounterParticipant.position_y.is_not(None))
+        )
+        for participant_id, participant_type, x, y in rows:
+            index.participant_types[participant_id] = participant_type
+            SpatialGrid.insert(index, participant_id, x, y)
+        return index
+
+    def insert(self, item_id: int, x: float, y: float, participant_type: str | None = None) -> None:
+        if participant_type is not None:
+            self.participant_types[item_id] = participant_type
+        super().insert(item_id, x, y)
+        self._moved.add(item_id)
+
+    def move(self, item_id: int, x: float, y: float) -> None:
+        super().move(item_id, x, y)
+        self._moved.add(item_id)
+
+    def place(self, db_session: Session, participant_id: int, x: float, y: float) -> None:
+        """
+        Moves a participant, or places one that has no position yet once it is confirmed to
+        be an active participant of this encounter (its type is loaded for of_type()).
+        Raises ValueError for any other id.
+        """
+        if participant_id in self:
+            self.move(participant_id, x, y)
+            return
+        row = db_session.execute(
+            select(EncounterParticipant.participant_type)
+            .where(EncounterParticipant.id == participant_id,
+                   EncounterParticipant.encounter_id == self.encounter_id,
+                   EncounterParticipant.is_active.is_(True))
+        ).first()
+        if row is None:
+            raise ValueError(f"Participant {participant_id} is not an active participant of encounter {self.encounter_id}.")
+        self.insert(participant_id, x, y, participant_type=row.participant_type)
+
+    def remove(self, item_id: int) -> None:
+        super().remove(item_id)
+        self.participant_types.pop(item_id, None)
+        self._moved.discard(item_id)
+
+    def of_type(self, *participant_types: str) -> Callable[[int], bool]:
+        """Predicate for the queries: only participants of the given types (e.g. "enemy")."""
+        wanted = set(participant_types)
+        return lambda item_id: self.participant_types.get(item_id) in wanted
+
+    def persist(self, db_session: Session) -> int:
+        """Writes the positions of the participants moved since the last persist(); the caller commits."""
+        rows = [
+            {"id": item_id, "position_x": round(x), "position_y": round(y)}
+            for item_id in self._moved if item_id in self
+            for x, y in [self.position(item_id)]
+        ]
+        if rows:
+            db_session.execute(update(EncounterParticipant), rows)
+        self._moved.clear()
+        return len(rows)
@@ -0,0 +1,237 @@
+import heapq
+import itertools
+from dataclasses import dataclass, field
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from database.models import Encounter, EncounterParticipant
+
+
+@dataclass(order=True)
+class _Entry:
+    # Higher initiative first, then higher tiebreak, then whoever joined first.
+    key: tuple
+    participant_id: int = field(compare=False)
+
+
+class TurnOrder:
+    """
+    Initiative order of one encounter, kept in two heaps: participants still to act this
+    round and participants waiting for the next one. Advancing a turn pops one heap and
+    pushes the other, O(log n); when the round's heap runs out the heaps swap. Leaving or
+    delaying only replaces a participant's entry, and stale heap entries are skipped when
+    popped (and compacted away once they outnumber the live ones).
+
+    Changes are tracked field by field; persist() writes just those columns:
+    current_round/current_turn and the has_acted of whoever acted on a turn, is_active
+    or initiative on leaves and delays, and turn_order_json (participant ids in initiative
+    order) only when the line-up itself changes. current_turn counts the turns taken in
+    the current round.
+    """
+
+    def __init__(self, encounter_id: int | None = None, round_number: int = 1):
+        self.encounter_id = encounter_id
+        self.round_number = round_number
+        self.turn_index = 0
+        self.current: int | None = None
+        self.active = False
+        self._this_round: list[_Entry] = []
+        self._next_round: list[_Entry] = []
+        self._entries: dict[int, _Entry] = {}
+        self._acted: dict[int, bool] = {}
+        self._initiative: dict[int, int] = {}
+        self._tiebreak: dict[int, float] = {}
+        self._sequence = itertools.count()
+        self._stale = 0
+        self._changed_participants: dict[int, dict] = {}
+        self._changed_encounter: dict = {}
+        self._order_changed = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, participant_id: int) -> bool:
+        return participant_id in self._entries
+
+    # --- Building and loading -----------------------------------------------------------
+
+    @classmethod
+    def from_encounter(cls, db_session: Session, encounter_id: int) -> "TurnOrder":
+        """Rebuilds the order of an encounter from its active participants' initiative and has_acted."""
+        encounter = db_session.get(Encounter, encounter_id)
+        if encounter is None:
+            raise ValueError(f"Encounter {encounter_id} not found.")
+        order = cls(encounter_id, round_number=encounter.current_round or 1)
+        order.turn_index = encounter.current_turn or 0
+        participants = db_session.execute(
+            select(EncounterParticipant.id, EncounterParticipant.initiative, EncounterParticipant.has_acted)
+            .where(EncounterParticipant.encounter_id == encounter_id, EncounterParticipant.is_active.is_(True))
+            .order_by(EncounterParticipant.id)
+        ).all()
+        for participant_id, initiative, has_acted in participants:
+            order._insert(participant_id, initiative if initiative is not None else 10, 0, acted=bool(has_acted))
+        order._order_changed = encounter.turn_order_json != order.order()
+        if encounter.status == "active":
+            # The turn in progress belongs to the first participant who has not acted yet.
+            order.active = True
+            order.current = order._pop_this_round()
+        return order
+
+    def _key(self, participant_id: int) -> tuple:
+        return (-self._initiative[participant_id], -self._tiebreak[participant_id], next(self._sequence))
+
+    def _insert(self, participant_id: int, initiative: int, tiebreak: float, acted: bool) -> None:
+        self._initiative[participant_id] = initiative
+        self._tiebreak[participant_id] = tiebreak
+        self._acted[participant_id] = acted
+        entry = _Entry(self._key(participant_id), participant_id)
+        self._entries[participant_id] = entry
+        heapq.heappush(self._next_round if acted else self._this_round, entry)
+
+    def _acts_later_this_round(self, participant_id: int) -> bool:
+        """Whether a participant that has not acted yet still gets a turn in the current round."""
+        if self.current is None:
+            return True
+        current = (-self._initiative[self.current], -self._tiebreak[self.current])
+        return (-self._initiative[participant_id], -self._tiebreak[participant_id]) >= current
+
+    def _replace_entry(self, participant_id: int) -> None:
+        """Gives a participant a new heap entry (after a delay); the old one goes stale."""
+        entry = _Entry(self._key(participant_id), participant_id)
+        self._entries[participant_id] = entry
+        self._stale += 1
+        heapq.heappush(self._next_round if self._acted[participant_id] else self._this_round, entry)
+        self._compact_if_needed()
+
+    def _compact_if_needed(self) -> None:
+        if self._stale <= max(len(self._entries), 16):
+            return
+        live = set(map(id, self._entries.values()))
+        self._this_round = [e for e in self._this_round if id(e) in live]
+        self._next_round = [e for e in self._next_round if id(e) in live]
+        heapq.heapify(self._this_round)
+        heapq.heapify(self._next_round)
+        self._stale = 0
+
+    def _changed(self, participant_id: int, **values) -> None:
+        self._changed_participants.setdefault(participant_id, {}).update(values)
+
+    # --- Turns --------------------------------------------------------------------------
+
+    def add(self, participant_id: int, initiative: int, tiebreak: float = 0) -> None:
+        """
+        Adds a participant mid-encounter. It acts this round if its initiative comes after
+        the current turn, otherwise from the next round. Ties on initiative go to the higher
+        tiebreak (e.g. Dexterity or a roll-off), then to whoever joined first.
+        """
+        if participant_id in self._entries:
+            raise ValueError(f"Participant {participant_id} is already in the turn order.")
+        self._initiative[participant_id] = initiative
+        self._tiebreak[participant_id] = tiebreak
+        acted = not self._acts_later_this_round(participant_id)
+        self._insert(participant_id, initiative, tiebreak, acted)
+        self._changed(participant_id, has_acted=acted, initiative=initiative, is_active=True)
+        self._order_changed = True
+
+    def remove(self, participant_id: int) -> None:
+        """Takes a participant out of the order (fled, defeated); its turn is skipped from now on."""
+        if self._entries.pop(participant_id, None) is None:
+            raise ValueError(f"Participant {participant_id} is not in the turn order.")
+        self._stale += 1
+        if self.current == participant_id:
+            self.current = None
+        self._changed(participant_id, is_active=False)
+        self._order_changed = True
+        self._compact_if_needed()
+
+    def delay(self, participant_id: int, new_initiative: int) -> int | None:
+        """
+        Moves a participant to a lower initiative for good. The current actor (or anyone
+        who has not acted yet) then takes its turn later this round; delaying the current
+        actor hands the turn to the next in line, which is returned.
+        """
+        if participant_id not in self._entries:
+            raise ValueError(f"Participant {participant_id} is not in the turn order.")
+        if new_initiative > self._initiative[participant_id]:
+            raise ValueError("A participant can only delay to a lower initiative.")
+        self._initiative[participant_id] = new_initiative
+        self._replace_entry(participant_id)
+        self._changed(participant_id, initiative=new_initiative)
+        self._order_changed = True
+        if self.current == participant_id:
+            self.current = self._pop_this_round()
+        return self.current
+
+    def _pop_this_round(self) -> int | None:
+        while self._this_round:
+            entry = heapq.heappop(self._this_round)
+            if self._entries.get(entry.participant_id) is entry:
+                return entry.participant_id
+            self._stale -= 1
+        return None
+
+    def advance(self) -> int | None:
+        """
+        Ends the current turn and returns the participant whose turn it is now (None if
+        nobody is left). The first call starts the encounter and marks it active.
+        """
+        if self.current is not None:
+            self._acted[self.current] = True
+            heapq.heappush(self._next_round, self._entries[self.current])
+            self._changed(self.current, has_acted=True)
+            self.turn_index += 1
+            self.current = None
+
+        self.current = self._pop_this_round()
+        if self.current is None and self._next_round:
+            # New round: everybody may act again.
+            self._this_round, self._next_round = self._next_round, []
+            self.round_number += 1
+            self.turn_index = 0
+            for participant_id in self._entries:
+                self._acted[participant_id] = False
+                self._changed(participant_id, has_acted=False)
+            self.current = self._pop_this_round()
+        self._changed_encounter.update(current_round=self.round_number, current_turn=self.turn_index)
+        if not self.active and self.current is not None:
+            self.active = True
+            self._changed_encounter["status"] = "active"
+        return self.current
+
+    def order(self) -> list[int]:
+        """Every participant in initiative order (O(n log n); for display and turn_order_json)."""
+        return [entry.participant_id for entry in sorted(self._entries.values())]
+
+    def remaining_this_round(self) -> list[int]:
+        """Participants still to act this round, in order, after the current one."""
+        return [entry.participant_id for entry in sorted(self._this_round)
+                if self._entries.get(entry.participant_id) is entry]
+
+    # --- Persistence --------------------------------------------------------------------
+
+    def persist(self, db_session: Session) -> int:
+        """
+        Writes the fields changed since the last persist() with bulk UPDATEs by primary key
+        and returns the number of rows touched. The caller commits.
+        """
+        if self.encounter_id is None:
+            raise ValueError("TurnOrder has no encounter to persist to.")
+        encounter_values = dict(self._changed_encounter)
+        if self._order_changed:
+            encounter_values["turn_order_json"] = self.order()
+        touched = 0
+        if encounter_values:
+            db_session.execute(update(Encounter).where(Encounter.id == self.encounter_id).values(**encounter_values))
+            touched += 1
+        # Rows are grouped by the set of columns they change so each group is one executemany.
+        by_columns: dict[tuple, list[dict]] = {}
+        for participant_id, values in self._changed_participants.items():
+            by_columns.setdefault(tuple(sorted(values)), []).append({"id": participant_id, **values})
+        for rows in by_columns.values():
+            db_session.execute(update(EncounterParticipant), rows)
+            touched += len(rows)
+        self._changed_participants.clear()
+        self._changed_encounter.clear()
+        self._order_changed = False
+        return touched
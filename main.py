@@ -1,7 +1,17 @@
 import json  # For parsing JSON arguments from CLI
 import os  # For checking DEBUG_DM_PROMPT in main's startup message
+import re
 from agent.dm_agent import DmAgent
-from config import DATABASE_URL  # Import DATABASE_URL from config
+from config import DATABASE_URL, STREAM_RESPONSES  # Import DATABASE_URL from config
+from database.event_tags import TagExpressionError
+from engine.dice import DiceExpressionError
+
+def print_stream(prefix: str, pieces) -> None:
+    """Prints streamed response pieces as they arrive, on a single line after `prefix`."""
+    print(prefix, end="", flush=True)
+    for piece in pieces:
+        print(piece, end="", flush=True)
+    print()
 
 def main():
     # Use DATABASE_URL from config by default for the DmAgent.
@@ -53,38 +63,72 @@ def main():
                 print("  help                          - Show this help message.")
                 print("  say <text>                    - Send <text> to the DM (AI processed).")
                 print("  describe <topic>              - Get an AI-generated description of <topic>.")
-                print("  check rule <keyword>          - Check rules for <keyword>.")
+                print("  cache stats                   - Show hit/miss counters of the description cache.")
+                print("  check rule <keyword>[, ...]   - Check rules for one or more comma-separated keywords.")
+                print("  search rule <text>            - Ranked prefix/fuzzy/alias search over rule keywords.")
                 print("  addchar <name> <level> <class> <race> - Add a new basic character.")
                 print("    Example: addchar Frodo 1 Hobbit Rogue")
                 print("  getchar <name>                - Get detailed character sheet for <name>.")
                 print("  setworld '<event_desc>' '<effects_json>' - Set/update the world state.")
                 print("    Example: setworld \"A red sun rises\" '[\"ominous_sky\",\"eerie_calm\"]'")
                 print("  addevent \"<title>\" \"<summary>\" <day_start> [day_end] [tags_json] - Add a new campaign event.")
+                print("  roll <dice> [adv|dis]         - Roll dice (e.g. 1d20+5, 4d6dl1, 2d6!) and log it to the roll history.")
+                print("  simulate <encounter_id> [N]   - Estimate an encounter's difficulty from N simulated fights (default 5000).")
+                print("  turn <encounter_id>           - Advance an encounter to the next participant's turn.")
                 print("  history [N]                   - Show the N most recent campaign events (default N=5).")
                 print("  find event <keyword>          - Search campaign events by keyword in title, summary, or tags.")
+                print("  find tags <expr> [days A-B]   - Campaign events matching a tag expression, in timeline order.")
+                print("    Example: find tags combate AND (secta OR \"clan yun\") NOT traicion days 10-40")
                 print("--------------------------------------")
             
             elif command == "say":
-                if args_str:
+                if args_str and STREAM_RESPONSES:
+                    print_stream("DM: ", agent.stream_input(args_str))
+                elif args_str:
                     response = agent.process_input(args_str)
                     print(f"DM: {response}")
                 else:
                     print("Usage: say <text to send to DM>")
             
             elif command == "describe":
-                if args_str:
+                if args_str and STREAM_RESPONSES:
+                    print_stream("Narrative: ", agent.trigger_narrative_engine_stream(args_str))
+                elif args_str:
                     response = agent.trigger_narrative_engine(args_str)
                     print(f"Narrative: {response}")
                 else:
                     print("Usage: describe <topic>")
             
+            elif command == "cache" and args_str == "stats":
+                cache = agent.narrative_engine.cache
+                if hasattr(cache, "stats"):
+                    print(f"Narrative cache: {cache.stats()}")
+                else:
+                    print("The configured narrative cache does not report statistics.")
+
             elif command == "check" and args_str.startswith("rule "):
                 keyword = args_str.replace("rule ", "", 1).strip()
-                if keyword:
-                    response = agent.trigger_rules_engine_check(keyword)
+                keywords = [k.strip() for k in keyword.split(",") if k.strip()]
+                if len(keywords) > 1:
+                    for response in agent.trigger_rules_engine_batch_check(keywords):
+                        print(f"RulesEngine: {response}")
+                elif keywords:
+                    response = agent.trigger_rules_engine_check(keywords[0])
                     print(f"RulesEngine: {response}")
                 else:
-                    print("Usage: check rule <keyword>")
+                    print("Usage: check rule <keyword>[, <keyword>...]")
+
+            elif command == "search" and args_str.startswith("rule "):
+                query = args_str.replace("rule ", "", 1).strip()
+                if not query:
+                    print("Usage: search rule <text>")
+                    continue
+                hits = agent.rules_engine.search_rules(query)
+                if hits:
+                    for hit in hits:
+                        print(f"  {hit['keyword']} ({hit['match_type']}, distance {hit['distance']}) - ruleset '{hit['ruleset_name']}'")
+                else:
+                    print(f"No rules match \"{query}\".")
 
             elif command == "addchar":
                 # Simplified: addchar <name> <level> <class> <race>
@@ -258,6 +302,46 @@ def main():
                 except Exception as e:
                     print(f"An unexpected error occurred with addevent: {e}")
 
+            elif command == "roll":
+                roll_args = args_str.split()
+                mode = roll_args.pop().lower() if roll_args and roll_args[-1].lower() in ("adv", "dis") else None
+                if not roll_args:
+                    print("Usage: roll <dice> [adv|dis]")
+                    continue
+                try:
+                    result = agent.roll_dice("".join(roll_args), roller_name="Jugador", roll_type="manual",
+                                             advantage=mode == "adv", disadvantage=mode == "dis")
+                except DiceExpressionError as e:
+                    print(f"Invalid dice expression: {e}")
+                    continue
+                print(f"{result.expression}: {result.rolls} {result.modifier:+d} = {result.total}")
+
+            elif command == "simulate":
+                sim_args = args_str.split()
+                if not sim_args or not all(arg.isdigit() for arg in sim_args[:2]):
+                    print("Usage: simulate <encounter_id> [trials]")
+                    continue
+                trials = int(sim_args[1]) if len(sim_args) > 1 else 5000
+                estimate = agent.estimate_encounter(int(sim_args[0]), trials=trials)
+                if estimate:
+                    print(estimate.summary())
+
+            elif command == "turn":
+                if not args_str.strip().isdigit():
+                    print("Usage: turn <encounter_id>")
+                    continue
+                encounter_id = int(args_str.strip())
+                try:
+                    participant_id = agent.next_turn(encounter_id)
+                except ValueError as e:
+                    print(e)
+                    continue
+                order = agent.turn_order(encounter_id)
+                if participant_id is None:
+                    print("No quedan participantes activos en el encuentro.")
+                else:
+                    print(f"Ronda {order.round_number}, turno {order.turn_index + 1}: participante {participant_id}")
+
             elif command == "history":
                 limit = 5 # Default limit
                 if args_str:
@@ -305,6 +389,36 @@ def main():
                         print("---")
                 else:
                     print(f"No se encontraron eventos para \"{keyword}\".")
+
+            elif command == "find" and args_str.startswith("tags "):
+                expression = args_str.replace("tags ", "", 1).strip()
+                day_start = day_end = None
+                days_match = re.search(r"\s*\bdays\s+(\d+)(?:-(\d+))?$", expression)
+                if days_match:
+                    day_start = int(days_match.group(1))
+                    day_end = int(days_match.group(2)) if days_match.group(2) else day_start
+                    expression = expression[:days_match.start()].strip()
+                if not expression:
+                    print("Usage: find tags <expression> [days <start>-<end>]")
+                    continue
+
+                try:
+                    events = agent.find_campaign_events_by_tags(expression, day_start=day_start, day_end=day_end)
+                except TagExpressionError as e:
+                    print(f"Invalid tag expression: {e}")
+                    continue
+                if events:
+                    print(f"\n--- Eventos con Tags \"{expression}\" ---")
+                    for event in events:
+                        days_str = f"Días {event.day_range_start}"
+                        if event.day_range_end and event.day_range_end != event.day_range_start:
+                            days_str += f"-{event.day_range_end}"
+                        print(f"{days_str}: {event.title}")
+                        print(f"  Resumen: {event.summary_content}")
+                        if event.event_tags_json: print(f"  Tags: {event.event_tags_json}")
+                        print("---")
+                else:
+                    print(f"No se encontraron eventos con tags \"{expression}\".")
             
             else:
                 print(f"Unknown command: '{command}'. Type 'help' for available commands.")
@@ -4,13 +4,24 @@ Complete database population script for AI Dungeon Master CLI.
 Handles all tables including encounters, sessions, spells, and party management.
 """
 
+import argparse
 import json
 import os
 from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, Iterator
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
 
+from database.bulk import BulkLoadStats, bulk_upsert, fetch_by_keys, fetch_existing_keys
 from database.engine import init_db, get_session
+from database.json_stream import iter_json_file
+from database.load_scheduler import LoadScheduler
+from database.seed_manifest import (
+    RecordManifest, SeedSource, file_hash, kept_rows, record_files, reset_kept_rows, unchanged_files,
+    upsert_records,
+)
 from database.models import (
     Base, 
     # Core Models
@@ -36,7 +47,7 @@ from database.models import (
     
     # DM and Rules
     DmGuidelineSet, DmSessionStructureItem, DmIntroCharShowField,
-    RuleSet, WorldState
+    RuleSet, WorldState, party_member_association
 )
 from config import DATABASE_URL
 
@@ -49,61 +60,78 @@ def _load_json(name: str) -> dict | list:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-# Load all JSON data
-try:
-    DM_RULES_DATA = _load_json("dm_rules.json")
-    WORLD_RULES_DATA = _load_json("world_rules.json")
-    FIRE_TECHNIQUES_DATA = _load_json("fire_techniques.json")
-    NARRATIVE_EVENTS_DATA = _load_json("narrative_events.json")
-    LIANG_WUZHAO_FULL_JSON = _load_json("liang_wuzhao.json")
-    SPELLS_DATA = _load_json("spells.json")
-    ATTACKS_DATA = _load_json("attacks.json")
-    CHARACTERS_DATA = _load_json("characters.json")
-    SECTS_DATA = _load_json("sects.json")
-    NPCS_DATA = _load_json("npcs.json")
-    CONDITIONS_DATA = _load_json("conditions.json")
-    INVENTORY_DATA = _load_json("inventory_items.json")
-    ELEMENTS_DATA = _load_json("elements.json")
-    
-    # Sample data for new features
-    SAMPLE_ENCOUNTERS = {
-        "encounters": [
-            {
-                "id": 1,
-                "name": "Emboscada en el Valle Roto",
-                "encounter_type": "combat",
-                "difficulty": "medium",
-                "expected_party_level": 3,
-                "environment": "forest_valley",
-                "status": "completed"
-            }
-        ]
-    }
-    
-    SAMPLE_LOCATIONS = {
-        "locations": [
-            {
-                "id": 1,
-                "name": "Monasterio Silencioso",
-                "location_type": "ruins",
-                "region": "Valle del Eco Perdido",
-                "description": "Ruinas del antiguo monasterio donde Liáng Wǔzhào entrenaba.",
-                "current_status": "destroyed"
-            },
-            {
-                "id": 2,
-                "name": "Cruce de los Mil Vientos", 
-                "location_type": "crossroads",
-                "region": "Tierras Centrales",
-                "description": "Importante cruce de caminos donde se encuentran viajeros de todas las sectas.",
-                "current_status": "active"
-            }
-        ]
-    }
-    
-except FileNotFoundError as e:
-    print(f"Warning: Could not load some JSON files: {e}")
-    print("Some features may not be populated. Ensure all JSON files exist in the data/ directory.")
+# Files are read on first use and cached, so importing this module reads nothing. The
+# old module-level names (DM_RULES_DATA, SPELLS_DATA, ...) still resolve lazily through
+# the module __getattr__ below.
+DATA_FILES = {
+    "DM_RULES_DATA": "dm_rules.json",
+    "WORLD_RULES_DATA": "world_rules.json",
+    "FIRE_TECHNIQUES_DATA": "fire_techniques.json",
+    "NARRATIVE_EVENTS_DATA": "narrative_events.json",
+    "LIANG_WUZHAO_FULL_JSON": "liang_wuzhao.json",
+    "SPELLS_DATA": "spells.json",
+    "ATTACKS_DATA": "attacks.json",
+    "CHARACTERS_DATA": "characters.json",
+    "SECTS_DATA": "sects.json",
+    "NPCS_DATA": "npcs.json",
+    "CONDITIONS_DATA": "conditions.json",
+    "INVENTORY_DATA": "inventory_items.json",
+    "ELEMENTS_DATA": "elements.json",
+}
+
+@lru_cache(maxsize=None)
+def load_data(name: str) -> dict | list:
+    """Load (once) and return a JSON file from the data directory."""
+    return _load_json(name)
+
+def data_available(*names: str) -> bool:
+    """True if every named file exists in the data directory."""
+    return all(os.path.exists(os.path.join(DATA_DIR, name)) for name in names)
+
+def iter_records(name: str, key: str | None = None) -> Iterator[dict]:
+    """Streams the records of an array-of-records file without loading it whole."""
+    return iter_json_file(os.path.join(DATA_DIR, name), key=key)
+
+def __getattr__(name: str):
+    if name in DATA_FILES:
+        return load_data(DATA_FILES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Sample data for new features
+SAMPLE_ENCOUNTERS = {
+    "encounters": [
+        {
+            "id": 1,
+            "name": "Emboscada en el Valle Roto",
+            "encounter_type": "combat",
+            "difficulty": "medium",
+            "expected_party_level": 3,
+            "environment": "forest_valley",
+            "status": "completed"
+        }
+    ]
+}
+
+SAMPLE_LOCATIONS = {
+    "locations": [
+        {
+            "id": 1,
+            "name": "Monasterio Silencioso",
+            "location_type": "ruins",
+            "region": "Valle del Eco Perdido",
+            "description": "Ruinas del antiguo monasterio donde Liáng Wǔzhào entrenaba.",
+            "current_status": "destroyed"
+        },
+        {
+            "id": 2,
+            "name": "Cruce de los Mil Vientos", 
+            "location_type": "crossroads",
+            "region": "Tierras Centrales",
+            "description": "Importante cruce de caminos donde se encuentran viajeros de todas las sectas.",
+            "current_status": "active"
+        }
+    ]
+}
 
 # --- Population Functions ---
 
@@ -203,78 +231,61 @@ def populate_world_lore(db_session: Session, data: dict):
     
     print("  World lore populated/updated.")
 
-def populate_spells(db_session: Session, data: dict):
+def populate_spells(db_session: Session, data: dict, source: SeedSource | None = None):
     """Populate D&D 5e spells."""
     print("Populating Spells...")
     
     spells_list = data.get("spells", [])
-    for spell_data in spells_list:
-        spell_name = spell_data.get("name")
-        if not spell_name:
-            continue
-            
-        spell = db_session.query(Spell).filter_by(name=spell_name).first()
-        if not spell:
-            spell = Spell(name=spell_name)
-            db_session.add(spell)
-            print(f"  Spell '{spell_name}' created.")
-        else:
-            print(f"  Spell '{spell_name}' already exists. Updating...")
-        
-        # Update spell properties
-        spell.spell_level = spell_data.get("spell_level", 0)
-        spell.school = spell_data.get("school", "evocation")
-        spell.casting_time = spell_data.get("casting_time", "1 action")
-        spell.range_distance = spell_data.get("range", "touch")
-        spell.duration = spell_data.get("duration", "instantaneous")
-        spell.components = spell_data.get("components", "V, S")
-        spell.description = spell_data.get("description", "")
-        spell.damage_dice = spell_data.get("damage")
-        spell.damage_type = spell_data.get("damage_type")
-        spell.save_type = spell_data.get("save_type")
-        spell.ritual = spell_data.get("ritual", False)
-        spell.concentration = spell_data.get("concentration", False)
-        spell.classes_json = spell_data.get("classes", [])
-        spell.wuxia_equivalent = spell_data.get("wuxia_equivalent")
-        spell.upcast_formula = spell_data.get("upcast_formula")
-        
-        if spell.classes_json:
-            flag_modified(spell, "classes_json")
-    
-    print(f"  {len(spells_list)} spells populated/updated.")
+    rows = [
+        {
+            "name": spell_data["name"],
+            "spell_level": spell_data.get("spell_level", 0),
+            "school": spell_data.get("school", "evocation"),
+            "casting_time": spell_data.get("casting_time", "1 action"),
+            "range_distance": spell_data.get("range", "touch"),
+            "duration": spell_data.get("duration", "instantaneous"),
+            "components": spell_data.get("components", "V, S"),
+            "description": spell_data.get("description", ""),
+            "damage_dice": spell_data.get("damage"),
+            "damage_type": spell_data.get("damage_type"),
+            "save_type": spell_data.get("save_type"),
+            "ritual": spell_data.get("ritual", False),
+            "concentration": spell_data.get("concentration", False),
+            "classes_json": spell_data.get("classes", []),
+            "wuxia_equivalent": spell_data.get("wuxia_equivalent"),
+            "upcast_formula": spell_data.get("upcast_formula"),
+        }
+        for spell_data in spells_list
+        if spell_data.get("name")
+    ]
+    print(f"  {upsert_records(db_session, Spell, rows, ['name'], source)}")
 
-def populate_attacks(db_session: Session, data: dict):
+def populate_attacks(db_session: Session, data: dict, source: SeedSource | None = None):
     """Populate attack actions."""
     print("Populating Attacks...")
     
     attacks_list = data.get("attacks", [])
-    for attack_data in attacks_list:
-        attack_name = attack_data.get("name")
-        if not attack_name:
-            continue
-            
-        attack = db_session.query(Attack).filter_by(name=attack_name).first()
-        if not attack:
-            attack = Attack(name=attack_name)
-            db_session.add(attack)
-            print(f"  Attack '{attack_name}' created.")
-        else:
-            print(f"  Attack '{attack_name}' already exists. Updating...")
-        
-        attack.attack_bonus = attack_data.get("attack_bonus", 0)
-        attack.damage_dice = attack_data.get("damage_dice")
-        attack.damage_type = attack_data.get("damage_type", "bludgeoning")
-        attack.range_distance = attack_data.get("range_distance", "5 ft")
-        attack.attack_type = attack_data.get("attack_type", "melee")
-        attack.description = attack_data.get("description", "")
-    
-    print(f"  {len(attacks_list)} attacks populated/updated.")
+    rows = [
+        {
+            "name": attack_data["name"],
+            "attack_bonus": attack_data.get("attack_bonus", 0),
+            "damage_dice": attack_data.get("damage_dice"),
+            "damage_type": attack_data.get("damage_type", "bludgeoning"),
+            "range_distance": attack_data.get("range_distance", "5 ft"),
+            "attack_type": attack_data.get("attack_type", "melee"),
+            "description": attack_data.get("description", ""),
+        }
+        for attack_data in attacks_list
+        if attack_data.get("name")
+    ]
+    print(f"  {upsert_records(db_session, Attack, rows, ['name'], source)}")
 
-def populate_techniques(db_session: Session, elemental_techniques_data: dict):
+def populate_techniques(db_session: Session, elemental_techniques_data: dict, source: SeedSource | None = None):
     """Populate Wuxia techniques."""
     print("Populating Techniques...")
     
     elemental_list = elemental_techniques_data.get("elemental_techniques", [])
+    rows = []
     
     for elemental_group in elemental_list:
         element_name = elemental_group.get("elemento", "Unknown")
@@ -285,183 +296,136 @@ def populate_techniques(db_session: Session, elemental_techniques_data: dict):
             tech_name = tech_data.get("nombre")
             if not tech_name:
                 continue
-            
-            tech = db_session.query(Technique).filter_by(name=tech_name, element_association=element_name).first()
-            if not tech:
-                tech = Technique(name=tech_name, element_association=element_name)
-                db_session.add(tech)
-                print(f"    Technique '{tech_name}' ({element_name}) created.")
-            else:
-                print(f"    Technique '{tech_name}' ({element_name}) already exists. Updating...")
-
-            tech.name_chinese = tech_data.get("nombre_chino")
-            tech.description = tech_data.get("efecto")
-            tech.level_required = tech_data.get("nivel", 1)
-            tech.rank = tech_data.get("rango")
-            tech.damage_string = tech_data.get("daño")
-            tech.version = tech_data.get("version")
-            tech.source_dao = dao_source
-            tech.mana_cost = tech_data.get("mana_cost")
-            tech.casting_time = tech_data.get("casting_time", "1 action")
-            tech.range_distance = tech_data.get("range_distance", "touch")
-            tech.duration = tech_data.get("duracion", "instantaneous")
-            tech.dnd_equivalent = tech_data.get("dnd_equivalent")
-            
+
             # Store other properties
             other_props = {k: v for k, v in tech_data.items() if k not in 
                            ['nombre', 'nombre_chino', 'efecto', 'nivel', 'rango', 'daño', 
                             'version', 'mana_cost', 'casting_time', 'range_distance', 
                             'duracion', 'dnd_equivalent']}
-            tech.other_properties_json = other_props if other_props else None
-            if tech.other_properties_json:
-                flag_modified(tech, "other_properties_json")
-    
-    print("  Techniques populated/updated.")
-
-def populate_conditions(db_session: Session, data: dict):
+            rows.append({
+                "name": tech_name,
+                "element_association": element_name,
+                "name_chinese": tech_data.get("nombre_chino"),
+                "description": tech_data.get("efecto"),
+                "level_required": tech_data.get("nivel", 1),
+                "rank": tech_data.get("rango"),
+                "damage_string": tech_data.get("daño"),
+                "version": tech_data.get("version"),
+                "source_dao": dao_source,
+                "mana_cost": tech_data.get("mana_cost"),
+                "casting_time": tech_data.get("casting_time", "1 action"),
+                "range_distance": tech_data.get("range_distance", "touch"),
+                "duration": tech_data.get("duracion", "instantaneous"),
+                "dnd_equivalent": tech_data.get("dnd_equivalent"),
+                "other_properties_json": other_props if other_props else None,
+            })
+    
+    print(f"  {upsert_records(db_session, Technique, rows, ['name', 'element_association'], source)}")
+
+def populate_conditions(db_session: Session, data: dict, source: SeedSource | None = None):
     """Populate status conditions."""
     print("Populating Conditions...")
     
     conditions_list = data.get("condiciones", [])
-    for condition_data in conditions_list:
-        condition_name = condition_data.get("nombre")
-        if not condition_name:
-            continue
-            
-        condition = db_session.query(Condition).filter_by(name=condition_name).first()
-        if not condition:
-            condition = Condition(name=condition_name)
-            db_session.add(condition)
-            print(f"  Condition '{condition_name}' created.")
-        else:
-            print(f"  Condition '{condition_name}' already exists. Updating...")
-        
-        condition.description = condition_data.get("descripcion")
-        condition.condition_type = condition_data.get("tipo")
-        condition.effects_json = condition_data.get("efectos_mecanicos")
-        
-        if condition.effects_json:
-            flag_modified(condition, "effects_json")
-    
-    print(f"  {len(conditions_list)} conditions populated/updated.")
+    rows = [
+        {
+            "name": condition_data["nombre"],
+            "description": condition_data.get("descripcion"),
+            "condition_type": condition_data.get("tipo"),
+            "effects_json": condition_data.get("efectos_mecanicos"),
+        }
+        for condition_data in conditions_list
+        if condition_data.get("nombre")
+    ]
+    print(f"  {upsert_records(db_session, Condition, rows, ['name'], source)}")
 
-def populate_sects(db_session: Session, data: dict):
+def populate_sects(db_session: Session, data: dict, source: SeedSource | None = None):
     """Populate Wuxia sects."""
     print("Populating Sects...")
     
     sects_list = data.get("sectas", [])
-    for sect_data in sects_list:
-        sect_name = sect_data.get("nombre")
-        if not sect_name:
-            continue
-            
-        sect = db_session.query(Sect).filter_by(name=sect_name).first()
-        if not sect:
-            sect = Sect(name=sect_name)
-            db_session.add(sect)
-            print(f"  Sect '{sect_name}' created.")
-        else:
-            print(f"  Sect '{sect_name}' already exists. Updating...")
-        
-        sect.founder = sect_data.get("fundador")
-        sect.alignment = sect_data.get("alineamiento")
-        sect.specialties_json = sect_data.get("especialidad")
-        sect.reputation = sect_data.get("reputacion")
-        sect.requirements = sect_data.get("requisitos_ingreso")
-        
-        if sect.specialties_json:
-            flag_modified(sect, "specialties_json")
-    
-    print(f"  {len(sects_list)} sects populated/updated.")
+    rows = [
+        {
+            "name": sect_data["nombre"],
+            "founder": sect_data.get("fundador"),
+            "alignment": sect_data.get("alineamiento"),
+            "specialties_json": sect_data.get("especialidad"),
+            "reputation": sect_data.get("reputacion"),
+            "requirements": sect_data.get("requisitos_ingreso"),
+        }
+        for sect_data in sects_list
+        if sect_data.get("nombre")
+    ]
+    print(f"  {upsert_records(db_session, Sect, rows, ['name'], source)}")
 
 def populate_locations(db_session: Session, data: dict):
     """Populate game world locations."""
     print("Populating Locations...")
     
     locations_list = data.get("locations", [])
-    for location_data in locations_list:
-        location_name = location_data.get("name")
-        if not location_name:
-            continue
-            
-        location = db_session.query(Location).filter_by(name=location_name).first()
-        if not location:
-            location = Location(name=location_name)
-            db_session.add(location)
-            print(f"  Location '{location_name}' created.")
-        else:
-            print(f"  Location '{location_name}' already exists. Updating...")
-        
-        location.location_type = location_data.get("location_type")
-        location.region = location_data.get("region")
-        location.description = location_data.get("description")
-        location.current_status = location_data.get("current_status", "active")
-        location.loot_available = location_data.get("loot_available", False)
-        location.enemies_present = location_data.get("enemies_present", False)
-        location.environmental_effects_json = location_data.get("environmental_effects")
-        location.notable_features_json = location_data.get("notable_features")
-        location.connections_json = location_data.get("connections")
-        
-        # Flag JSON fields as modified
-        for json_field in ["environmental_effects_json", "notable_features_json", "connections_json"]:
-            if getattr(location, json_field):
-                flag_modified(location, json_field)
-    
-    print(f"  {len(locations_list)} locations populated/updated.")
-
-def populate_campaign_events(db_session: Session, data: dict):
+    rows = [
+        {
+            "name": location_data["name"],
+            "location_type": location_data.get("location_type"),
+            "region": location_data.get("region"),
+            "description": location_data.get("description"),
+            "current_status": location_data.get("current_status", "active"),
+            "loot_available": location_data.get("loot_available", False),
+            "enemies_present": location_data.get("enemies_present", False),
+            "environmental_effects_json": location_data.get("environmental_effects"),
+            "notable_features_json": location_data.get("notable_features"),
+            "connections_json": location_data.get("connections"),
+        }
+        for location_data in locations_list
+        if location_data.get("name")
+    ]
+    print(f"  {bulk_upsert(db_session, Location, rows, ['name'])}")
+
+def _parse_day_range(day_str: str) -> tuple[int | None, int | None]:
+    """Parses "12" or "12-15" into (start, end); unparsable values give (None, None)."""
+    day_start, day_end = None, None
+    if "-" in day_str:
+        parts = day_str.split("-")
+        try:
+            day_start, day_end = int(parts[0]), int(parts[1])
+        except ValueError:
+            pass
+    elif day_str:
+        try:
+            day_start = day_end = int(day_str)
+        except ValueError:
+            pass
+    return day_start, day_end
+
+def populate_campaign_events(db_session: Session, data: dict, source: SeedSource | None = None):
     """Populate campaign events and timeline."""
     print("Populating Campaign Events...")
     
     session_data = data.get("session", {})
     events_list = session_data.get("resumenes", [])
+    rows = []
     
     for event_data in events_list:
         event_title = event_data.get("titulo")
         if not event_title:
             continue
-        
-        event = db_session.query(CampaignEvent).filter_by(title=event_title).first()
-        if not event:
-            event = CampaignEvent(title=event_title)
-            db_session.add(event)
-            print(f"  Campaign Event '{event_title}' created.")
-        else:
-            print(f"  Campaign Event '{event_title}' already exists. Updating...")
-
-        # Parse day range
-        day_str = event_data.get("dias", "")
-        day_start, day_end = None, None
-        if "-" in day_str:
-            parts = day_str.split("-")
-            try:
-                day_start, day_end = int(parts[0]), int(parts[1])
-            except ValueError:
-                pass
-        elif day_str:
-            try:
-                day_start = day_end = int(day_str)
-            except ValueError:
-                pass
-        
-        event.day_range_start = day_start
-        event.day_range_end = day_end
-        event.summary_content = event_data.get("contenido")
-        event.event_type = "narrative"
-        event.importance_level = "medium"
-        
+
+        day_start, day_end = _parse_day_range(event_data.get("dias", ""))
         # Store additional details
         details = {k: v for k, v in event_data.items() 
                   if k not in ['titulo', 'dias', 'contenido']}
-        event.full_details_json = details if details else None
-        if event.full_details_json:
-            flag_modified(event, "full_details_json")
-        
-        event.event_tags_json = event_data.get("temas")
-        if event.event_tags_json:
-            flag_modified(event, "event_tags_json")
-    
-    print(f"  {len(events_list)} campaign events populated/updated.")
+        rows.append({
+            "title": event_title,
+            "day_range_start": day_start,
+            "day_range_end": day_end,
+            "summary_content": event_data.get("contenido"),
+            "event_type": "narrative",
+            "importance_level": "medium",
+            "full_details_json": details if details else None,
+            "event_tags_json": event_data.get("temas"),
+        })
+    
+    print(f"  {upsert_records(db_session, CampaignEvent, rows, ['title'], source)}")
 
 def populate_character_liang_wuzhao(db_session: Session, char_json_data: dict, techniques_data: dict):
     """Populate the main character Liáng Wǔzhào with full normalization."""
@@ -573,39 +537,96 @@ def populate_character_liang_wuzhao(db_session: Session, char_json_data: dict, t
     print(f"  Associating known techniques for '{char.name}'...")
     elemental_list = techniques_data.get("elemental_techniques", [])
     
-    for elemental_group in elemental_list:
-        if elemental_group.get("elemento") == "Fuego":
-            # Learn first 3 fire techniques
-            techs_to_learn = elemental_group.get("tecnicas", [])[:3]
-            
-            for tech_data in techs_to_learn:
-                tech_name = tech_data.get("nombre")
-                if not tech_name:
-                    continue
-                    
-                technique_obj = db_session.query(Technique).filter_by(
-                    name=tech_name, element_association="Fuego"
-                ).first()
-                
-                if technique_obj:
-                    # Check if already known
-                    existing = db_session.query(CharacterKnownTechniques).filter_by(
-                        character=char, technique=technique_obj
-                    ).first()
-                    
-                    if not existing:
-                        new_known_tech = CharacterKnownTechniques(
-                            character=char,
-                            technique=technique_obj,
-                            mastery_level="learned"
-                        )
-                        char.known_techniques.append(new_known_tech)
-                        print(f"    Technique '{tech_name}' associated with {char.name}.")
-                else:
-                    print(f"    Warning: Technique '{tech_name}' not found for association.")
+    # Learn first 3 fire techniques
+    tech_names = [
+        tech_data.get("nombre")
+        for elemental_group in elemental_list
+        if elemental_group.get("elemento") == "Fuego"
+        for tech_data in elemental_group.get("tecnicas", [])[:3]
+        if tech_data.get("nombre")
+    ]
+    # One query for the techniques, and the known ones come from the already loaded collection.
+    techniques_by_key = fetch_by_keys(
+        db_session, Technique, ["name", "element_association"],
+        [(tech_name, "Fuego") for tech_name in tech_names],
+    )
+    known_technique_ids = {ckt.technique_id for ckt in char.known_techniques}
+    
+    for tech_name in tech_names:
+        technique_obj = techniques_by_key.get((tech_name, "Fuego"))
+        if technique_obj:
+            if technique_obj.id not in known_technique_ids:
+                char.known_techniques.append(CharacterKnownTechniques(
+                    technique=technique_obj,
+                    mastery_level="learned"
+                ))
+                known_technique_ids.add(technique_obj.id)
+                print(f"    Technique '{tech_name}' associated with {char.name}.")
+        else:
+            print(f"    Warning: Technique '{tech_name}' not found for association.")
     
     print(f"  Character '{char_name}' populated/updated with normalized schema.")
 
+def _parse_timestamp(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+
+def populate_dice_roll_history(db_session: Session, records: Iterable[dict], batch_size: int = 1000,
+                               source: SeedSource | None = None):
+    """Populate dice roll history from a (possibly streamed) iterable of records."""
+    print("Populating Dice Roll History...")
+    
+    # Links are only kept when the referenced row exists; everything else is fetched once.
+    character_ids = dict(db_session.execute(select(Character.name, Character.id)).all())
+    session_ids = set(db_session.scalars(select(Session.id)))
+    encounter_ids = set(db_session.scalars(select(Encounter.id)))
+    existing = fetch_existing_keys(db_session, DiceRollHistory, ["id"])
+    
+    manifest = RecordManifest(db_session, source, DiceRollHistory, ["id"]) if source else None
+    
+    total = BulkLoadStats(table=DiceRollHistory.__tablename__)
+    batch = []
+    
+    def flush_batch():
+        rows = manifest.changed(batch) if manifest else batch
+        stats = bulk_upsert(db_session, DiceRollHistory, rows, ["id"], batch_size=batch_size, existing=existing)
+        total.unchanged += len(batch) - stats.rows
+        total.inserted += stats.inserted
+        total.updated += stats.updated
+        total.seconds += stats.seconds
+        existing.update({(row["id"],): row["id"] for row in batch})
+        batch.clear()
+    
+    for roll_data in records:
+        batch.append({
+            "id": roll_data["id"],
+            "roller_name": roll_data["roller_name"],
+            "roller_type": roll_data.get("roller_type", "character"),
+            "roller_id": roll_data.get("roller_id"),
+            "roll_type": roll_data["roll_type"],
+            "dice_expression": roll_data["dice_expression"],
+            "individual_rolls_json": roll_data.get("individual_rolls", []),
+            "modifiers": roll_data.get("modifiers", 0),
+            "total_result": roll_data["total_result"],
+            "target_dc": roll_data.get("target_dc"),
+            "success": roll_data.get("success"),
+            "context": roll_data.get("context"),
+            "timestamp": _parse_timestamp(roll_data.get("timestamp")) or datetime.utcnow(),
+            "session_id": roll_data.get("session_id") if roll_data.get("session_id") in session_ids else None,
+            "encounter_id": roll_data.get("encounter_id") if roll_data.get("encounter_id") in encounter_ids else None,
+            "character_id": character_ids.get(roll_data["roller_name"]),
+        })
+        if len(batch) >= batch_size:
+            flush_batch()
+    if batch:
+        flush_batch()
+    if manifest:
+        total.deleted = manifest.finish()
+        total.kept = len(manifest.kept)
+    
+    print(f"  {total}")
+
 def create_sample_party(db_session: Session):
     """Create a sample party for the campaign."""
     print("Creating sample party...")
@@ -716,59 +737,116 @@ def initialize_world_state(db_session: Session):
     else:
         print("  World state already exists.")
 
-def populate():
+def _incremental(name: str, files: tuple[str, ...], func, full: bool):
+    """
+    Wraps a loader so it is skipped when none of its files changed since its last run
+    (unless `full`), and records the files' hashes in the same transaction as its data.
+    The hashes are not recorded while removed rows had to be kept because something still
+    references them, so the loader runs again next time and retries deleting them.
+    """
+    def run(db_session: Session):
+        digests = {file_name: file_hash(os.path.join(DATA_DIR, file_name)) for file_name in files}
+        if not full and unchanged_files(db_session, name, digests):
+            print(f"Skipping '{name}': {', '.join(files)} unchanged since the last run.")
+            return
+        reset_kept_rows(db_session)
+        func(db_session)
+        if kept_rows(db_session):
+            print(f"'{name}' kept rows that are still referenced; it will run again next time.")
+            return
+        record_files(db_session, name, digests)
+    return run
+
+def build_scheduler(full: bool = False) -> LoadScheduler:
+    """
+    Registers every loader whose data files exist, with the tables it writes. Loaders
+    reading data/ files only re-apply changed files and records unless `full` is set.
+    """
+    scheduler = LoadScheduler()
+    
+    def add_if_available(files: tuple[str, ...], name: str, func, writes, optional_files: tuple[str, ...] = ()):
+        if data_available(*files):
+            tracked = files + tuple(f for f in optional_files if data_available(f))
+            scheduler.add(name, _incremental(name, tracked, func, full), writes=writes)
+        else:
+            print(f"Warning: skipping '{name}', missing data file(s): {', '.join(files)}")
+    
+    def source(file_name: str) -> SeedSource:
+        return SeedSource(file_name, full=full)
+    
+    add_if_available(("dm_rules.json",), "dm_guidelines",
+                     lambda s: populate_dm_guidelines(s, load_data("dm_rules.json")),
+                     writes=[DmGuidelineSet, DmSessionStructureItem, DmIntroCharShowField])
+    add_if_available(("world_rules.json",), "world_lore",
+                     lambda s: populate_world_lore(s, load_data("world_rules.json")),
+                     writes=[LoreTopic, CultivationRealm], optional_files=("cultivation_realms.json",))
+    
+    # Spells and techniques
+    add_if_available(("spells.json",), "spells",
+                     lambda s: populate_spells(s, load_data("spells.json"), source("spells.json")), writes=[Spell])
+    add_if_available(("attacks.json",), "attacks",
+                     lambda s: populate_attacks(s, load_data("attacks.json"), source("attacks.json")), writes=[Attack])
+    add_if_available(("fire_techniques.json",), "techniques",
+                     lambda s: populate_techniques(s, load_data("fire_techniques.json"), source("fire_techniques.json")), writes=[Technique])
+    
+    # World building
+    add_if_available(("conditions.json",), "conditions",
+                     lambda s: populate_conditions(s, load_data("conditions.json"), source("conditions.json")), writes=[Condition])
+    add_if_available(("sects.json",), "sects",
+                     lambda s: populate_sects(s, load_data("sects.json"), source("sects.json")), writes=[Sect])
+    scheduler.add("locations", lambda s: populate_locations(s, SAMPLE_LOCATIONS), writes=[Location])
+    
+    # Campaign and characters
+    add_if_available(("narrative_events.json",), "campaign_events",
+                     lambda s: populate_campaign_events(s, load_data("narrative_events.json"), source("narrative_events.json")),
+                     writes=[CampaignEvent])
+    add_if_available(
+        ("liang_wuzhao.json", "fire_techniques.json"),
+        "character_liang_wuzhao",
+        lambda s: populate_character_liang_wuzhao(s, load_data("liang_wuzhao.json"), load_data("fire_techniques.json")),
+        writes=[
+            Character, CharacterSavingThrowProficiency, CharacterSkillProficiency, CharacterLanguage,
+            CharacterFeatureTrait, CharacterResource, CharacterReclusionState, CharacterTitle,
+            CharacterCompatibleElement, CharacterKnownTechniques,
+        ],
+    )
+    
+    # Party and session management
+    scheduler.add("sample_party", create_sample_party, writes=[Party, party_member_association])
+    scheduler.add("sample_session", create_sample_session, writes=[Session])
+    
+    # Dice history can be large, so it is streamed rather than loaded
+    add_if_available(("dice_roll_history.json",), "dice_roll_history",
+                     lambda s: populate_dice_roll_history(s, iter_records("dice_roll_history.json", "dice_roll_history"),
+                                                         source=source("dice_roll_history.json")),
+                     writes=[DiceRollHistory])
+    
+    # World state
+    scheduler.add("world_state", initialize_world_state, writes=[WorldState])
+    return scheduler
+
+def populate(parallel: bool = False, workers: int | None = None, full: bool = False):
     """Main population function."""
     print(f"Initializing database (complete normalized schema) at: {DATABASE_URL}")
     init_db(DATABASE_URL)
-    
-    db_session = get_session()
-    if db_session is None:
-        print("Error: Could not obtain database session.")
-        return
 
     print("\nPopulating database with complete normalized data...")
     
     try:
-        # Core data population
-        populate_dm_guidelines(db_session, DM_RULES_DATA)
-        populate_world_lore(db_session, WORLD_RULES_DATA)
-        
-        # Spells and techniques
-        if 'SPELLS_DATA' in globals():
-            populate_spells(db_session, SPELLS_DATA)
-        if 'ATTACKS_DATA' in globals():
-            populate_attacks(db_session, ATTACKS_DATA)
-        populate_techniques(db_session, FIRE_TECHNIQUES_DATA)
-        
-        # World building
-        if 'CONDITIONS_DATA' in globals():
-            populate_conditions(db_session, CONDITIONS_DATA)
-        if 'SECTS_DATA' in globals():
-            populate_sects(db_session, SECTS_DATA)
-        populate_locations(db_session, SAMPLE_LOCATIONS)
-        
-        # Campaign and characters
-        populate_campaign_events(db_session, NARRATIVE_EVENTS_DATA)
-        populate_character_liang_wuzhao(db_session, LIANG_WUZHAO_FULL_JSON, FIRE_TECHNIQUES_DATA)
-        
-        # Party and session management
-        create_sample_party(db_session)
-        create_sample_session(db_session)
-        
-        # World state
-        initialize_world_state(db_session)
-
-        db_session.commit()
+        build_scheduler(full=full).run(get_session, parallel=parallel, max_workers=workers)
         print("\nAll normalized data committed successfully.")
-        
     except Exception as e:
-        db_session.rollback()
         print(f"\nError populating normalized data: {e}")
         import traceback
         traceback.print_exc()
-    finally:
-        db_session.close()
-        print("Database session closed.")
 
 if __name__ == "__main__":
-    populate()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Populate the game database from data/.")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Run independent loaders concurrently, committing stage by stage")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Maximum concurrent loaders in parallel mode")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-apply every data file and record, ignoring the seed manifest")
+    args = parser.parse_args()
+    populate(parallel=args.parallel, workers=args.workers, full=args.full)
@@ -3,20 +3,51 @@ from pathlib import Path
 
 from .database import Database
 from .dungeon_master import DungeonMaster
+from .sqlite_database import SQLiteDatabase
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Interactive Dungeon Master")
     parser.add_argument("player", help="Name of the player")
+    parser.add_argument(
+        "--backend",
+        choices=("json", "sqlite"),
+        default="json",
+        help="Storage backend for the game state",
+    )
     parser.add_argument(
         "--db",
         type=Path,
-        default=Path("game_state.json"),
-        help="Path to database JSON file",
+        default=None,
+        help="Path to database file (default: game_state.json or game_state.db)",
+    )
+    parser.add_argument(
+        "--migrate-from",
+        type=Path,
+        default=None,
+        help="JSON database to import into the SQLite database before starting",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="With --migrate-from, replace a SQLite database that already has game state",
     )
     args = parser.parse_args()
 
-    db = Database(args.db)
+    if args.backend == "sqlite":
+        db_path = args.db or Path("game_state.db")
+        if args.migrate_from:
+            try:
+                db = SQLiteDatabase.migrate_from_json(args.migrate_from, db_path, force=args.force)
+            except ValueError as e:
+                parser.error(f"{e} Pass --force to overwrite it.")
+            print(f"Migrados {db.count_events()} eventos desde {args.migrate_from}.")
+        else:
+            db = SQLiteDatabase(db_path)
+    else:
+        if args.migrate_from:
+            parser.error("--migrate-from requires --backend sqlite")
+        db = Database(args.db or Path("game_state.json"))
     dm = DungeonMaster(db)
 
     print("Bienvenido al sistema DM. Escribe 'salir' para terminar.")
@@ -29,6 +60,7 @@ def main() -> None:
             break
         response = dm.handle_input(args.player, text)
         print(response)
+    db.close()
 
 
 if __name__ == "__main__":
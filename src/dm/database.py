@@ -1,13 +1,41 @@
 import json
+import os
+import time
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
 class Database:
-    """Simple JSON-based database for storing game state."""
+    """JSON-based database for storing game state.
 
-    def __init__(self, path: Path):
+    The state lives in a snapshot file (``path``) plus an append-only JSON Lines
+    journal next to it (``<path>.journal``). ``log_event`` appends a single line, so
+    logging costs the same no matter how long the campaign is. The journal is
+    fsynced in batches (every ``fsync_every`` events or ``fsync_interval`` seconds)
+    and folded into the snapshot every ``compact_every`` events and on ``close()``.
+
+    On startup the snapshot is loaded and the journal replayed. Journal lines carry
+    the event's sequence number, so entries already in the snapshot are skipped, and
+    a torn last line left by a crash is discarded. Character dicts returned by
+    ``get_character`` are persisted with the next snapshot.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        compact_every: int = 1000,
+        fsync_every: int = 32,
+        fsync_interval: float = 1.0,
+    ):
         self.path = path
+        self.journal_path = path.with_name(path.name + ".journal")
+        self.compact_every = compact_every
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        self._journal_entries = 0
+
         if not self.path.exists():
             self._data: Dict[str, Any] = {
                 "characters": {},
@@ -16,21 +44,80 @@ class Database:
             self._save()
         else:
             self._load()
+        self._replay_journal()
+        self._journal = self.journal_path.open("ab")
 
     def _load(self) -> None:
         with self.path.open("r", encoding="utf-8") as fh:
             self._data = json.load(fh)
 
     def _save(self) -> None:
-        with self.path.open("w", encoding="utf-8") as fh:
+        """Atomically replaces the snapshot file with the current state."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as fh:
             json.dump(self._data, fh, indent=2, ensure_ascii=False)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _replay_journal(self) -> None:
+        if not self.journal_path.exists():
+            return
+        events = self._data["events"]
+        good_offset = 0
+        with self.journal_path.open("rb") as fh:
+            for line in fh:
+                # A torn write from a crash leaves an unterminated or unparsable last line.
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                good_offset += len(line)
+                self._journal_entries += 1
+                if entry["seq"] >= len(events):
+                    events.append(entry["event"])
+        if good_offset < self.journal_path.stat().st_size:
+            with self.journal_path.open("r+b") as fh:
+                fh.truncate(good_offset)
 
     def get_character(self, name: str) -> Dict[str, Any]:
         return self._data["characters"].setdefault(name, {})
 
     def log_event(self, event: str) -> None:
-        self._data["events"].append(event)
+        events = self._data["events"]
+        entry = {"seq": len(events), "event": event}
+        self._journal.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._journal.flush()
+        events.append(event)
+        self._journal_entries += 1
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_fsync >= self.fsync_interval):
+            self.sync()
+        if self._journal_entries >= self.compact_every:
+            self.compact()
+
+    def list_events(self, offset: int = 0, limit: Optional[int] = None) -> list:
+        end = None if limit is None else offset + limit
+        return self._data["events"][offset:end]
+
+    def sync(self) -> None:
+        """Forces journal entries written so far onto disk."""
+        os.fsync(self._journal.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def compact(self) -> None:
+        """Writes a fresh snapshot and empties the journal."""
         self._save()
+        self._journal.truncate(0)
+        self.sync()
+        self._journal_entries = 0
 
-    def list_events(self) -> list:
-        return list(self._data["events"])
+    def close(self) -> None:
+        if self._journal.closed:
+            return
+        self.compact()
+        self._journal.close()
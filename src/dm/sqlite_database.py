@@ -0,0 +1,126 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from .database import Database
+
+
+class SQLiteDatabase:
+    """SQLite-backed game state with the same API as :class:`Database`.
+
+    Nothing is loaded up front: characters are looked up by their primary key
+    when requested and events are read in pages, so startup time and memory do
+    not grow with the campaign history. The database runs in WAL mode, which
+    keeps each ``log_event`` commit to a cheap append. Character dicts returned
+    by ``get_character`` are written back by ``save_characters`` and ``close``.
+    """
+
+    def __init__(self, path: Path, page_size: int = 500):
+        self.path = path
+        self.page_size = page_size
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS characters (name TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, event TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._characters: Dict[str, Dict[str, Any]] = {}
+
+    def get_character(self, name: str) -> Dict[str, Any]:
+        if name not in self._characters:
+            row = self._conn.execute(
+                "SELECT data FROM characters WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO characters (name, data) VALUES (?, ?)", (name, "{}")
+                )
+                self._conn.commit()
+                self._characters[name] = {}
+            else:
+                self._characters[name] = json.loads(row[0])
+        return self._characters[name]
+
+    def save_characters(self) -> None:
+        self._conn.executemany(
+            "UPDATE characters SET data = ? WHERE name = ?",
+            [(json.dumps(data, ensure_ascii=False), name) for name, data in self._characters.items()],
+        )
+        self._conn.commit()
+
+    def log_event(self, event: str) -> None:
+        self._conn.execute("INSERT INTO events (event) VALUES (?)", (event,))
+        self._conn.commit()
+
+    def count_events(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def list_events(self, offset: int = 0, limit: Optional[int] = None) -> list:
+        rows = self._conn.execute(
+            "SELECT event FROM events ORDER BY id LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        )
+        return [row[0] for row in rows]
+
+    def iter_events(self) -> Iterator[str]:
+        """Yields every event in order, reading ``page_size`` rows at a time."""
+        last_id = 0
+        while True:
+            rows = self._conn.execute(
+                "SELECT id, event FROM events WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, self.page_size),
+            ).fetchall()
+            if not rows:
+                return
+            for row_id, event in rows:
+                yield event
+            last_id = rows[-1][0]
+
+    def close(self) -> None:
+        self.save_characters()
+        self._conn.close()
+
+    @classmethod
+    def migrate_from_json(
+        cls, json_path: Path, sqlite_path: Path, batch_size: int = 10000, force: bool = False
+    ) -> "SQLiteDatabase":
+        """One-shot import of a JSON :class:`Database` (snapshot plus journal).
+
+        Refuses with ``ValueError`` if the target already holds characters or
+        events, so running the migration twice cannot duplicate the history;
+        ``force=True`` replaces the target's contents instead.
+        """
+        target = cls(sqlite_path)
+        existing = target._conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM characters) OR EXISTS (SELECT 1 FROM events)"
+        ).fetchone()[0]
+        if existing and not force:
+            target._conn.close()
+            raise ValueError(
+                f"{sqlite_path} already contains game state; use force=True to replace it."
+            )
+        source = Database(json_path)
+        with target._conn:
+            if existing:
+                target._conn.execute("DELETE FROM characters")
+                target._conn.execute("DELETE FROM events")
+            target._conn.executemany(
+                "INSERT OR REPLACE INTO characters (name, data) VALUES (?, ?)",
+                [
+                    (name, json.dumps(data, ensure_ascii=False))
+                    for name, data in source._data["characters"].items()
+                ],
+            )
+            events = source._data["events"]
+            for start in range(0, len(events), batch_size):
+                target._conn.executemany(
+                    "INSERT INTO events (event) VALUES (?)",
+                    [(event,) for event in events[start:start + batch_size]],
+                )
+        source.close()
+        return target
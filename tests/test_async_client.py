@@ -0,0 +1,181 @@
+import asyncio
+import contextlib
+import gc
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+from engine.async_client import AsyncChatClient
+from engine.narrative_engine import NarrativeEngine
+from engine.response_cache import ResponseCache
+
+
+class _StubChatCompletions(BaseHTTPRequestHandler):
+    """Mimics POST /chat/completions; the reply echoes the last user message."""
+
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    delay = 0.05
+    words = ["Ash", " and", " embers."]
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(cls.delay)
+            if body.get("stream"):
+                self._stream_reply(body)
+                return
+            payload = json.dumps({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": f"echo: {body['messages'][-1]['content']}"}}],
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def _stream_reply(self, body):
+        """Server-sent events: one chunk per word, then [DONE]."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in type(self).words:
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                     "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api_base():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubChatCompletions)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _StubChatCompletions.max_in_flight = 0
+    _StubChatCompletions.delay = 0.05
+    _StubChatCompletions.words = ["Ash", " and", " embers."]
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_concurrency_limit(stub_api_base) -> None:
+    client = AsyncChatClient(max_concurrency=3, timeout=5, api_base=stub_api_base, api_key="test-key")
+
+    async def run():
+        calls = [
+            client.create_chat_completion(model="stub", messages=[{"role": "user", "content": str(i)}])
+            for i in range(10)
+        ]
+        responses = await asyncio.gather(*calls)
+        await client.close()
+        return [r.choices[0].message["content"] for r in responses]
+
+    assert asyncio.run(run()) == [f"echo: {i}" for i in range(10)]
+    assert _StubChatCompletions.max_in_flight == 3
+
+
+def test_agenerate_description_timeout_and_cache(stub_api_base, monkeypatch) -> None:
+    monkeypatch.setattr(openai, "api_key", "test-key")
+    client = AsyncChatClient(max_concurrency=2, timeout=5, api_base=stub_api_base, api_key="test-key")
+    engine = NarrativeEngine(cache=ResponseCache(), async_client=client)
+
+    async def run():
+        first = await engine.agenerate_description("a shrine")
+        second = await engine.agenerate_description("a shrine")
+        _StubChatCompletions.delay = 0.5
+        client.timeout = 0.1
+        timed_out = await engine.agenerate_description("a market")
+        await client.close()
+        return first, second, timed_out
+
+    first, second, timed_out = asyncio.run(run())
+    assert first.startswith("echo: Describe the following topic") and first == second
+    assert engine.cache.stats()["hits"] == 1
+    assert "timed out" in timed_out
+
+
+def test_streamed_description_sync_and_async(stub_api_base, monkeypatch) -> None:
+    monkeypatch.setattr(openai, "api_key", "test-key")
+    monkeypatch.setattr(openai, "api_base", stub_api_base)
+    client = AsyncChatClient(api_base=stub_api_base, api_key="test-key")
+    engine = NarrativeEngine(cache=ResponseCache(), async_client=client)
+
+    assert list(engine.stream_description("a forge")) == ["Ash", " and", " embers."]
+    assert list(engine.stream_description("a forge")) == ["Ash and embers."]  # served from cache
+
+    async def run():
+        pieces = [piece async for piece in engine.astream_description("a river")]
+        await client.close()
+        return pieces
+
+    assert asyncio.run(run()) == ["Ash", " and", " embers."]
+
+
+def test_empty_streamed_description_is_not_cached(stub_api_base, monkeypatch) -> None:
+    monkeypatch.setattr(openai, "api_key", "test-key")
+    monkeypatch.setattr(openai, "api_base", stub_api_base)
+    monkeypatch.setattr(_StubChatCompletions, "words", [])
+    client = AsyncChatClient(api_base=stub_api_base, api_key="test-key")
+    engine = NarrativeEngine(cache=ResponseCache(), async_client=client)
+
+    assert list(engine.stream_description("a void")) == []
+
+    async def run():
+        pieces = [piece async for piece in engine.astream_description("a void")]
+        await client.close()
+        return pieces
+
+    assert asyncio.run(run()) == []
+    assert engine.cache.stats()["memory_entries"] == 0
+
+
+def test_session_of_a_finished_loop_is_closed(stub_api_base, recwarn) -> None:
+    client = AsyncChatClient(timeout=5, api_base=stub_api_base, api_key="test-key")
+
+    async def call():
+        await client.create_chat_completion(model="stub", messages=[{"role": "user", "content": "hola"}])
+        return client._session
+
+    first = asyncio.run(call())
+    second = asyncio.run(call())
+    assert first.closed and not second.closed
+    asyncio.run(client.close())
+    del first, second
+    gc.collect()
+    assert not [w for w in recwarn if "Unclosed client session" in str(w.message)]
+
+
+def test_closing_an_abandoned_stream_frees_its_slot(stub_api_base, monkeypatch) -> None:
+    monkeypatch.setattr(openai, "api_key", "test-key")
+    client = AsyncChatClient(max_concurrency=1, timeout=5, api_base=stub_api_base, api_key="test-key")
+    engine = NarrativeEngine(cache=ResponseCache(), async_client=client)
+
+    async def run():
+        async with contextlib.aclosing(engine.astream_description("a bridge")) as pieces:
+            first = await anext(pieces)
+            assert client._semaphore.locked()
+        # The only slot is free again without waiting for garbage collection.
+        assert not client._semaphore.locked()
+        second = await client.create_chat_completion(model="stub", messages=[{"role": "user", "content": "x"}])
+        await client.close()
+        return first, second.choices[0].message["content"]
+
+    assert asyncio.run(run()) == ("Ash", "echo: x")
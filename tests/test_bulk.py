@@ -0,0 +1,50 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.bulk import bulk_upsert
+from database.instrumentation import QueryCounter
+from database.models import Base, Character, Spell, Technique
+import populate_db
+
+
+def _session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_bulk_upsert_inserts_then_updates_in_batches() -> None:
+    session = _session()
+    rows = [{"name": f"Hechizo {i}", "spell_level": 1, "school": "evocation"} for i in range(25)]
+    with QueryCounter(session.get_bind()) as counter:
+        stats = bulk_upsert(session, Spell, rows, ["name"], batch_size=10)
+    assert (stats.inserted, stats.updated) == (25, 0)
+    # One prefetch plus one statement per batch, independent of the row count.
+    assert counter.count <= 1 + 3 + 2
+
+    rows[0]["school"] = "abjuration"
+    stats = bulk_upsert(session, Spell, rows, ["name"], batch_size=10)
+    assert (stats.inserted, stats.updated) == (0, 25)
+    assert session.query(Spell).count() == 25
+    assert session.query(Spell).filter_by(name="Hechizo 0").one().school == "abjuration"
+
+
+def test_reseeding_techniques_updates_on_composite_key() -> None:
+    session = _session()
+    data = {"elemental_techniques": [
+        {"elemento": "Fuego", "tecnicas": [{"nombre": "Palma Ardiente", "rango": "Básica"}]},
+        {"elemento": "Agua", "tecnicas": [{"nombre": "Palma Ardiente", "rango": "Media", "extra": 1}]},
+    ]}
+    populate_db.populate_techniques(session, data)
+    data["elemental_techniques"][0]["tecnicas"][0]["rango"] = "Maestra"
+    populate_db.populate_techniques(session, data)
+
+    ranks = {t.element_association: t.rank for t in session.query(Technique)}
+    assert ranks == {"Fuego": "Maestra", "Agua": "Media"}
+
+    char_data = {"name": "Liáng Wǔzhào", "dexterity_score": 14, "intelligence_score": 12, "proficiency_bonus": 2}
+    populate_db.populate_character_liang_wuzhao(session, char_data, data)
+    populate_db.populate_character_liang_wuzhao(session, char_data, data)
+    session.commit()
+    liang = session.query(Character).one()
+    assert [ckt.technique.rank for ckt in liang.known_techniques] == ["Maestra"]
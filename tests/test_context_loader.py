@@ -0,0 +1,106 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from agent.context_loader import PromptContextLoader
+from database.models import (
+    Base, Character, CharacterTitle, CharacterCompatibleElement, CharacterReclusionState,
+    CharacterKnownTechniques, Technique, DmGuidelineSet, CampaignEvent, CultivationRealm, WorldState,
+)
+
+
+def _seed(session, technique_count: int) -> None:
+    character = Character(name="Liáng Wǔzhào", level=5, hp_max=30, hp_current=25, mana_max=40, mana_current=12)
+    character.titles.append(CharacterTitle(title_name="Heredero de la Llama", is_active=True))
+    character.compatible_elements.append(CharacterCompatibleElement(element_description="Fuego"))
+    character.reclusion_state = CharacterReclusionState(start_day=1, end_day=10, days_remaining=4)
+    for i in range(technique_count):
+        technique = Technique(name=f"Llama {i}", rank="Básica", element_association="Fuego", mana_cost=i)
+        character.known_techniques.append(CharacterKnownTechniques(technique=technique))
+    session.add_all([
+        character,
+        DmGuidelineSet(name="Guía", tone_style="Épico", system_base="D&D 5e"),
+        CampaignEvent(title="Caída del Monasterio", summary_content="Ruinas.", day_range_start=1),
+        CultivationRealm(name="Refinamiento de Qi", realm_order=1, level_range="Nivel 1"),
+    ])
+    session.commit()
+
+
+def _load(technique_count: int, include_realms: bool):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    _seed(session, technique_count)
+    session.expunge_all()
+    loader = PromptContextLoader()
+    return loader.load(session, "Liáng Wǔzhào", "Guía", include_realms=include_realms), loader.last_query_count
+
+
+def test_prompt_context_is_loaded_in_fixed_number_of_queries() -> None:
+    context, query_count = _load(technique_count=3, include_realms=True)
+    assert context.guideline["tone_style"] == "Épico"
+    assert context.character["titles"] == "Heredero de la Llama"
+    assert "Remaining: 4 days" in context.character["reclusion"]
+    assert [t.name for t in context.known_techniques] == ["Llama 0", "Llama 1", "Llama 2"]
+    assert context.recent_event["title"] == "Caída del Monasterio"
+    assert context.cultivation_realms == [("Refinamiento de Qi", "Nivel 1")]
+    # guideline, character, titles, elements, known techniques, latest event, realms
+    assert query_count == 7
+
+    _, many_techniques_count = _load(technique_count=25, include_realms=False)
+    assert many_techniques_count == 6
+
+
+def test_snapshot_reused_until_a_watched_model_changes() -> None:
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    _seed(session, technique_count=2)
+    loader = PromptContextLoader()
+
+    loader.load(session, "Liáng Wǔzhào", "Guía")
+    assert loader.last_query_count > 0
+    loader.load(session, "Liáng Wǔzhào", "Guía")
+    assert loader.last_query_count == 0
+    realms = loader.load(session, "Liáng Wǔzhào", "Guía", include_realms=True).cultivation_realms
+    assert realms and loader.last_query_count == 1
+
+    session.add(WorldState(current_day=2))  # not part of the prompt context
+    session.commit()
+    loader.load(session, "Liáng Wǔzhào", "Guía")
+    assert loader.last_query_count == 0
+
+    character = session.query(Character).filter_by(name="Liáng Wǔzhào").one()
+    character.titles.append(CharacterTitle(title_name="Azote del Norte", is_active=True))
+    session.commit()
+    context = loader.load(session, "Liáng Wǔzhào", "Guía")
+    assert loader.last_query_count > 0
+    assert "Azote del Norte" in context.character["titles"]
+
+
+def test_snapshot_invalidated_on_commit_not_on_flush(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'context.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    writer, reader = factory(), factory()
+    _seed(writer, technique_count=1)
+    loader = PromptContextLoader()
+    loader.load(reader, "Liáng Wǔzhào", "Guía")
+
+    character = writer.query(Character).filter_by(name="Liáng Wǔzhào").one()
+    character.level = 6
+    writer.flush()
+    # The writer sees its own change; other sessions keep the committed snapshot.
+    assert loader.load(writer, "Liáng Wǔzhào", "Guía").character["level"] == 6
+    assert loader.load(reader, "Liáng Wǔzhào", "Guía").character["level"] == 5
+    assert loader.last_query_count == 0
+
+    writer.rollback()
+    assert loader.load(reader, "Liáng Wǔzhào", "Guía").character["level"] == 5
+    assert loader.last_query_count == 0
+
+    character.level = 7
+    writer.commit()
+    reader.rollback()  # end the reader's read transaction so it sees the commit
+    assert loader.load(reader, "Liáng Wǔzhào", "Guía").character["level"] == 7
+    writer.close()
+    reader.close()
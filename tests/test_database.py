@@ -10,3 +10,30 @@ def test_log_event(tmp_path: Path) -> None:
     assert db.list_events() == ["inicio"]
     db2 = Database(db_file)
     assert db2.list_events() == ["inicio"]
+
+
+def test_journal_replay_recovers_from_torn_write(tmp_path: Path) -> None:
+    db_file = tmp_path / "db.json"
+    db = Database(db_file, compact_every=100)
+    db.log_event("uno")
+    db.log_event("dos")
+    with db.journal_path.open("ab") as fh:
+        fh.write(b'{"seq": 2, "ev')  # crash in the middle of a write
+    db2 = Database(db_file)
+    assert db2.list_events() == ["uno", "dos"]
+    db2.log_event("tres")
+    assert Database(db_file).list_events() == ["uno", "dos", "tres"]
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path: Path) -> None:
+    db_file = tmp_path / "db.json"
+    db = Database(db_file, compact_every=3)
+    db.get_character("Liáng")["level"] = 2
+    for i in range(4):
+        db.log_event(f"evento {i}")
+    assert db.journal_path.read_text(encoding="utf-8").count("\n") == 1
+    db.close()
+    assert db.journal_path.stat().st_size == 0
+    reopened = Database(db_file)
+    assert reopened.list_events() == [f"evento {i}" for i in range(4)]
+    assert reopened.get_character("Liáng") == {"level": 2}
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, DiceRollHistory
+from engine.dice import DiceExpressionError, DiceRoller, parse_expression, record_rolls, roll_history_row
+
+
+def test_parse_expressions() -> None:
+    parsed = parse_expression("4d6dl1 + 1d8! - 2")
+    assert parsed.modifier == -2
+    assert [(t.count, t.sides, t.kept, t.explode) for t in parsed.terms] == [(4, 6, 3, False), (1, 8, 1, True)]
+    assert parse_expression("d%").terms[0].sides == 100
+    for bad in ("", "1d0", "2d6kh3", "2d6dl2", "1d20 5", "1d1!", "fireball"):
+        with pytest.raises(DiceExpressionError):
+            parse_expression(bad)
+
+
+def test_batched_rolls_are_seeded_and_bounded() -> None:
+    first = DiceRoller(seed=7).roll_many("1d20+5", 500)
+    second = DiceRoller(seed=7).roll_many("1d20+5", 500)
+    assert np.array_equal(first.totals, second.totals)
+    assert first.totals.min() >= 6 and first.totals.max() <= 25
+
+    roller = DiceRoller(seed=1)
+    advantage = roller.roll_many("1d20", 5000, advantage=True)
+    assert advantage.dice[0].shape == (5000, 2)
+    assert np.array_equal(advantage.totals, advantage.dice[0].max(axis=1))
+    assert roller.roll_many("1d20", 5000, disadvantage=True).totals.mean() < 10 < advantage.totals.mean()
+
+    exploding = roller.roll_many("1d6!", 5000)
+    assert exploding.totals.max() > 6 and exploding.totals.mean() > 3.5 * 1.15
+
+    results = roller.roll_group(["1d20+4", "1d20+6", "1d20+4"])
+    assert [r.expression for r in results] == ["1d20+4", "1d20+6", "1d20+4"]
+    assert all(r.total == r.rolls[0] + r.modifier for r in results)
+
+
+def test_record_rolls() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    roller = DiceRoller(seed=3)
+    with sessionmaker(bind=engine)() as db_session:
+        rows = [
+            roll_history_row(result, f"Bandido {i}", "attack", roller_type="enemy", target_dc=14)
+            for i, result in enumerate(roller.roll_many("1d20+3", 12).results())
+        ]
+        assert record_rolls(db_session, rows) == 12
+        db_session.commit()
+        stored = db_session.scalars(select(DiceRollHistory).order_by(DiceRollHistory.id)).all()
+        assert len(stored) == 12
+        assert all(r.total_result == r.individual_rolls_json[0] + 3 and r.modifiers == 3 for r in stored)
+        assert all(r.success == (r.total_result >= 14) for r in stored)
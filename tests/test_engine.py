@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+import database.engine as db_engine
+
+
+def test_file_sqlite_engine_uses_wal_and_reports_pool_metrics(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(db_engine, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(db_engine, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(db_engine, "DB_POOL_TIMEOUT", 0.05)
+    engine = db_engine.create_configured_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        metrics = db_engine.get_pool_metrics(engine)
+        assert metrics["checked_out"] == 1
+        assert metrics["timeouts"] == 1
+        assert metrics["max_wait_seconds"] >= 0.05
+
+    assert db_engine.get_pool_metrics(engine)["checked_out"] == 0
+    engine.dispose()
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.orm import sessionmaker
+
+from database.bulk import bulk_upsert
+from database import event_tags
+from database.event_tags import TagExpressionError, find_events_by_tags
+from database.instrumentation import QueryCounter
+from database.models import Base, CampaignEvent, CampaignEventTag
+from database.schema import ensure_schema
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def _titles(events) -> list[str]:
+    return [e.title for e in events]
+
+
+def test_tag_expressions_and_day_ranges(db_session) -> None:
+    db_session.add_all([
+        CampaignEvent(title="Emboscada", day_range_start=3, day_range_end=4, event_tags_json=["Combate", "Secta"]),
+        CampaignEvent(title="Banquete", day_range_start=10, event_tags_json=["Diplomacia", "Clan Yun"]),
+        CampaignEvent(title="Duelo", day_range_start=20, day_range_end=25, event_tags_json=["combate", "Clan Yun", "Traición"]),
+    ])
+    db_session.commit()
+
+    assert _titles(find_events_by_tags(db_session, "combate")) == ["Emboscada", "Duelo"]
+    assert _titles(find_events_by_tags(db_session, 'combate "clan yun"')) == ["Duelo"]
+    assert _titles(find_events_by_tags(db_session, "secta OR diplomacia")) == ["Emboscada", "Banquete"]
+    assert _titles(find_events_by_tags(db_session, "(combate OR diplomacia) NOT traicion")) == ["Emboscada", "Banquete"]
+    assert _titles(find_events_by_tags(db_session, "combate", day_start=4, day_end=22)) == ["Emboscada", "Duelo"]
+    assert _titles(find_events_by_tags(db_session, "combate", day_start=5, day_end=19)) == []
+
+    duel = db_session.scalars(select(CampaignEvent).where(CampaignEvent.title == "Duelo")).one()
+    duel.event_tags_json = ["Diplomacia"]
+    db_session.commit()
+    assert _titles(find_events_by_tags(db_session, "diplomacia")) == ["Banquete", "Duelo"]
+
+    db_session.delete(duel)
+    db_session.commit()
+    assert db_session.scalar(select(CampaignEventTag).where(CampaignEventTag.event_id == duel.id)) is None
+
+    for malformed in ("", "combate AND", "(secta", "secta )", 'clan "yun'):
+        with pytest.raises(TagExpressionError):
+            find_events_by_tags(db_session, malformed)
+
+
+def test_bulk_writes(db_session) -> None:
+    bulk_upsert(db_session, CampaignEvent, [
+        {"title": "Subasta", "day_range_start": 7, "event_tags_json": ["Comercio"]},
+    ], ["title"])
+    db_session.commit()
+    assert _titles(find_events_by_tags(db_session, "comercio")) == ["Subasta"]
+
+
+def test_migration_backfills_tags_once(tmp_path, capsys) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'tags.db'}")
+    assert ensure_schema(engine) == "created"
+    # A database from before the tag table existed: events with tags, no tag rows.
+    with engine.begin() as conn:
+        conn.execute(insert(CampaignEvent.__table__), [
+            {"title": "Torneo", "day_range_start": 9, "event_tags_json": ["Combate"]},
+            {"title": "Calma", "day_range_start": 10, "event_tags_json": []},
+        ])
+        conn.execute(CampaignEventTag.__table__.delete())
+        conn.execute(text("UPDATE schema_version SET fingerprint = 'before-campaign-event-tags'"))
+
+    assert ensure_schema(engine) == "migrated"
+    assert "Backfilled 1 campaign event tags." in capsys.readouterr().out
+    with sessionmaker(bind=engine)() as session:
+        assert _titles(find_events_by_tags(session, "combate")) == ["Torneo"]
+
+    # No tag rows for "Calma", but nothing is rescanned on the next start.
+    with QueryCounter(engine) as counter:
+        assert ensure_schema(engine) == "current"
+    assert counter.count == 1
+
+
+def test_bulk_upsert_retags_only_the_changed_event(db_session, monkeypatch) -> None:
+    db_session.add_all([CampaignEvent(title=f"Evento {i}", event_tags_json=["calma"]) for i in range(3)])
+    db_session.commit()
+
+    def no_backfill(conn):
+        raise AssertionError("full backfill")
+    monkeypatch.setattr(event_tags, "backfill_event_tags", no_backfill)
+
+    bulk_upsert(db_session, CampaignEvent, [{"title": "Evento 1", "event_tags_json": ["Combate"]}], ["title"])
+    db_session.commit()
+    assert _titles(find_events_by_tags(db_session, "combate")) == ["Evento 1"]
+    assert _titles(find_events_by_tags(db_session, "calma")) == ["Evento 0", "Evento 2"]
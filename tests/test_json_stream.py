@@ -0,0 +1,34 @@
+import io
+import os
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.json_stream import iter_json_array
+from database.models import Base, DiceRollHistory
+import populate_db
+
+
+def test_iter_json_array_across_chunk_boundaries() -> None:
+    document = '{"meta": {"skip": [1, 2]}, "rolls": [12345, -1.5e3, "a,]b", [], {"n": null}, true]}'
+    expected = json.loads(document)["rolls"]
+    for chunk_size in (1, 2, 5, 64):
+        assert list(iter_json_array(io.StringIO(document), key="rolls", chunk_size=chunk_size)) == expected
+    assert list(iter_json_array(io.StringIO(" [ ] "))) == []
+
+
+def test_dice_roll_history_is_streamed_and_reseeded_idempotently() -> None:
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    expected = len(json.load(open(os.path.join(populate_db.DATA_DIR, "dice_roll_history.json"), encoding="utf-8"))["dice_roll_history"])
+
+    for _ in range(2):
+        records = populate_db.iter_records("dice_roll_history.json", "dice_roll_history")
+        populate_db.populate_dice_roll_history(session, records, batch_size=2)
+    session.commit()
+
+    assert session.query(DiceRollHistory).count() == expected
+    assert "dm_rules.json" in populate_db.DATA_FILES.values()
+    assert populate_db.DM_RULES_DATA is populate_db.load_data("dm_rules.json")
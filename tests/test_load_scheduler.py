@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.load_scheduler import LoadScheduler, LoaderCycleError
+from database.models import (
+    Base, Character, CharacterKnownTechniques, Party, Session, Spell, Technique, party_member_association,
+)
+
+
+def _scheduler(calls: list) -> LoadScheduler:
+    scheduler = LoadScheduler()
+    scheduler.add("session", lambda s: calls.append("session"), writes=[Session])
+    scheduler.add("party", lambda s: calls.append("party"), writes=[Party, party_member_association])
+    scheduler.add("character", lambda s: calls.append("character"), writes=[Character, CharacterKnownTechniques])
+    scheduler.add("spells", lambda s: calls.append("spells"), writes=[Spell])
+    scheduler.add("techniques", lambda s: calls.append("techniques"), writes=[Technique])
+    return scheduler
+
+
+def test_stages_follow_foreign_keys() -> None:
+    stages = [[loader.name for loader in stage] for stage in _scheduler([]).stages()]
+    assert stages == [["spells", "techniques"], ["character"], ["party"], ["session"]]
+
+
+def test_serial_run_on_sqlite_respects_order_and_detects_cycles() -> None:
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    calls = []
+    # Parallel mode is not available on SQLite and falls back to a serial run.
+    _scheduler(calls).run(sessionmaker(bind=engine), parallel=True)
+    assert calls == ["spells", "techniques", "character", "party", "session"]
+
+    scheduler = LoadScheduler()
+    scheduler.add("a", lambda s: None, writes=[Spell], after=["b"])
+    scheduler.add("b", lambda s: None, writes=[Technique], after=["a"])
+    with pytest.raises(LoaderCycleError):
+        scheduler.stages()
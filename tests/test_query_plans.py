@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine, text
+
+from benchmarks.query_plans import _measure, _metadata_without_indexes, _queries, _seed
+from database.models import Base
+
+
+def test_hot_path_queries_use_indexes() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    _seed(engine, sessions=50)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+    for name, statement in _queries(50).items():
+        plan, _ = _measure(engine, statement, repeat=1)
+        assert any("USING INDEX" in step for step in plan), (name, plan)
+        assert not any("TEMP B-TREE" in step for step in plan), (name, plan)
+
+
+def test_baseline_metadata_has_no_secondary_indexes() -> None:
+    assert not any(table.indexes for table in _metadata_without_indexes().tables.values())
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from engine.response_cache import ResponseCache
+
+
+def test_lru_eviction_and_counters() -> None:
+    cache = ResponseCache(max_entries=2, ttl_seconds=None)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "a" becomes most recently used
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    assert cache.stats() == {
+        "hits": 2, "memory_hits": 2, "disk_hits": 0, "misses": 1, "evictions": 1, "memory_entries": 2,
+    }
+
+
+def test_ttl_expiry() -> None:
+    cache = ResponseCache(ttl_seconds=-1)
+    cache.set("a", "1")
+    assert cache.get("a") is None
+
+
+def test_disk_tier_survives_restart(tmp_path: Path) -> None:
+    db_path = str(tmp_path / "cache.db")
+    key = ResponseCache.make_key("gpt", [{"role": "user", "content": "a   tavern"}], temperature=0.7)
+    first = ResponseCache(db_path=db_path)
+    first.set(key, "A smoky tavern.")
+    first.close()
+
+    second = ResponseCache(db_path=db_path)
+    same_key = ResponseCache.make_key("gpt", [{"role": "user", "content": "a tavern "}], temperature=0.7)
+    assert second.get(same_key) == "A smoky tavern."
+    assert second.stats()["disk_hits"] == 1
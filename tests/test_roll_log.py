@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, DiceRollHistory
+from engine.dice import DiceRoller, roll_history_row
+from engine.roll_log import RollLog, RollLogFullError
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rolls.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _rows(n: int) -> list[dict]:
+    return [roll_history_row(r, "Bandido", "attack", roller_type="enemy")
+            for r in DiceRoller(seed=5).roll_many("1d20+2", n).results()]
+
+
+def _stored(session_factory) -> int:
+    with session_factory() as db_session:
+        return db_session.scalar(select(func.count(DiceRollHistory.id)))
+
+
+def test_batches_flush_on_size_encounter_end_and_close(session_factory) -> None:
+    roll_log = RollLog(session_factory, batch_size=50, flush_interval=60)
+    roll_log.log_many(_rows(120))
+    assert roll_log.encounter_ended(timeout=10)
+    assert _stored(session_factory) == 120 and roll_log.pending == 0
+    assert roll_log.batches == 3
+
+    roll_log.log_many(_rows(7))  # below batch_size, long interval: only close() writes it
+    roll_log.close()
+    assert _stored(session_factory) == 127
+    with pytest.raises(RuntimeError):
+        roll_log.log(_rows(1)[0])
+
+
+def test_backpressure_limit(session_factory) -> None:
+    gate = threading.Event()
+
+    def slow_factory():
+        gate.wait(10)
+        return session_factory()
+
+    roll_log = RollLog(slow_factory, batch_size=10, flush_interval=0.01, max_pending=20, put_timeout=0.1)
+    roll_log.log_many(_rows(20))
+    with pytest.raises(RollLogFullError):
+        roll_log.log_many(_rows(5))
+    gate.set()
+    roll_log.log_many(_rows(5))
+    roll_log.close()
+    assert _stored(session_factory) == 25 and roll_log.dropped == 0
+
+
+def test_unexpected_errors_drop_the_batch_and_keep_the_writer_alive(session_factory) -> None:
+    broken = threading.Event()
+    broken.set()
+
+    def flaky_factory():
+        if broken.is_set():
+            raise RuntimeError("Database not initialized. Call init_db() first.")
+        return session_factory()
+
+    roll_log = RollLog(flaky_factory, batch_size=10, flush_interval=0.01)
+    roll_log.log_many(_rows(10))
+    assert roll_log.flush(timeout=5)
+    assert roll_log.dropped == 10 and roll_log.pending == 0
+
+    broken.clear()
+    roll_log.log_many(_rows(4))
+    assert roll_log.flush(timeout=5)
+    roll_log.close()
+    assert _stored(session_factory) == 4
+    assert roll_log.stats() == {"pending": 0, "written": 4, "batches": 1, "failures": 0, "dropped": 10}
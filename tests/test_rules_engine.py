@@ -0,0 +1,117 @@
+import random
+import string
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, RuleSet
+from engine.rule_search import MAX_FUZZY_CANDIDATES, RuleKeywordIndex
+from engine.rules_engine import RulesEngine
+
+
+def _make_session():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def test_check_rule_first_ruleset_wins() -> None:
+    session = _make_session()
+    session.add(RuleSet(name="Core", rules_json=[{"keyword": "stealth", "dc": 10}]))
+    session.add(RuleSet(name="Homebrew", rules_json={"stealth": {"dc": 15}, "fireball": {"damage": "8d6"}}))
+    session.commit()
+
+    engine = RulesEngine(session)
+    stealth = engine.check_rule("stealth")
+    assert stealth["outcome"] == "success"
+    assert stealth["ruleset_name"] == "Core"
+    assert engine.check_rule("fireball")["rule_applied"] == {"damage": "8d6"}
+    assert engine.check_rule("parry")["outcome"] == "not_found"
+
+
+def test_rule_index_rebuilt_after_ruleset_changes() -> None:
+    session = _make_session()
+    engine = RulesEngine(session)
+    assert engine.check_rule("stealth")["outcome"] == "no_rulesets"
+
+    ruleset = RuleSet(name="Core", rules_json=[{"keyword": "stealth", "dc": 10}])
+    session.add(ruleset)
+    session.commit()
+    assert engine.check_rule("stealth")["rule_applied"]["dc"] == 10
+
+    ruleset.rules_json = [{"keyword": "stealth", "dc": 12}]
+    session.commit()
+    assert engine.check_rule("stealth")["rule_applied"]["dc"] == 12
+
+    session.delete(ruleset)
+    session.commit()
+    assert engine.check_rule("stealth")["outcome"] == "no_rulesets"
+
+
+
+def test_rule_index_follows_commits_bulk_updates_and_rollbacks() -> None:
+    session = _make_session()
+    session.add(RuleSet(name="Core", rules_json=[{"keyword": "stealth", "dc": 10}]))
+    session.commit()
+    other = sessionmaker(bind=session.get_bind())()
+    engine = RulesEngine(other)
+    assert engine.check_rule("stealth")["rule_applied"]["dc"] == 10
+
+    # Flushed but not committed: other sessions keep the compiled rules.
+    session.query(RuleSet).one().rules_json = [{"keyword": "stealth", "dc": 14}]
+    session.flush()
+    assert not engine.rule_index.is_stale
+    session.rollback()
+    assert not engine.rule_index.is_stale
+
+    session.execute(update(RuleSet).values(rules_json=[{"keyword": "stealth", "dc": 16}]))
+    assert not engine.rule_index.is_stale
+    session.commit()
+    assert engine.check_rule("stealth")["rule_applied"]["dc"] == 16
+
+def test_check_rules_batch_preserves_order() -> None:
+    session = _make_session()
+    session.add(RuleSet(name="Core", rules_json=[{"keyword": "move"}, {"keyword": "attack"}]))
+    session.commit()
+
+    results = RulesEngine(session).check_rules(["attack", ("dodge", 1), "move"])
+    assert [r["action_keyword"] for r in results] == ["attack", "dodge", "move"]
+    assert [r["outcome"] for r in results] == ["success", "not_found", "success"]
+
+
+def test_search_rules_alias_prefix_and_fuzzy() -> None:
+    session = _make_session()
+    session.add(RuleSet(name="Core", rules_json=[
+        {"keyword": "attack_melee", "aliases": {"es": ["atacar", "ataque cuerpo a cuerpo"]}},
+        {"keyword": "attack_ranged"},
+        {"keyword": "meditación"},
+    ]))
+    session.commit()
+    engine = RulesEngine(session)
+
+    assert engine.search_rules("atacar")[0]["keyword"] == "attack_melee"
+    assert {hit["keyword"] for hit in engine.search_rules("att")} == {"attack_melee", "attack_ranged"}
+    fuzzy_hit = engine.search_rules("meditacoin")[0]
+    assert (fuzzy_hit["keyword"], fuzzy_hit["match_type"]) == ("meditación", "fuzzy")
+
+    assert engine.check_rule("atacar")["outcome"] == "not_found"
+    assert engine.check_rule("atacar", fuzzy=True)["matched_keyword"] == "attack_melee"
+
+
+def test_keyword_search_at_scale() -> None:
+    rng = random.Random(7)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12))) for _ in range(12000)]
+    index = RuleKeywordIndex()
+    suffixes = ["ataque", "defensa", "hechizo", "movimiento"]
+    for word in words:
+        index.add(f"{word}_{rng.choice(suffixes)}")
+    index.freeze()
+
+    queries = [word[:2] + word[3:] for word in words[:200]]  # one deleted letter each
+    for word, query in zip(words, queries):
+        assert any(hit["matched"] == word for hit in index.search(query))
+    # Each query counts a small slice of the ~24000 terms' postings (about 600 here) and
+    # computes the edit distance for at most MAX_FUZZY_CANDIDATES of them.
+    assert index.postings_visited / len(queries) < 1500
+    assert index.candidates_compared <= MAX_FUZZY_CANDIDATES * len(queries)
+    assert len(index.search("ataque")) == 5
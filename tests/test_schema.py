@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, create_engine, inspect, text
+
+from database.instrumentation import QueryCounter
+from database.schema import SchemaOutOfDateError, ensure_schema, migrate
+
+
+def _metadata(with_extra: bool) -> MetaData:
+    metadata = MetaData()
+    columns = [Column("id", Integer, primary_key=True), Column("name", String, nullable=False)]
+    if with_extra:
+        columns.append(Column("region", String, nullable=True))
+    Table("places", metadata, *columns)
+    if with_extra:
+        Table("roads", metadata, Column("id", Integer, primary_key=True))
+        Index("ix_places_region", metadata.tables["places"].c.region)
+    return metadata
+
+
+def test_hot_start_is_a_single_query(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    assert ensure_schema(engine, metadata=_metadata(False)) == "created"
+    with QueryCounter(engine) as counter:
+        assert ensure_schema(engine, metadata=_metadata(False)) == "current"
+    assert counter.count == 1
+
+
+def test_out_of_date_schema_is_migrated_additively(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    ensure_schema(engine, metadata=_metadata(False))
+
+    with pytest.raises(SchemaOutOfDateError):
+        ensure_schema(engine, auto_migrate=False, metadata=_metadata(True))
+    changes = migrate(engine, _metadata(True), verbose=False)
+    assert [t.name for t in changes["tables"]] == ["roads"]
+    assert [c.name for c in changes["columns"]] == ["region"]
+
+    inspector = inspect(engine)
+    assert "region" in {c["name"] for c in inspector.get_columns("places")}
+    assert "ix_places_region" in {i["name"] for i in inspector.get_indexes("places")}
+    assert ensure_schema(engine, auto_migrate=False, metadata=_metadata(True)) == "current"
+
+
+def test_not_null_column_without_server_default_blocks_the_migration(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    ensure_schema(engine, metadata=_metadata(False))
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO places (name) VALUES ('Cruce de los Mil Vientos')"))
+
+    metadata = _metadata(True)
+    places = metadata.tables["places"]
+    places.append_column(Column("kind", String, nullable=False))
+    places.append_column(Column("visits", Integer, nullable=False, server_default="0"))
+    with pytest.raises(SchemaOutOfDateError, match=r"places\.kind"):
+        migrate(engine, metadata, verbose=False)
+    with pytest.raises(SchemaOutOfDateError, match=r"places\.kind"):
+        ensure_schema(engine, metadata=metadata)
+    # Nothing was applied or stamped: the schema stays out of date until the column is added by hand.
+    live_columns = {c["name"] for c in inspect(engine).get_columns("places")}
+    assert not {"region", "visits", "kind"} & live_columns
+    with pytest.raises(SchemaOutOfDateError):
+        ensure_schema(engine, auto_migrate=False, metadata=metadata)
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE places ADD COLUMN kind VARCHAR NOT NULL DEFAULT 'cruce'"))
+    changes = migrate(engine, metadata, verbose=False)
+    assert [c.name for c in changes["columns"]] == ["region", "visits"]
+    assert ensure_schema(engine, auto_migrate=False, metadata=metadata) == "current"
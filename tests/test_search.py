@@ -0,0 +1,102 @@
+from sqlalchemy import create_engine, delete, update
+from sqlalchemy.orm import sessionmaker
+
+from database import search
+from database.bulk import bulk_upsert
+from database.models import Base, CampaignEvent
+from database.instrumentation import QueryCounter
+from database.schema import ensure_schema
+from database.search import search_campaign_events, search_terms
+
+
+def _session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    assert ensure_schema(engine) == "created"
+    return sessionmaker(bind=engine)
+
+
+def test_terms_fold_accents_and_stem() -> None:
+    assert search_terms("Liáng Wǔzhào") == search_terms("liang wuzhao")
+    assert search_terms("Monasterios") == search_terms("monasterio")
+    assert search_terms("luces") == ["luz"]
+    for singular, plural in [("mujer", "mujeres"), ("lugar", "lugares"), ("canción", "canciones"), ("clase", "clases")]:
+        assert search_terms(singular) == search_terms(plural)
+
+
+def test_singular_and_plural_queries_match_both_ways(tmp_path) -> None:
+    factory = _session_factory(tmp_path)
+    with factory() as db_session:
+        db_session.add_all([
+            CampaignEvent(title="La mujer del lugar"),
+            CampaignEvent(title="Canciones de los pueblos"),
+        ])
+        db_session.commit()
+        for query in ("mujeres", "lugares", "mujer lugar"):
+            assert [e.title for e in search_campaign_events(db_session, query)] == ["La mujer del lugar"]
+        for query in ("canción", "pueblo"):
+            assert [e.title for e in search_campaign_events(db_session, query)] == ["Canciones de los pueblos"]
+
+
+def test_ranked_search_follows_orm_and_bulk_writes(tmp_path) -> None:
+    factory = _session_factory(tmp_path)
+    with factory() as db_session:
+        db_session.add_all([
+            CampaignEvent(title="Duelo en el monasterio", summary_content="Liáng Wǔzhào derrota a un discípulo."),
+            CampaignEvent(title="Viaje al sur", summary_content="Pasan junto a varios monasterios en ruinas."),
+        ])
+        db_session.commit()
+
+        titles = [e.title for e in search_campaign_events(db_session, "monasterios")]
+        assert titles == ["Duelo en el monasterio", "Viaje al sur"]
+        assert [e.title for e in search_campaign_events(db_session, "liang wuzhao")] == ["Duelo en el monasterio"]
+
+        duel = db_session.query(CampaignEvent).filter_by(title="Duelo en el monasterio").one()
+        duel.summary_content = "Una tormenta de rayos."
+        db_session.commit()
+        assert search_campaign_events(db_session, "Wuzhao") == []
+
+        bulk_upsert(db_session, CampaignEvent, [
+            {"title": "Subasta", "summary_content": "Se subasta la Espada del Dragón.", "event_tags_json": ["comercio"]},
+        ], ["title"])
+        db_session.commit()
+        assert [e.title for e in search_campaign_events(db_session, "dragon comercio")] == ["Subasta"]
+
+        db_session.delete(duel)
+        db_session.commit()
+        assert search_campaign_events(db_session, "tormenta") == []
+
+
+def test_bulk_statements_reindex_only_the_rows_they_touch(tmp_path, monkeypatch) -> None:
+    factory = _session_factory(tmp_path)
+    with factory() as db_session:
+        db_session.add_all([CampaignEvent(title=f"Evento {i}", summary_content="calma") for i in range(5)])
+        db_session.commit()
+
+        def no_full_rebuild(conn):
+            raise AssertionError("full rebuild")
+        monkeypatch.setattr(search, "rebuild_search_index", no_full_rebuild)
+
+        bulk_upsert(db_session, CampaignEvent, [{"title": "Evento 2", "summary_content": "tormenta"}], ["title"])
+        bulk_upsert(db_session, CampaignEvent, [{"title": "Evento nuevo", "summary_content": "tormenta"}], ["title"])
+        db_session.commit()
+        assert sorted(e.title for e in search_campaign_events(db_session, "tormenta")) == ["Evento 2", "Evento nuevo"]
+        assert len(search_campaign_events(db_session, "calma")) == 4
+
+        db_session.execute(update(CampaignEvent).where(CampaignEvent.title == "Evento 0").values(summary_content="sol"))
+        db_session.execute(delete(CampaignEvent).where(CampaignEvent.title == "Evento 1"))
+        db_session.commit()
+        assert [e.title for e in search_campaign_events(db_session, "sol")] == ["Evento 0"]
+        assert sorted(e.title for e in search_campaign_events(db_session, "calma")) == ["Evento 3", "Evento 4"]
+
+
+def test_index_is_created_with_the_schema_and_not_on_startup(tmp_path) -> None:
+    factory = _session_factory(tmp_path)
+    engine = factory.kw["bind"]
+    with factory() as db_session:
+        db_session.add(CampaignEvent(title="Duelo en el monasterio"))
+        db_session.commit()
+        assert [e.title for e in search_campaign_events(db_session, "monasterio")] == ["Duelo en el monasterio"]
+
+    with QueryCounter(engine) as counter:
+        assert ensure_schema(engine) == "current"
+    assert counter.count == 1
@@ -0,0 +1,165 @@
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, Sect
+import populate_db
+
+
+def _write_sects(data_dir, sects) -> None:
+    (data_dir / "sects.json").write_text(json.dumps({"sectas": sects}), encoding="utf-8")
+
+
+def _run(session_factory, **kwargs) -> None:
+    populate_db.load_data.cache_clear()
+    scheduler = populate_db.build_scheduler(**kwargs)
+    scheduler.loaders = {"sects": scheduler.loaders["sects"]}
+    scheduler.run(session_factory)
+
+
+def test_only_changed_files_and_records_are_reapplied(tmp_path, monkeypatch, capsys) -> None:
+    monkeypatch.setattr(populate_db, "DATA_DIR", str(tmp_path))
+    engine = create_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    _write_sects(tmp_path, [{"nombre": "Llama Partida"}, {"nombre": "Ecos Helados"}, {"nombre": "Loto Negro"}])
+    _run(session_factory)
+    assert "sects: 3 inserted" in capsys.readouterr().out
+
+    _run(session_factory)
+    assert "Skipping 'sects'" in capsys.readouterr().out
+
+    _write_sects(tmp_path, [{"nombre": "Llama Partida", "fundador": "Liáng"}, {"nombre": "Ecos Helados"}])
+    _run(session_factory)
+    assert "sects: 0 inserted, 1 updated, 1 unchanged, 1 deleted" in capsys.readouterr().out
+    with session_factory() as session:
+        assert {s.name: s.founder for s in session.query(Sect)} == {"Llama Partida": "Liáng", "Ecos Helados": None}
+
+    _run(session_factory, full=True)
+    assert "sects: 0 inserted, 2 updated" in capsys.readouterr().out
+
+
+def test_removed_technique_still_known_by_a_character_is_kept(tmp_path) -> None:
+    from database.models import Character, CharacterKnownTechniques, Technique
+    from database.seed_manifest import SeedSource, upsert_records
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    source = SeedSource("fire_techniques.json")
+    rows = [{"name": name, "element_association": "Fuego"} for name in ("Puño Ígneo", "Llama Interior", "Ceniza")]
+
+    with session_factory() as session:
+        upsert_records(session, Technique, rows, ["name", "element_association"], source)
+        character = Character(name="Liáng")
+        session.add(character)
+        session.flush()
+        known = session.query(Technique).filter_by(name="Puño Ígneo").one()
+        session.add(CharacterKnownTechniques(character_id=character.id, technique_id=known.id))
+        session.commit()
+
+        stats = upsert_records(session, Technique, rows[2:], ["name", "element_association"], source)
+        session.commit()
+        assert (stats.deleted, stats.kept) == (1, 1)
+        assert "1 kept (still referenced)" in str(stats)
+        assert {t.name for t in session.query(Technique)} == {"Puño Ígneo", "Ceniza"}
+        assert session.query(CharacterKnownTechniques).one().technique.name == "Puño Ígneo"
+
+        # Once nothing references it, the next run deletes it.
+        session.query(CharacterKnownTechniques).delete()
+        stats = upsert_records(session, Technique, rows[2:], ["name", "element_association"], source)
+        session.commit()
+        assert (stats.deleted, stats.kept) == (1, 0)
+        assert {t.name for t in session.query(Technique)} == {"Ceniza"}
+
+
+def test_removed_event_takes_its_tags_along(tmp_path) -> None:
+    from database.models import CampaignEvent, CampaignEventTag
+    from database.seed_manifest import SeedSource, upsert_records
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    source = SeedSource("campaign_events.json")
+    rows = [{"id": 1, "title": "Emboscada", "event_tags_json": ["combate"]},
+            {"id": 2, "title": "Tregua", "event_tags_json": ["diplomacia"]}]
+
+    with session_factory() as session:
+        upsert_records(session, CampaignEvent, rows, ["id"], source)
+        session.commit()
+        upsert_records(session, CampaignEvent, rows[1:], ["id"], source)
+        session.commit()
+        assert [t.tag for t in session.query(CampaignEventTag)] == ["diplomacia"]
+
+
+def test_loaders_sharing_a_file_each_track_its_hash(tmp_path, monkeypatch, capsys) -> None:
+    monkeypatch.setattr(populate_db, "DATA_DIR", str(tmp_path))
+    engine = create_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    (tmp_path / "fire_techniques.json").write_text("{}", encoding="utf-8")
+    calls = []
+    techniques = populate_db._incremental("techniques", ("fire_techniques.json",), lambda s: calls.append("techniques"), False)
+    character = populate_db._incremental("character", ("fire_techniques.json",), lambda s: calls.append("character"), False)
+
+    with session_factory() as session:
+        techniques(session)
+        character(session)
+        session.commit()
+        assert calls == ["techniques", "character"]
+
+        (tmp_path / "fire_techniques.json").write_text('{"elemental_techniques": []}', encoding="utf-8")
+        techniques(session)
+        character(session)
+        session.commit()
+        assert calls == ["techniques", "character"] * 2
+
+        techniques(session)
+        character(session)
+        assert calls == ["techniques", "character"] * 2
+        assert capsys.readouterr().out.count("Skipping") == 2
+
+
+def test_loader_that_kept_rows_runs_again(tmp_path, monkeypatch, capsys) -> None:
+    from database.models import Character, CharacterKnownTechniques, Technique
+    from database.seed_manifest import SeedSource, upsert_records
+
+    monkeypatch.setattr(populate_db, "DATA_DIR", str(tmp_path))
+    engine = create_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    (tmp_path / "fire_techniques.json").write_text("[]", encoding="utf-8")
+    rows = [{"name": "Puño Ígneo", "element_association": "Fuego"}]
+
+    def load(session):
+        data = json.loads((tmp_path / "fire_techniques.json").read_text(encoding="utf-8"))
+        upsert_records(session, Technique, rows if data else [], ["name", "element_association"],
+                       SeedSource("fire_techniques.json"))
+
+    loader = populate_db._incremental("techniques", ("fire_techniques.json",), load, False)
+    (tmp_path / "fire_techniques.json").write_text("[1]", encoding="utf-8")
+    with session_factory() as session:
+        loader(session)
+        character = Character(name="Liáng")
+        session.add(character)
+        session.flush()
+        session.add(CharacterKnownTechniques(character_id=character.id, technique_id=session.query(Technique).one().id))
+        session.commit()
+
+        (tmp_path / "fire_techniques.json").write_text("[]", encoding="utf-8")
+        loader(session)
+        session.commit()
+        assert "will run again next time" in capsys.readouterr().out
+
+        # The file did not change since, but the deletion is retried.
+        session.query(CharacterKnownTechniques).delete()
+        session.commit()
+        loader(session)
+        session.commit()
+        assert "Skipping" not in capsys.readouterr().out
+        assert session.query(Technique).count() == 0
+
+        loader(session)
+        assert "Skipping 'techniques'" in capsys.readouterr().out
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database.engine as db_engine
+from database.models import Base, RuleSet
+from engine.rules_engine import RulesEngine
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scope.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    monkeypatch.setattr(db_engine, "SessionLocal", factory)
+    return factory
+
+
+def test_scopes_commit_roll_back_and_nest(session_factory) -> None:
+    assert db_engine.current_session() is None
+    with db_engine.session_scope() as outer:
+        outer.add(RuleSet(name="Combate", rules_json={"attack": {"dice": "1d20"}}))
+        with db_engine.session_scope() as inner:
+            assert inner is outer is db_engine.current_session()
+    assert db_engine.current_session() is None
+
+    with pytest.raises(RuntimeError):
+        with db_engine.session_scope() as failing:
+            failing.add(RuleSet(name="Perdida"))
+            raise RuntimeError("boom")
+
+    with session_factory() as check:
+        assert [r.name for r in check.query(RuleSet)] == ["Combate"]
+
+
+def test_threads_get_their_own_sessions_and_share_one_rule_index(session_factory) -> None:
+    with db_engine.session_scope() as db_session:
+        db_session.add(RuleSet(name="Combate", rules_json={"attack": {"dice": "1d20"}}))
+
+    rules_engine = RulesEngine(session_provider=db_engine.current_session)
+
+    def turn(_):
+        with db_engine.session_scope() as db_session:
+            result = rules_engine.check_rule("attack")
+            return id(db_session), result["outcome"]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(turn, range(8)))
+    assert {outcome for _, outcome in results} == {"success"}
+    assert db_engine.current_session() is None
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Attack, Base, Character, CharacterKnownTechniques, Encounter, EncounterParticipant, Technique
+from engine.simulation import ENEMIES, PARTY, Combatant, TechniqueOption, combatants_for_encounter, damage_expression, simulate
+
+
+def _bandits(n: int) -> list[Combatant]:
+    return [Combatant(f"Bandido {i}", ENEMIES, hp=11, armor_class=12, attack_bonus=3, damage="1d6+1") for i in range(n)]
+
+
+def test_simulation_is_seeded_and_ordered_by_strength() -> None:
+    hero = Combatant("Liáng", PARTY, hp=40, armor_class=16, attack_bonus=7, damage="1d8+4", initiative_bonus=3,
+                     mana=20, techniques=(TechniqueOption("Palma de Fuego", "3d6", 7, mana_cost=5),))
+    easy = simulate([hero] + _bandits(1), trials=2000, seed=4)
+    assert easy.trials == 2000 and easy.win_rate > 0.95 and easy.difficulty() in ("trivial", "easy")
+    assert easy.technique_uses["Palma de Fuego"] > 0 and 0 < easy.mana_spent <= 20
+    assert simulate([hero] + _bandits(1), trials=2000, seed=4).party_wins == easy.party_wins
+
+    deadly = simulate([hero] + _bandits(12), trials=2000, seed=4)
+    assert deadly.win_rate < 0.2 and deadly.difficulty() == "deadly" and deadly.members_downed > 0.8
+    assert 1 <= deadly.expected_rounds <= easy.expected_rounds + 5
+    with pytest.raises(ValueError):
+        simulate(_bandits(2), trials=10)
+
+
+def test_combatants_from_encounter() -> None:
+    assert damage_expression("2d6 + 3 de daño de fuego") == "2d6+3"
+    assert damage_expression("Ninguno") is None
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db_session:
+        hero = Character(name="Liáng Wǔzhào", hp_max=30, hp_current=25, armor_class=15, mana_current=12)
+        hero.attacks.append(Attack(name="Puño", attack_bonus=6, damage_dice="1d8+3"))
+        technique = Technique(name="Llama Interior", damage_string="4d6 fuego", mana_cost=4)
+        encounter = Encounter(name="Emboscada", expected_party_level=3)
+        db_session.add_all([hero, technique, encounter])
+        db_session.flush()
+        db_session.add_all([
+            CharacterKnownTechniques(character_id=hero.id, technique_id=technique.id),
+            EncounterParticipant(encounter_id=encounter.id, participant_type="character", entity_id=hero.id,
+                                 entity_name=hero.name, character_id=hero.id),
+            EncounterParticipant(encounter_id=encounter.id, participant_type="enemy", entity_id=0,
+                                 entity_name="Bandido", quantity=3),
+        ])
+        db_session.commit()
+
+        combatants = combatants_for_encounter(db_session, encounter.id)
+        assert [c.name for c in combatants] == ["Liáng Wǔzhào", "Bandido 1", "Bandido 2", "Bandido 3"]
+        assert (combatants[0].hp, combatants[0].damage, combatants[0].mana) == (25, "1d8+3", 12)
+        assert combatants[0].techniques == (TechniqueOption("Llama Interior", "4d6", 6, 4),)
+        assert {c.side for c in combatants[1:]} == {ENEMIES}
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, Encounter, EncounterParticipant
+from engine.spatial import EncounterSpatialIndex, SpatialGrid
+
+
+def test_queries_match_a_full_scan() -> None:
+    rng = random.Random(3)
+    grid = SpatialGrid(cell_size=10)
+    points = {i: (rng.uniform(-200, 200), rng.uniform(-200, 200)) for i in range(500)}
+    for i, (x, y) in points.items():
+        grid.insert(i, x, y)
+    for i in range(0, 500, 7):
+        points[i] = (rng.uniform(-200, 200), rng.uniform(-200, 200))
+        grid.move(i, *points[i])
+    grid.remove(1)
+    del points[1]
+
+    for _ in range(50):
+        x, y, radius = rng.uniform(-200, 200), rng.uniform(-200, 200), rng.uniform(1, 60)
+        expected = {i for i, (px, py) in points.items() if (px - x) ** 2 + (py - y) ** 2 <= radius ** 2}
+        assert set(grid.within_radius(x, y, radius)) == expected
+
+    line = SpatialGrid(cell_size=5)
+    for i, (x, y) in enumerate([(0, 0), (10, 1), (20, -1), (10, 8), (-10, 0), (30, 0)]):
+        line.insert(i, x, y)
+    assert line.within_radius(0, 0, 11) == [0, 4, 1]
+    assert line.along_line(0, 0, 25, 0, width=5) == [0, 1, 2]
+    assert line.in_cone(0, 0, 1, 0, length=25) == [1, 2]
+    assert line.line_of_sight(0, 3) and not line.line_of_sight(0, 5)
+    assert line.nearest(29, 0, count=2) == [5, 2]
+
+
+def test_encounter_index_persists_moves() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db_session:
+        encounter = Encounter(name="Incendio en el Mercado")
+        db_session.add(encounter)
+        db_session.flush()
+        db_session.add_all([
+            EncounterParticipant(encounter_id=encounter.id, participant_type="character", entity_id=1,
+                                 entity_name="Liáng", position_x=0, position_y=0),
+            EncounterParticipant(encounter_id=encounter.id, participant_type="enemy", entity_id=2,
+                                 entity_name="Bandido", position_x=15, position_y=0),
+            EncounterParticipant(encounter_id=encounter.id, participant_type="enemy", entity_id=3,
+                                 entity_name="Arquero", position_x=60, position_y=60),
+            EncounterParticipant(encounter_id=encounter.id, participant_type="enemy", entity_id=4,
+                                 entity_name="Sin posición"),
+        ])
+        db_session.commit()
+        hero, bandit, archer = db_session.scalars(
+            select(EncounterParticipant.id).order_by(EncounterParticipant.id)).all()[:3]
+
+        index = EncounterSpatialIndex.from_encounter(db_session, encounter.id)
+        assert len(index) == 3
+        assert index.within_radius(5, 0, 20, index.of_type("enemy")) == [bandit]
+        index.move(archer, 20, 5)
+        assert index.within_radius(5, 0, 20, index.of_type("enemy")) == [bandit, archer]
+        assert index.persist(db_session) == 1 and index.persist(db_session) == 0
+        db_session.commit()
+        assert db_session.get(EncounterParticipant, archer).position_x == 20
+
+        unplaced = db_session.scalars(select(EncounterParticipant.id).where(EncounterParticipant.entity_id == 4)).one()
+        index.place(db_session, unplaced, 10, 5)
+        assert index.within_radius(5, 0, 20, index.of_type("enemy")) == [unplaced, bandit, archer]
+
+        other = Encounter(name="Otra escena")
+        db_session.add(other)
+        db_session.flush()
+        stranger = EncounterParticipant(encounter_id=other.id, participant_type="enemy", entity_id=5, entity_name="Ajeno")
+        db_session.add(stranger)
+        db_session.flush()
+        for participant_id in (stranger.id, 9999):
+            with pytest.raises(ValueError):
+                index.place(db_session, participant_id, 0, 0)
@@ -0,0 +1,46 @@
+import sys, os; sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from pathlib import Path
+
+import pytest
+
+from dm.database import Database
+from dm.sqlite_database import SQLiteDatabase
+
+
+def test_log_event_and_paged_reads(tmp_path: Path) -> None:
+    db = SQLiteDatabase(tmp_path / "db.sqlite", page_size=2)
+    for i in range(5):
+        db.log_event(f"evento {i}")
+    db.get_character("Liáng")["level"] = 3
+    db.close()
+
+    db2 = SQLiteDatabase(tmp_path / "db.sqlite", page_size=2)
+    assert db2.count_events() == 5
+    assert db2.list_events(offset=1, limit=2) == ["evento 1", "evento 2"]
+    assert list(db2.iter_events()) == [f"evento {i}" for i in range(5)]
+    assert db2.get_character("Liáng") == {"level": 3}
+
+
+def test_migrate_from_json(tmp_path: Path) -> None:
+    source = Database(tmp_path / "db.json")
+    source.get_character("Liáng")["level"] = 5
+    source.log_event("inicio")
+    source.log_event("fin")
+    source.close()
+
+    db = SQLiteDatabase.migrate_from_json(tmp_path / "db.json", tmp_path / "db.sqlite")
+    assert db.list_events() == ["inicio", "fin"]
+    assert db.get_character("Liáng") == {"level": 5}
+
+
+def test_migrate_from_json_refuses_non_empty_target(tmp_path: Path) -> None:
+    source = Database(tmp_path / "db.json")
+    source.log_event("x")
+    source.close()
+
+    SQLiteDatabase.migrate_from_json(tmp_path / "db.json", tmp_path / "db.sqlite").close()
+    with pytest.raises(ValueError):
+        SQLiteDatabase.migrate_from_json(tmp_path / "db.json", tmp_path / "db.sqlite")
+
+    db = SQLiteDatabase.migrate_from_json(tmp_path / "db.json", tmp_path / "db.sqlite", force=True)
+    assert db.list_events() == ["x"]
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database.models import Base, Encounter, EncounterParticipant
+from engine.turn_order import TurnOrder
+
+
+def _round(order: TurnOrder) -> list[int]:
+    return [order.advance() for _ in range(len(order))]
+
+
+def test_heap_order_ties_joins_leaves_and_delays() -> None:
+    order = TurnOrder()
+    order.add(1, initiative=12)
+    order.add(2, initiative=18)
+    order.add(3, initiative=12, tiebreak=3)
+    order.add(4, initiative=5)
+    assert order.order() == [2, 3, 1, 4]
+    assert _round(order) == [2, 3, 1, 4] and order.round_number == 1
+
+    assert order.advance() == 2 and order.round_number == 2 and order.turn_index == 0
+    order.add(5, initiative=20)  # would have gone before the current turn: waits for round 3
+    order.add(6, initiative=1)   # still acts this round
+    assert order.remaining_this_round() == [3, 1, 4, 6]
+    order.remove(1)
+    assert order.advance() == 3
+    assert order.delay(3, new_initiative=4) == 4  # 3 now acts after 4 but before 6
+    assert [order.advance(), order.advance(), order.advance()] == [3, 6, 5]
+    assert order.round_number == 3 and order.order() == [5, 2, 4, 3, 6]
+
+    with pytest.raises(ValueError):
+        order.delay(2, new_initiative=30)
+    with pytest.raises(ValueError):
+        order.remove(1)
+
+
+def test_persists_only_changed_fields() -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    with sessionmaker(bind=engine)() as db_session:
+        encounter = Encounter(name="Asedio")
+        db_session.add(encounter)
+        db_session.flush()
+        db_session.add_all([
+            EncounterParticipant(encounter_id=encounter.id, participant_type="enemy", entity_id=i,
+                                 entity_name=f"Soldado {i}", initiative=i)
+            for i in range(1, 61)
+        ])
+        db_session.commit()
+
+        order = TurnOrder.from_encounter(db_session, encounter.id)
+        order.advance()
+        order.persist(db_session)
+        db_session.commit()
+        statements.clear()
+
+        order.advance()
+        assert order.persist(db_session) == 2  # the encounter and the participant who just acted
+        db_session.commit()
+        updates = [s for s in statements if s.startswith("UPDATE")]
+        assert len(updates) == 2 and not any("turn_order_json" in s for s in updates)
+
+        db_session.expire_all()
+        assert (encounter.status, encounter.current_turn, encounter.turn_order_json[:3]) == ("active", 1, [60, 59, 58])
+        restored = TurnOrder.from_encounter(db_session, encounter.id)
+        assert restored.current == order.current == 59
+        assert restored.advance() == order.advance() == 58